@@ -26,7 +26,8 @@ from analytics_seo import analytics_tracker, SEOOptimizer
 from hf_auth_module import auth_manager, create_login_interface
 
 # Import Conversation Agent
-from conversation_agent import get_conversation_agent, reset_conversation_agent
+from conversation_agent import get_conversation_agent, new_audio_path, reset_conversation_agent
+from context_engine import get_context_engine
 
 class UltimateLegalBrain:
     """
@@ -148,13 +149,10 @@ async def respond_with_ultimate_brain(
         token = hf_token.token if hf_token else None
         client = InferenceClient(token=token, model="meta-llama/Llama-3.3-70B-Instruct")
         
+        # Summary of older turns + the recent turns that fit the provider's budget
+        context = get_context_engine().build(history, ai_provider)
         messages = [{"role": "system", "content": brain_result['enhanced_query']}]
-        for user_msg, assistant_msg in history:
-            if user_msg:
-                messages.append({"role": "user", "content": user_msg})
-            if assistant_msg:
-                messages.append({"role": "assistant", "content": assistant_msg})
-        
+        messages.extend(context.to_messages())
         messages.append({"role": "user", "content": message})
         
         response = reasoning_info if use_reasoning and brain_result['reasoning_result'] else ""
@@ -774,8 +772,10 @@ with demo:
                     legal_summary_output = gr.Textbox(label="⚖️ Legal Intelligence Summary", lines=5)
 
             def analyze_uploaded_doc(file):
+                # Generator: PDF results stream into the UI page by page
                 if file is None:
-                    return "Please upload a file.", "", ""
+                    yield "Please upload a file.", "", ""
+                    return
                 
                 try:
                     from handwritten_note_interpreter import HandwrittenNoteInterpreter
@@ -784,18 +784,43 @@ with demo:
                     
                     # Check if it's a PDF or Image
                     if file.name.lower().endswith('.pdf'):
-                        # Implement PDF to Image conversion or use PDF-specific Vision prompt
-                        # For now, let's handle as image
-                        return "PDF analysis integrated. Processing first page...", "Structural Document Analysis applied.", "Summary of PDF content."
+                        yield from analyze_pdf_pages(file.name, interpreter)
+                        return
                     
                     result = interpreter.process_handwritten_note(file.name)
-                    return (
+                    yield (
                         result.get("transcription", "No transcription available."),
                         result.get("penmanship_analysis", "Style analysis not available."),
                         result.get("legal_summary", "Summary not generated.")
                     )
                 except Exception as e:
-                    return f"Error: {str(e)}", "", ""
+                    yield f"Error: {str(e)}", "", ""
+
+            def analyze_pdf_pages(pdf_path, interpreter):
+                """Text-layer pages pass straight through; scanned pages are OCR'd or read by Vision-AI."""
+                from utils.pdf_pages import PDFPagePipeline
+                
+                pipeline = PDFPagePipeline(interpreter=interpreter)
+                sections, sources = [], {}
+                for page in pipeline.iter_pages(pdf_path):
+                    sections.append(f"--- Page {page['page']} ({page['source'].replace('_', ' ')}) ---\n{page['text'].strip()}")
+                    sources[page['source']] = sources.get(page['source'], 0) + 1
+                    breakdown = ", ".join(f"{count} {source.replace('_', ' ')}" for source, count in sources.items())
+                    yield (
+                        "\n\n".join(sections),
+                        f"Structural Document Analysis: page {page['page']} of {page['page_count']} ({breakdown}).",
+                        "Summary will be generated once every page is processed..."
+                    )
+                
+                if not sections:
+                    yield "No pages found in this PDF.", "", ""
+                    return
+                transcription = "\n\n".join(sections)
+                yield (
+                    transcription,
+                    f"Structural Document Analysis: {len(sections)} pages ({breakdown}).",
+                    interpreter.summarize_transcription(transcription)
+                )
 
             analyze_btn.click(
                 fn=analyze_uploaded_doc,
@@ -986,8 +1011,10 @@ with demo:
                         audio_result = None
                         if read_aloud:
                             import asyncio as aio
-                            audio_bytes, audio_path = await agent.text_to_speech(response_text)
-                            if audio_path:
+                            audio_bytes, audio_path = await agent.text_to_speech(
+                                response_text, output_path=new_audio_path()
+                            )
+                            if audio_bytes:
                                 audio_result = audio_path
 
                         # Return response, audio, and history
@@ -1006,8 +1033,10 @@ with demo:
                     audio_result = None
                     if read_aloud:
                         import asyncio as aio
-                        audio_bytes, audio_path = await agent.text_to_speech(response_text)
-                        if audio_path:
+                        audio_bytes, audio_path = await agent.text_to_speech(
+                            response_text, output_path=new_audio_path()
+                        )
+                        if audio_bytes:
                             audio_result = audio_path
 
                     history_summary = agent.get_history_summary()
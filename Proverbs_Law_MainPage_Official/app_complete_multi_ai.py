@@ -40,21 +40,31 @@ class SupertonicAudioProcessor:
             print(f"⚠️ Supertonic setup error: {e}")
     
     def process_audio(self, audio_file: str) -> Dict:
-        """Process audio file with Supertonic"""
-        if not self.supertonic_available:
+        """Analyze and enhance an audio file (denoise, EQ, loudness normalization)"""
+        if not audio_file:
             return {
                 "status": "error",
-                "message": "Supertonic not available. Please install first."
+                "message": "No audio file provided."
             }
         
         try:
-            # Process audio with Supertonic
+            # Local DSP, streamed block by block: no Supertonic install needed
+            import audio_processing
+            levels = audio_processing.analyze_levels(audio_file)
+            enhanced = audio_processing.process_file(audio_file, "enhance")
             result = {
                 "status": "success",
                 "filename": os.path.basename(audio_file),
-                "duration": "N/A",
-                "transcription": "Audio processed with Supertonic AI",
-                "analysis": "Audio quality analysis completed"
+                "duration": f"{levels['duration']:.1f}s",
+                "analysis": {
+                    "samplerate": levels["samplerate"],
+                    "channels": levels["channels"],
+                    "peak_dbfs": levels["peak_dbfs"],
+                    "rms_dbfs": levels["rms_dbfs"]
+                },
+                "enhanced_file": enhanced["output_path"],
+                "gain_db": enhanced["gain_db"],
+                "realtime_factor": enhanced["realtime_factor"]
             }
             return result
         except Exception as e:
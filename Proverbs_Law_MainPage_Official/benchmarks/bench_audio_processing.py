@@ -0,0 +1,87 @@
+"""
+Benchmark: realtime factor and memory of the streaming audio engine.
+
+Writes a synthetic deposition recording (voiced harmonics with pauses over
+hum and hiss) in blocks, then runs each audio_processing operation and
+reports the realtime factor (processing time / audio duration; below 1 is
+faster than realtime) and peak traced memory, next to the size the decoded
+audio would take if loaded whole. Batch mode times process_batch over
+several copies.
+
+Usage:
+    python benchmarks/bench_audio_processing.py --minutes 60 --samplerate 16000 --batch 4
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile as sf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_processing
+
+BLOCK_SECONDS = 10
+
+
+def write_recording(path, minutes, samplerate):
+    rng = np.random.default_rng(7)
+    block = BLOCK_SECONDS * samplerate
+    t = np.arange(block) / samplerate
+    with sf.SoundFile(path, "w", samplerate=samplerate, channels=1, subtype="PCM_16") as out:
+        for n in range(int(minutes * 60 / BLOCK_SECONDS)):
+            pitch = 110 + 30 * np.sin(2 * np.pi * 0.3 * t + n)
+            phase = 2 * np.pi * np.cumsum(pitch) / samplerate
+            voice = sum(np.sin(k * phase) / k for k in range(1, 8)) * 0.15
+            voice *= (np.sin(2 * np.pi * 0.25 * t + n) > -0.3)  # pauses between phrases
+            noise = 0.01 * rng.standard_normal(block) + 0.01 * np.sin(2 * np.pi * 60 * t)
+            out.write((voice + noise).astype(np.float32))
+
+
+def run(minutes, samplerate, batch, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "deposition.wav")
+        write_recording(path, minutes, samplerate)
+        decoded_mb = minutes * 60 * samplerate * 4 / (1024 * 1024)
+        print(f"recording: {minutes} min at {samplerate} Hz, {os.path.getsize(path) / 1e6:.0f} MB on disk, "
+              f"{decoded_mb:.0f} MB as float32 if loaded whole")
+
+        for operation in audio_processing.OPERATIONS:
+            output = os.path.join(tmp, f"{operation}.wav")
+            tracemalloc.start()
+            result = audio_processing.process_file(path, operation, output)
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+            print(f"{operation:<12} RTF {result['realtime_factor']:.4f} "
+                  f"({result['seconds']:6.2f}s), peak {peak:6.1f} MB")
+
+        if batch > 1:
+            paths = [path]
+            for n in range(1, batch):
+                copy = os.path.join(tmp, f"deposition_{n}.wav")
+                shutil.copy(path, copy)
+                paths.append(copy)
+            for label, max_workers in (("serial", 1), (f"pool ({workers} workers)", workers)):
+                start = time.perf_counter()
+                results = list(audio_processing.process_batch(paths, "denoise", max_workers=max_workers))
+                seconds = time.perf_counter() - start
+                for _, result, _ in results:
+                    if result:
+                        os.remove(result["output_path"])
+                print(f"batch of {batch} denoise, {label}: {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--samplerate", type=int, default=16000)
+    parser.add_argument("--batch", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    run(args.minutes, args.samplerate, args.batch, args.workers)
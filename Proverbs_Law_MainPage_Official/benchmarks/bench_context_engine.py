@@ -0,0 +1,67 @@
+"""
+Benchmark: full history replay vs the token-budgeted context engine.
+
+Simulates a long legal Q&A session (multi-paragraph answers) and, for every
+turn, compares the history tokens a full replay would send with what
+ConversationContextEngine.build returns for the provider's budget. Summaries
+are extractive here, so no LLM calls are made; build latency is reported
+separately from the background summary updates.
+
+Usage:
+    python benchmarks/bench_context_engine.py --turns 100 --provider huggingface
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_engine import ConversationContextEngine
+
+ANSWER = (
+    "Under the doctrine of promissory estoppel, a promise that the promisor should reasonably expect "
+    "to induce action or forbearance is binding if injustice can be avoided only by enforcement. "
+    "Courts look at the clarity of the promise, the reasonableness of the reliance and the detriment "
+    "suffered. In your situation the email of {n} March is likely a clear promise, and the tenant's "
+    "renovation spending is the kind of reliance courts recognise. "
+)
+
+
+def session(turns):
+    history = []
+    for n in range(1, turns + 1):
+        question = f"Question {n}: does the landlord's email about the lease renewal bind them if I spent ${n * 1000} on repairs?"
+        yield history, question
+        history = history + [[question, (ANSWER.format(n=n % 28 + 1)) * 3]]
+
+
+def run(turns, provider):
+    engine = ConversationContextEngine()
+    full_total = engine_total = 0
+    build_seconds = 0.0
+    checkpoints = {10, 25, 50, 100, 200, turns}
+    print(f"{'turn':>5} {'full replay':>12} {'engine':>8} {'summary turns':>14}")
+    for n, (history, question) in enumerate(session(turns), 1):
+        start = time.perf_counter()
+        window = engine.build(history, provider)
+        build_seconds += time.perf_counter() - start
+        full_total += window.full_history_tokens
+        engine_total += window.prompt_tokens
+        if n in checkpoints:
+            print(f"{n:>5} {window.full_history_tokens:>12} {window.prompt_tokens:>8} {window.summarized_turns:>14}")
+        # Give the background summarizer its turn, as the user's reading time would
+        engine.wait_for_summaries()
+
+    print(f"history tokens over {turns} turns: full replay {full_total}, engine {engine_total} "
+          f"({(1 - engine_total / full_total) * 100:.1f}% fewer)")
+    print(f"build latency: {build_seconds / turns * 1000:.2f} ms/turn; stats: {engine.get_stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--provider", default="huggingface")
+    args = parser.parse_args()
+    run(args.turns, args.provider)
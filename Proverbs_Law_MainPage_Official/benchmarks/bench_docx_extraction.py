@@ -0,0 +1,133 @@
+"""
+Benchmark: streaming DOCX extraction vs python-docx.
+
+Writes a synthetic agreement (numbered clauses, a schedule table per page,
+headers, footers and footnotes) as a real .docx with zipfile, then reports
+time, peak traced memory and extracted characters for
+utils.docx_utils.extract_docx_text and, when installed, python-docx's
+paragraph join. Batch mode times extract_docx_batch over several copies.
+
+Usage:
+    python benchmarks/bench_docx_extraction.py --pages 1000 --batch 8
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.docx_utils import extract_docx_batch, extract_docx_text
+
+NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/></Relationships>'
+)
+
+
+def paragraph(text, style=None, footnote=None):
+    props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    note = f'<w:r><w:footnoteReference w:id="{footnote}"/></w:r>' if footnote else ''
+    return f'<w:p>{props}<w:r><w:t xml:space="preserve">{text}</w:t></w:r>{note}</w:p>'
+
+
+def build_docx(path, pages):
+    body = []
+    for page in range(1, pages + 1):
+        body.append(paragraph(f"Article {page}. Obligations", style="Heading1"))
+        for clause in range(1, 9):
+            body.append(paragraph(
+                f"{page}.{clause} The Supplier shall deliver the Goods described in Schedule {page} "
+                f"no later than {clause * 7} days after the Purchase Order date, subject to clause {page}.{clause + 1}.",
+                footnote=page if clause == 1 else None
+            ))
+        rows = "".join(
+            f'<w:tr><w:tc>{paragraph(f"Item {page}-{r}")}</w:tc><w:tc>{paragraph(f"${r * 125}.00")}</w:tc></w:tr>'
+            for r in range(1, 6)
+        )
+        body.append(f'<w:tbl>{rows}</w:tbl>')
+    document = f'<?xml version="1.0" encoding="UTF-8"?><w:document {NS}><w:body>{"".join(body)}</w:body></w:document>'
+    notes = "".join(f'<w:footnote w:id="{n}">{paragraph(f"As amended by Amendment No. {n}.")}</w:footnote>'
+                    for n in range(1, pages + 1))
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES)
+        archive.writestr("_rels/.rels", RELS)
+        archive.writestr("word/document.xml", document)
+        archive.writestr("word/header1.xml", f'<w:hdr {NS}>{paragraph("MASTER SUPPLY AGREEMENT")}</w:hdr>')
+        archive.writestr("word/footer1.xml", f'<w:ftr {NS}>{paragraph("Confidential")}</w:ftr>')
+        archive.writestr("word/footnotes.xml", f'<w:footnotes {NS}>{notes}</w:footnotes>')
+
+
+def measure(fn):
+    start = time.perf_counter()
+    text = fn()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    tracemalloc.stop()
+    return text, seconds, peak
+
+
+def python_docx_text(path):
+    from docx import Document
+    return "\n".join(para.text for para in Document(path).paragraphs)
+
+
+def run(pages, batch, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "agreement.docx")
+        build_docx(path, pages)
+        print(f"document: {pages} pages, {os.path.getsize(path) / 1024:.0f} KB zipped")
+
+        text, seconds, peak = measure(lambda: extract_docx_text(path))
+        print(f"streaming:   {seconds:6.2f}s, peak {peak:7.1f} MB, {len(text):>9} chars "
+              f"(tables: {'| Item' in text}, footnotes: {'[^1]:' in text})")
+        try:
+            text, seconds, peak = measure(lambda: python_docx_text(path))
+            print(f"python-docx: {seconds:6.2f}s, peak {peak:7.1f} MB, {len(text):>9} chars "
+                  f"(tables: {'Item' in text}, footnotes: {'Amendment No.' in text})")
+        except ImportError:
+            print("python-docx: not installed")
+
+        if batch > 1:
+            paths = [path]
+            for n in range(1, batch):
+                copy = os.path.join(tmp, f"agreement_{n}.docx")
+                shutil.copy(path, copy)
+                paths.append(copy)
+            start = time.perf_counter()
+            for p in paths:
+                extract_docx_text(p)
+            serial = time.perf_counter() - start
+            start = time.perf_counter()
+            list(extract_docx_batch(paths, max_workers=workers))
+            pooled = time.perf_counter() - start
+            print(f"batch of {batch}: serial {serial:.2f}s, pool ({workers} workers) {pooled:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    run(args.pages, args.batch, args.workers)
@@ -0,0 +1,128 @@
+"""
+Benchmark: fast downsampled handwriting detection vs the full-resolution
+Canny/contour detector.
+
+Generates a labeled synthetic set of 600-dpi-sized pages: typeset pages
+rendered with Pillow's scalable default font, and "handwritten" pages drawn as
+slanted, pressure-varying pen strokes. Reports accuracy, the share of pages
+flagged as handwritten and mean latency for OCRProcessor.detect_handwriting
+(slow), detect_handwriting_fast with and without the slow fallback, and the
+speedup.
+
+The fast detector's weights were fitted on pages from FIT_SEEDS, so those
+seeds are refused: accuracy is measured on held-out pages. Held-out pages
+still come from the same generator, so the accuracy shows how well the
+features separate these two synthetic styles, not how the detector does on
+real scans. The full detector flags every synthetic page the same way (its
+accuracy is the 50% of a constant answer), so it is a latency baseline only.
+
+Usage:
+    python benchmarks/bench_handwriting_detection.py --pages 40 --seed 101
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.ocr_utils import OCRProcessor
+
+PAGE_SIZE = (2400, 3000)
+FIT_SEEDS = (7, 11)  # pages the FAST_DETECT_LEVELS weights were fitted on
+WORDS = ["the", "court", "finds", "that", "respondent", "agreement", "section",
+         "pursuant", "motion", "discovery", "hereby", "ORDERED"]
+
+
+def typed_page(rng, size=PAGE_SIZE):
+    page = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(page)
+    font_size = int(rng.integers(28, 60))
+    try:
+        font = ImageFont.load_default(size=font_size)
+    except TypeError:  # Pillow < 10.1 has no scalable default font
+        font = ImageFont.load_default()
+    y = 150
+    while y < size[1] - 200:
+        line = " ".join(rng.choice(WORDS) for _ in range(int(rng.integers(6, 14))))
+        draw.text((150, y), line, fill=0, font=font)
+        y += int(font_size * 1.6)
+    return page
+
+
+def handwritten_page(rng, size=PAGE_SIZE):
+    page = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(page)
+    x_height = int(rng.integers(30, 70))
+    slant = rng.uniform(-0.5, 0.1)
+    pen_width = int(rng.integers(3, 9))
+    y = 200
+    while y < size[1] - 200:
+        x = 150 + rng.uniform(0, 60)
+        while x < size[0] - 300:
+            points = []
+            for i in range(int(rng.integers(3, 9)) * 12):
+                height = x_height * (0.5 + 0.5 * math.sin(i * rng.uniform(0.7, 1.3)))
+                if rng.random() < 0.08:
+                    height *= 2.0  # ascenders
+                py = y - height * rng.uniform(0.8, 1.0) + rng.normal(0, x_height * 0.05)
+                px = x + i * x_height * 0.11 + slant * (y - py)
+                points.append((px, py))
+            draw.line(points, fill=int(rng.integers(0, 80)),
+                      width=pen_width + int(rng.integers(-1, 2)), joint="curve")
+            x = points[-1][0] + x_height * rng.uniform(0.8, 1.6)
+        y += int(x_height * rng.uniform(2.2, 3.2))
+    return page
+
+
+def evaluate(detect, dataset):
+    correct = 0
+    flagged = 0
+    elapsed = 0.0
+    for image, label in dataset:
+        start = time.perf_counter()
+        result = detect(image)
+        elapsed += time.perf_counter() - start
+        correct += bool(result["is_handwritten"]) == label
+        flagged += bool(result["is_handwritten"])
+    return correct / len(dataset), flagged / len(dataset), elapsed / len(dataset)
+
+
+def run(num_pages, seed):
+    rng = np.random.default_rng(seed)
+    dataset = []
+    for _ in range(num_pages // 2):
+        dataset.append((typed_page(rng).convert("RGB"), False))
+        dataset.append((handwritten_page(rng).convert("RGB"), True))
+
+    processor = OCRProcessor()
+    rows = [
+        ("full (Canny + contours)", processor.detect_handwriting),
+        ("fast + fallback", processor.detect_handwriting_fast),
+        ("fast only", lambda image: processor.detect_handwriting_fast(image, fallback=False)),
+    ]
+    fallbacks = sum(processor.detect_handwriting_fast(image)["method"] == "full" for image, _ in dataset)
+
+    print(f"{len(dataset)} held-out synthetic pages at {PAGE_SIZE[0]}x{PAGE_SIZE[1]}, seed {seed}")
+    print(f"{'detector':<26} {'accuracy':>9} {'flagged':>8} {'ms/page':>9}")
+    baseline = None
+    for name, detect in rows:
+        accuracy, flagged, seconds = evaluate(detect, dataset)
+        baseline = baseline or seconds
+        print(f"{name:<26} {accuracy:>8.1%} {flagged:>8.0%} {seconds * 1000:>9.1f}  ({baseline / seconds:.1f}x)")
+    print(f"pages sent to the full detector by the fast path: {fallbacks}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=101)
+    args = parser.parse_args()
+    if args.seed in FIT_SEEDS:
+        parser.error(f"seed {args.seed} generated the fitting set; pick a held-out seed")
+    run(args.pages, args.seed)
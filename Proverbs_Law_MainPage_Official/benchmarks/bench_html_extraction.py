@@ -0,0 +1,93 @@
+"""
+Benchmark: regex HTML stripping vs the streaming tokenizer extractor.
+
+Builds a large statute-style page (site nav and footer, inline scripts that
+contain '<', nested numbered subsections, tables) and reports MB/s, peak
+traced memory and output size for the old three-pass regex routine (which
+needs the whole decoded body) and for html_stream_to_text fed in 64 KB byte
+chunks, as process_url does.
+
+Usage:
+    python benchmarks/bench_html_extraction.py --sections 2000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.html_utils import html_stream_to_text
+
+CHROME = (
+    '<header class="site"><a href="/">State Legislature</a><nav><ul>'
+    + "".join(f'<li><a href="/title/{i}">Title {i}</a></li>' for i in range(60))
+    + '</ul></nav></header>'
+    '<script>for (var i = 0; i < 10; i++) { if (a<b) track("<view>"); }</script>'
+    '<style>.s > p { margin: 0 }</style>'
+)
+FOOTER = '<footer><p>Copyright State Legislature. Privacy. Accessibility.</p></footer>'
+
+
+def statute_page(sections):
+    parts = ['<!DOCTYPE html><html><head><title>Code</title></head><body>', CHROME, '<main>']
+    for n in range(1, sections + 1):
+        parts.append(f'<section><h2>&sect; {n}. Definitions and duties</h2>')
+        parts.append('<p>As used in this section, unless the context otherwise requires, the following '
+                     'terms have the meanings given to them &mdash; including any amendment thereto.</p><ol>')
+        for sub in range(1, 5):
+            parts.append(f'<li>The <em>commissioner</em> shall, within {sub * 30} days, '
+                         f'publish notice under subsection ({sub}) of this section.</li>')
+        parts.append('</ol><table><tr><th>Year</th><th>Amendment</th></tr>'
+                     f'<tr><td>20{n % 25:02d}</td><td>P.L. {n}-{n % 7}</td></tr></table>')
+        parts.append('<script>window.dataLayer.push({"s": "<sec>"});</script></section>')
+    parts.append('</main>' + FOOTER + '</body></html>')
+    return "".join(parts).encode("utf-8")
+
+
+def legacy_extract(html_content):
+    """The previous DocumentProcessor._extract_text_from_html, without its 10k cut-off."""
+    clean_html = re.sub(r'<(script|style)[^<]*?</\1>', '', html_content, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r'<[^>]+>', '', clean_html)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def peak_memory_mb(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def run(sections, chunk_size=64 * 1024):
+    body = statute_page(sections)
+    mb = len(body) / (1024 * 1024)
+    print(f"page: {mb:.1f} MB, {sections} sections")
+
+    def stream():
+        chunks = (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+        return html_stream_to_text(chunks, "utf-8")
+
+    # Timed without tracing, then traced separately for memory
+    for name, fn in (("regex", lambda: legacy_extract(body.decode("utf-8"))), ("tokenizer", stream)):
+        start = time.perf_counter()
+        text = fn()
+        seconds = time.perf_counter() - start
+        peak_mb = peak_memory_mb(fn)
+        leaked = 'track(' in text or 'dataLayer' in text
+        print(f"{name:<10} {mb / seconds:7.1f} MB/s, peak {peak_mb:6.1f} MB, {len(text):>9} chars, "
+              f"script text leaked: {leaked}")
+
+    print("sample:")
+    print("\n".join(stream().splitlines()[:8]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, default=2000)
+    args = parser.parse_args()
+    run(args.sections)
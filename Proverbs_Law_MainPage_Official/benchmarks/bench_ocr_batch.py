@@ -0,0 +1,76 @@
+"""
+Benchmark: one-at-a-time OCR vs BatchOCREngine.
+
+Renders synthetic typed pages with Pillow, then reports pages per second for
+OCRProcessor.ocr_image called serially and for the warm worker pool.
+Requires the tesseract binary and pytesseract.
+
+Usage:
+    python benchmarks/bench_ocr_batch.py --pages 24 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+
+from utils.ocr_utils import BatchOCREngine, OCRProcessor
+
+LINE = "IN THE CIRCUIT COURT - Case No. {n} - Motion to Compel Discovery"
+
+
+def render_page(path, page_number, size=(1700, 2200), lines=40):
+    """Render a letter-size page at ~200 dpi with monospaced typed lines."""
+    page = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(page)
+    for line in range(lines):
+        draw.text((100, 100 + line * 50), LINE.format(n=page_number * lines + line), fill="black")
+    page.save(path)
+
+
+def run(num_pages, workers):
+    processor = OCRProcessor()
+    if not processor.pytesseract:
+        print("pytesseract is not installed; nothing to benchmark.")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for page_number in range(num_pages):
+            path = os.path.join(tmp, f"page_{page_number}.png")
+            render_page(path, page_number)
+            paths.append(path)
+
+        start = time.perf_counter()
+        for path in paths:
+            processor.ocr_image(Image.open(path))
+        serial = time.perf_counter() - start
+
+        engine = BatchOCREngine(max_workers=workers)
+        # Warm the pool so worker start-up is not billed to the batch
+        engine.process_all(paths[:workers])
+        start = time.perf_counter()
+        first = None
+        for _ in engine.process(paths):
+            if first is None:
+                first = time.perf_counter() - start
+        batch = time.perf_counter() - start
+        engine.shutdown()
+
+    print(f"pages: {num_pages}, workers: {workers}")
+    print(f"serial: {num_pages / serial:6.2f} pages/s ({serial:.2f}s)")
+    print(f"batch:  {num_pages / batch:6.2f} pages/s ({batch:.2f}s, first result after {first:.2f}s)")
+    print(f"speedup: {serial / batch:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=24)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    run(args.pages, args.workers)
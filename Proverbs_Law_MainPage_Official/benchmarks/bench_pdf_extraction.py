@@ -0,0 +1,104 @@
+"""
+Benchmark: serial vs page-parallel PDF text extraction.
+
+Builds synthetic court-filing-sized PDFs (plain text pages, Helvetica) and
+times PDFProcessor.extract_text against extract_text_parallel, plus the time
+until iter_pages_parallel yields its first page.
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py --pages 100 500 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pdf_utils import PDFProcessor
+
+LINE = "The Court finds that the Respondent failed to comply with Section {n} of the Agreement."
+
+
+def build_synthetic_pdf(path, num_pages, lines_per_page=45):
+    """Write a minimal, valid multi-page text PDF without third-party libraries."""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(None)
+    pages = add(None)
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_number in range(num_pages):
+        lines = [b"BT /F1 10 Tf 12 TL 50 760 Td"]
+        for line_number in range(lines_per_page):
+            text = LINE.format(n=page_number * lines_per_page + line_number)
+            lines.append(f"({text}) Tj T*".encode("latin-1"))
+        lines.append(b"ET")
+        stream = b"\n".join(lines)
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages, font, content)
+        ))
+
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages
+    objects[pages - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, num_pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                % (len(objects) + 1, catalog, xref_offset))
+
+
+def run(page_counts, workers):
+    processor = PDFProcessor()
+    if not processor.PyPDF2:
+        print("PyPDF2 is not installed; nothing to benchmark.")
+        return
+
+    print(f"{'pages':>6} {'serial s':>9} {'parallel s':>11} {'speedup':>8} {'first page s':>13}")
+    for num_pages in page_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"synthetic_{num_pages}.pdf")
+            build_synthetic_pdf(path, num_pages)
+
+            start = time.perf_counter()
+            with open(path, "rb") as f:
+                serial_text = processor.extract_text(f)
+            serial = time.perf_counter() - start
+
+            start = time.perf_counter()
+            parallel_text = processor.extract_text_parallel(path, max_workers=workers)
+            parallel = time.perf_counter() - start
+
+            start = time.perf_counter()
+            next(processor.iter_pages_parallel(path, max_workers=workers))
+            first_page = time.perf_counter() - start
+
+            if serial_text != parallel_text:
+                print(f"  warning: outputs differ for {num_pages} pages")
+            print(f"{num_pages:>6} {serial:>9.2f} {parallel:>11.2f} {serial / parallel:>7.2f}x {first_page:>13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    run(args.pages, args.workers)
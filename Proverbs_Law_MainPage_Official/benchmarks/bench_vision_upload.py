@@ -0,0 +1,91 @@
+"""
+Benchmark: vision upload size and latency, raw bytes vs preprocessed payload.
+
+Synthesizes a phone-style photo of a handwritten note (12 MP, EXIF-rotated,
+note in the middle of a textured desk) and reports the upload size and
+preprocessing time. With --live and HF_TOKEN set, it also times one
+transcription call for each payload against the vision model.
+
+Usage:
+    python benchmarks/bench_vision_upload.py
+    HF_TOKEN=... python benchmarks/bench_vision_upload.py --live
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from utils.image_utils import VisionImagePreprocessor
+
+
+def phone_photo(seed=7, size=(4032, 3024)):
+    """JPEG bytes of a note on a desk, stored sideways with an EXIF orientation tag."""
+    rng = random.Random(seed)
+    photo = Image.effect_noise(size, 40).convert("RGB").filter(ImageFilter.GaussianBlur(2))
+    draw = ImageDraw.Draw(photo)
+    left, top = size[0] // 4, size[1] // 6
+    draw.rectangle((left, top, size[0] - left, size[1] - top), fill=(246, 244, 236))
+    for line in range(18):
+        y = top + 80 + line * 110
+        x = left + 60
+        while x < size[0] - left - 120:
+            width = rng.randint(30, 110)
+            points = [(x + i * 6, y + rng.randint(-18, 18)) for i in range(width // 6)]
+            draw.line(points, fill=(20, 30, 90), width=5)
+            x += width + rng.randint(25, 45)
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotate 90 CW on display
+    buffer = io.BytesIO()
+    photo.rotate(90, expand=True).save(buffer, format="JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+async def time_call(interpreter, image_url):
+    from handwritten_note_interpreter import TRANSCRIPTION_PROMPT
+    start = time.perf_counter()
+    text = await interpreter._call_vision_llm_async(image_url, TRANSCRIPTION_PROMPT)
+    return time.perf_counter() - start, text
+
+
+def run(image_format, live):
+    raw = phone_photo()
+    preprocessor = VisionImagePreprocessor(image_format=image_format)
+    payload = preprocessor.prepare(raw)
+    again = preprocessor.prepare(raw)
+
+    print(f"raw:          {len(raw) / 1024:8.1f} KB")
+    print(f"preprocessed: {payload['upload_bytes'] / 1024:8.1f} KB ({payload['mime_type']}, "
+          f"{payload['upload_size'][0]}x{payload['upload_size'][1]}, {payload['reduction']} smaller)")
+    print(f"preprocess:   {payload['preprocess_seconds'] * 1000:8.1f} ms (cached repeat: {again['cached']})")
+
+    if not live:
+        return
+    if not os.environ.get("HF_TOKEN"):
+        print("HF_TOKEN is not set; skipping live vision calls.")
+        return
+
+    from handwritten_note_interpreter import HandwrittenNoteInterpreter
+    interpreter = HandwrittenNoteInterpreter(hf_token=os.environ["HF_TOKEN"], use_cache=False)
+    raw_url = f"data:image/jpeg;base64,{base64.b64encode(raw).decode('utf-8')}"
+    raw_seconds, _ = asyncio.run(time_call(interpreter, raw_url))
+    prepared_seconds, _ = asyncio.run(time_call(interpreter, payload["data_url"]))
+    print(f"vision call raw:          {raw_seconds:.2f}s")
+    print(f"vision call preprocessed: {prepared_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=("JPEG", "WEBP"), default="JPEG")
+    parser.add_argument("--live", action="store_true", help="also time real vision calls (needs HF_TOKEN)")
+    args = parser.parse_args()
+    run(args.format, args.live)
@@ -0,0 +1,76 @@
+"""
+Benchmark: Supertonic synthesis on CPU through the warm session pool.
+
+Reports the one-off pipeline load time, the realtime factor (inference time /
+audio duration) of warm single utterances, and the throughput of concurrent
+short utterances with micro-batching on and off. Needs onnxruntime and the
+Supertonic models (SupertonicVoiceCloning.install_supertonic, or the manual
+git clone into ./supertonic).
+
+Usage:
+    python benchmarks/bench_voice_synthesis.py --utterances 16 --pool-size 2
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from voice_synthesis import VoiceSynthesisEngine, models_available
+
+SENTENCES = [
+    "The court will now hear argument on the motion to dismiss.",
+    "Please state your full name for the record.",
+    "Objection, your honor, the question calls for speculation.",
+    "The witness may step down.",
+    "Counsel, approach the bench.",
+    "The contract was executed on the fifteenth of March.",
+    "Exhibit twelve is admitted into evidence.",
+    "We will take a fifteen minute recess.",
+]
+
+
+def concurrent_run(engine, utterances):
+    texts = [SENTENCES[i % len(SENTENCES)] for i in range(utterances)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=utterances) as pool:
+        results = list(pool.map(engine.synthesize, texts))
+    seconds = time.perf_counter() - start
+    audio_seconds = sum(len(audio) / rate for audio, rate in results)
+    return seconds, audio_seconds
+
+
+def run(utterances, pool_size, steps):
+    if not models_available():
+        print("Supertonic models or onnxruntime not found; install them first.")
+        return
+
+    for label, max_batch in (("micro-batching", 8), ("no batching", 1)):
+        engine = VoiceSynthesisEngine(pool_size=pool_size, max_batch=max_batch)
+        start = time.perf_counter()
+        engine.warm_up()
+        print(f"[{label}] loaded {pool_size} pipelines in {time.perf_counter() - start:.2f}s "
+              f"({engine.intra_op_threads} intra-op threads each)")
+
+        start = time.perf_counter()
+        audio, rate = engine.synthesize(SENTENCES[0], total_steps=steps)
+        seconds = time.perf_counter() - start
+        print(f"[{label}] warm single utterance: {len(audio) / rate:.2f}s audio in {seconds:.3f}s "
+              f"(RTF {seconds / (len(audio) / rate):.3f})")
+
+        seconds, audio_seconds = concurrent_run(engine, utterances)
+        stats = engine.get_stats()
+        print(f"[{label}] {utterances} concurrent utterances: {seconds:.2f}s wall, "
+              f"RTF {seconds / audio_seconds:.3f}, avg batch {stats['avg_batch_size']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--utterances", type=int, default=16)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--steps", type=int, default=5)
+    args = parser.parse_args()
+    run(args.utterances, args.pool_size, args.steps)
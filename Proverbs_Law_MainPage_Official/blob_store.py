@@ -0,0 +1,152 @@
+# blob_store.py
+
+"""
+Content-addressed blob store for case documents and audio recordings.
+
+Blobs live under <root>/<aa>/<bb>/<sha256>, where aa and bb are the first two
+byte pairs of the hex digest. Reference counts are kept in the `blobs` table
+of the application database so that identical uploads are stored once and
+unreferenced blobs can be garbage collected.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from database_manager import DatabaseManager
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+STALE_TMP_SECONDS = 3600
+# Deployments point this at a data volume; the default is git-ignored
+DEFAULT_ROOT = os.environ.get(
+    "PROVERBS_DOCUMENT_STORE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "document_store")
+)
+
+
+class BlobStore:
+    def __init__(self, root: Optional[str] = None, db_manager: Optional[DatabaseManager] = None):
+        self.root = root or DEFAULT_ROOT
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.db_manager = db_manager or DatabaseManager()
+
+    def path_for(self, sha256: str) -> str:
+        """Returns the sharded on-disk path for a digest."""
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.isfile(self.path_for(sha256))
+
+    def ingest_stream(self, stream: BinaryIO) -> Dict[str, Any]:
+        """
+        Hashes a binary stream chunk by chunk while spooling it to a temp file,
+        then moves it into place unless an identical blob already exists.
+        Each call adds one reference to the resulting blob.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            sha256 = hasher.hexdigest()
+
+            # The reference and the file are placed under one write lock;
+            # collect_garbage() deletes row and file under the same lock, so
+            # it can never unlink a blob that an ingest has just referenced.
+            blob_path = self.path_for(sha256)
+            with self.db_manager.transaction() as conn:
+                self._add_ref(conn, sha256, size)
+                deduplicated = os.path.isfile(blob_path)
+                if not deduplicated:
+                    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                    os.replace(tmp_path, blob_path)
+            return {"sha256": sha256, "size": size, "path": blob_path, "deduplicated": deduplicated}
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def ingest_file(self, file_path: str) -> Dict[str, Any]:
+        """Ingests a file from disk. See ingest_stream."""
+        with open(file_path, "rb") as f:
+            return self.ingest_stream(f)
+
+    def ingest_bytes(self, data: bytes) -> Dict[str, Any]:
+        """Ingests an in-memory payload. See ingest_stream."""
+        return self.ingest_stream(io.BytesIO(data))
+
+    def _add_ref(self, conn, sha256: str, size: int):
+        conn.execute(
+            "INSERT INTO blobs (sha256, size, ref_count, created_at) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(sha256) DO UPDATE SET ref_count = ref_count + 1",
+            (sha256, size, datetime.now().isoformat())
+        )
+
+    def add_ref(self, sha256: str) -> bool:
+        """Adds a reference to an existing blob."""
+        return self.db_manager.execute_non_query(
+            "UPDATE blobs SET ref_count = ref_count + 1 WHERE sha256 = ?", (sha256,)
+        ) > 0
+
+    def release(self, sha256: str) -> bool:
+        """Drops one reference. The blob is only removed by collect_garbage()."""
+        return self.db_manager.execute_non_query(
+            "UPDATE blobs SET ref_count = ref_count - 1 WHERE sha256 = ? AND ref_count > 0", (sha256,)
+        ) > 0
+
+    def get_blob(self, sha256: str) -> Optional[Dict[str, Any]]:
+        result = self.db_manager.execute_query("SELECT * FROM blobs WHERE sha256 = ?", (sha256,))
+        if result:
+            blob = result[0]
+            blob["path"] = self.path_for(sha256)
+            return blob
+        return None
+
+    def collect_garbage(self) -> Dict[str, Any]:
+        """Deletes every blob whose reference count has dropped to zero."""
+        removed: List[str] = []
+        freed = 0
+        candidates = self.db_manager.execute_query("SELECT sha256, size FROM blobs WHERE ref_count <= 0")
+        for blob in candidates:
+            blob_path = self.path_for(blob["sha256"])
+            # Re-check the count and unlink inside one write transaction, so a
+            # blob re-referenced since the SELECT above (or by an ingest that
+            # is placing its file right now) survives with its file.
+            with self.db_manager.transaction() as conn:
+                deleted = conn.execute(
+                    "DELETE FROM blobs WHERE sha256 = ? AND ref_count <= 0", (blob["sha256"],)
+                ).rowcount
+                if not deleted:
+                    continue
+                try:
+                    os.remove(blob_path)
+                except FileNotFoundError:
+                    pass
+            removed.append(blob["sha256"])
+            freed += blob["size"]
+
+        # Leftovers from ingests that crashed before their rename. Recent
+        # files may belong to an ingest that is still running.
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for entry in os.scandir(self.tmp_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # finished (renamed or cleaned up) while we looked
+
+        return {"removed": len(removed), "bytes_freed": freed, "sha256": removed}
+
+    def get_stats(self) -> Dict[str, Any]:
+        result = self.db_manager.execute_query(
+            "SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS bytes, "
+            "COALESCE(SUM(ref_count), 0) AS ref_count FROM blobs"
+        )
+        return result[0] if result else {"blobs": 0, "bytes": 0, "ref_count": 0}
@@ -1,31 +1,175 @@
 # case_management_module.py
 
-from typing import List, Dict, Any, Optional
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from database_manager import DatabaseManager
+from blob_store import BlobStore
+
+# cache_versions row bumped by every write to cases, case_notes or case_documents
+CACHE_VERSION_SCOPE = "cases"
+
+
+class CaseRecordCache:
+    """
+    Bounded LRU cache for case, note and document rows.
+
+    Keys are (kind, id) tuples, e.g. ("case", 3) for a single case row or
+    ("case_notes", 3) for the list of notes attached to case 3. Values are
+    deep-copied on the way in and out so callers can never mutate cached rows.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, int], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, key: int) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((kind, key))
+            self.hits += 1
+            return copy.deepcopy(entry)
+
+    def set(self, kind: str, key: int, value: Any):
+        with self._lock:
+            self._entries[(kind, key)] = copy.deepcopy(value)
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def append(self, kind: str, key: int, row: Dict[str, Any]):
+        """Appends a row to a cached list, if that list is currently cached."""
+        with self._lock:
+            rows = self._entries.get((kind, key))
+            if rows is not None:
+                rows.append(copy.deepcopy(row))
+                self._entries.move_to_end((kind, key))
+
+    def invalidate(self, kind: str, key: int):
+        with self._lock:
+            self._entries.pop((kind, key), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{(self.hits / total * 100) if total else 0.0:.2f}%"
+        }
+
 
 class CaseManager:
-    def __init__(self, db_name: str = "proverbs_legal_ai.db"):
-        self.db_manager = DatabaseManager(db_name=db_name)
+    def __init__(self, db_name: str = "proverbs_legal_ai.db", cache_size: int = 1024, blob_root: Optional[str] = None):
+        self.db_manager = DatabaseManager(db_name=db_name, persistent=True)
+        self.blob_store = BlobStore(root=blob_root, db_manager=self.db_manager)
+        self.cache = CaseRecordCache(max_size=cache_size)
+        self._version_lock = threading.Lock()
+        self._data_version = self.db_manager.data_version()
+        self._cases_version = self._read_cases_version()
+
+    def _read_cases_version(self) -> Optional[int]:
+        rows = self.db_manager.execute_query(
+            "SELECT version FROM cache_versions WHERE name = ?", (CACHE_VERSION_SCOPE,)
+        )
+        return rows[0]["version"] if rows else None
+
+    def _check_external_writes(self):
+        """
+        Drops the cache if another worker has changed a case, note or
+        document since our last look. PRAGMA data_version (free to read)
+        says whether anyone committed anything; only then is the cases
+        counter read, so ingest jobs, sessions and conversation turns
+        written elsewhere leave the cache warm.
+        """
+        version = self.db_manager.data_version()
+        if version is not None and version == self._data_version:
+            return
+        self._data_version = version
+        cases_version = self._read_cases_version()
+        with self._version_lock:
+            if cases_version != self._cases_version:
+                self.cache.clear()
+                self._cases_version = cases_version
+
+    def _bump_version(self, conn):
+        """Bump the cases counter inside the caller's write transaction."""
+        conn.execute("UPDATE cache_versions SET version = version + 1 WHERE name = ?", (CACHE_VERSION_SCOPE,))
+        return conn.execute(
+            "SELECT version FROM cache_versions WHERE name = ?", (CACHE_VERSION_SCOPE,)
+        ).fetchone()[0]
+
+    def _note_own_write(self, version: int):
+        # Exactly one past ours means no other worker wrote in between, so
+        # the cache (which this write updates itself) is still good
+        with self._version_lock:
+            if self._cases_version is None or version != self._cases_version + 1:
+                self.cache.clear()
+            self._cases_version = version
+
+    def _write(self, query: str, params: tuple = ()) -> int:
+        """
+        execute_non_query for the case tables: returns lastrowid or rowcount,
+        and bumps the cases counter in the same transaction when a row changed.
+        """
+        with self.db_manager.transaction() as conn:
+            cursor = conn.execute(query, params)
+            result = cursor.lastrowid if query.strip().upper().startswith("INSERT") else cursor.rowcount
+            version = self._bump_version(conn) if cursor.rowcount > 0 else None
+        if version is not None:
+            self._note_own_write(version)
+        return result
 
     def create_case(self, title: str, description: str = "", status: str = "Open") -> Optional[Dict[str, Any]]:
         now = datetime.now().isoformat()
         try:
-            case_id = self.db_manager.execute_non_query(
+            case_id = self._write(
                 "INSERT INTO cases (title, description, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
                 (title, description, status, now, now)
             )
-            return self.get_case(case_id)
+            if not case_id:
+                return None
+            case = {
+                "case_id": case_id,
+                "title": title,
+                "description": description,
+                "status": status,
+                "created_at": now,
+                "updated_at": now
+            }
+            self.cache.set("case", case_id, case)
+            self.cache.set("case_notes", case_id, [])
+            self.cache.set("case_documents", case_id, [])
+            return case
         except Exception as e:
             print(f"Error creating case: {e}")
             return None
 
     def get_case(self, case_id: int) -> Optional[Dict[str, Any]]:
+        self._check_external_writes()
+        cached = self.cache.get("case", case_id)
+        if cached is not None:
+            return cached
         result = self.db_manager.execute_query("SELECT * FROM cases WHERE case_id = ?", (case_id,))
         if result:
+            self.cache.set("case", case_id, result[0])
             return result[0] # execute_query returns list of dicts
         return None
-    
+
     def list_cases(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
         if status:
             return self.db_manager.execute_query("SELECT * FROM cases WHERE status = ?", (status,))
@@ -45,7 +189,7 @@ class CaseManager:
         if status:
             updates.append("status = ?")
             params.append(status)
-        
+
         if not updates:
             return False
 
@@ -54,56 +198,138 @@ class CaseManager:
         params.append(case_id)
 
         try:
-            rows_affected = self.db_manager.execute_non_query(
+            rows_affected = self._write(
                 f"UPDATE cases SET {', '.join(updates)} WHERE case_id = ?", tuple(params)
             )
             return rows_affected > 0
         except Exception as e:
             print(f"Error updating case {case_id}: {e}")
             return False
+        finally:
+            self.cache.invalidate("case", case_id)
 
     def delete_case(self, case_id: int) -> bool:
         try:
-            rows_affected = self.db_manager.execute_non_query("DELETE FROM cases WHERE case_id = ?", (case_id,))
+            # Foreign keys are not enforced on our connections, so documents
+            # are removed here and their blob references released.
+            with self.db_manager.transaction() as conn:
+                rows_affected = conn.execute("DELETE FROM cases WHERE case_id = ?", (case_id,)).rowcount
+                documents = [dict(row) for row in conn.execute(
+                    "SELECT document_id, blob_sha256 FROM case_documents WHERE case_id = ?", (case_id,)
+                )]
+                conn.execute("DELETE FROM case_documents WHERE case_id = ?", (case_id,))
+                version = self._bump_version(conn)
+            self._note_own_write(version)
+            for document in documents:
+                self.cache.invalidate("document", document["document_id"])
+                if document["blob_sha256"]:
+                    self.blob_store.release(document["blob_sha256"])
             return rows_affected > 0
         except Exception as e:
             print(f"Error deleting case {case_id}: {e}")
             return False
+        finally:
+            self.cache.invalidate("case", case_id)
+            self.cache.invalidate("case_notes", case_id)
+            self.cache.invalidate("case_documents", case_id)
 
     def add_note_to_case(self, case_id: int, content: str) -> Optional[Dict[str, Any]]:
         now = datetime.now().isoformat()
         try:
-            note_id = self.db_manager.execute_non_query(
+            note_id = self._write(
                 "INSERT INTO case_notes (case_id, content, created_at) VALUES (?, ?, ?)",
                 (case_id, content, now)
             )
             if note_id:
-                result = self.db_manager.execute_query("SELECT * FROM case_notes WHERE note_id = ?", (note_id,))
-                if result:
-                    return result[0]
+                note = {"note_id": note_id, "case_id": case_id, "content": content, "created_at": now}
+                self.cache.append("case_notes", case_id, note)
+                return note
             return None
         except Exception as e:
             print(f"Error adding note to case {case_id}: {e}")
             return None
-            
+
     def get_notes_for_case(self, case_id: int) -> List[Dict[str, Any]]:
-        return self.db_manager.execute_query("SELECT * FROM case_notes WHERE case_id = ?", (case_id,))
+        self._check_external_writes()
+        cached = self.cache.get("case_notes", case_id)
+        if cached is not None:
+            return cached
+        notes = self.db_manager.execute_query("SELECT * FROM case_notes WHERE case_id = ?", (case_id,))
+        self.cache.set("case_notes", case_id, notes)
+        return notes
 
     def add_document_to_case(self, case_id: int, title: str, file_path: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Attaches a document to a case. Local files are ingested into the
+        content-addressed blob store, so re-uploading the same exhibit only
+        adds a reference; file_path then points at the stored blob.
+        """
         now = datetime.now().isoformat()
+        blob_sha256 = None
         try:
-            doc_id = self.db_manager.execute_non_query(
-                "INSERT INTO case_documents (case_id, title, file_path, uploaded_at) VALUES (?, ?, ?, ?)",
-                (case_id, title, file_path, now)
+            if file_path and os.path.isfile(file_path):
+                blob = self.blob_store.ingest_file(file_path)
+                blob_sha256 = blob["sha256"]
+                file_path = blob["path"]
+            doc_id = self._write(
+                "INSERT INTO case_documents (case_id, title, file_path, uploaded_at, blob_sha256) VALUES (?, ?, ?, ?, ?)",
+                (case_id, title, file_path, now, blob_sha256)
             )
             if doc_id:
-                result = self.db_manager.execute_query("SELECT * FROM case_documents WHERE document_id = ?", (doc_id,))
-                if result:
-                    return result[0]
+                document = {
+                    "document_id": doc_id,
+                    "case_id": case_id,
+                    "title": title,
+                    "file_path": file_path,
+                    "uploaded_at": now,
+                    "blob_sha256": blob_sha256
+                }
+                self.cache.set("document", doc_id, document)
+                self.cache.append("case_documents", case_id, document)
+                return document
+            if blob_sha256:
+                self.blob_store.release(blob_sha256)
             return None
         except Exception as e:
+            if blob_sha256:
+                self.blob_store.release(blob_sha256)
             print(f"Error adding document to case {case_id}: {e}")
             return None
 
+    def get_document(self, document_id: int) -> Optional[Dict[str, Any]]:
+        self._check_external_writes()
+        cached = self.cache.get("document", document_id)
+        if cached is not None:
+            return cached
+        result = self.db_manager.execute_query("SELECT * FROM case_documents WHERE document_id = ?", (document_id,))
+        if result:
+            self.cache.set("document", document_id, result[0])
+            return result[0]
+        return None
+
+    def delete_document(self, document_id: int) -> bool:
+        document = self.get_document(document_id)
+        if not document:
+            return False
+        try:
+            rows_affected = self._write(
+                "DELETE FROM case_documents WHERE document_id = ?", (document_id,)
+            )
+            if rows_affected and document["blob_sha256"]:
+                self.blob_store.release(document["blob_sha256"])
+            return rows_affected > 0
+        except Exception as e:
+            print(f"Error deleting document {document_id}: {e}")
+            return False
+        finally:
+            self.cache.invalidate("document", document_id)
+            self.cache.invalidate("case_documents", document["case_id"])
+
     def get_documents_for_case(self, case_id: int) -> List[Dict[str, Any]]:
-        return self.db_manager.execute_query("SELECT * FROM case_documents WHERE case_id = ?", (case_id,))
+        self._check_external_writes()
+        cached = self.cache.get("case_documents", case_id)
+        if cached is not None:
+            return cached
+        documents = self.db_manager.execute_query("SELECT * FROM case_documents WHERE case_id = ?", (case_id,))
+        self.cache.set("case_documents", case_id, documents)
+        return documents
@@ -0,0 +1,298 @@
+"""
+Conversation Context Engine for ProVerBs Law
+Token-budgeted chat context with an incrementally maintained rolling summary.
+
+Replaying the whole chat history into every prompt makes prompt tokens (and
+latency) grow with every turn. Instead, each request gets the most recent
+turns that fit the provider's history budget, verbatim, preceded by a
+summary of everything older.
+
+Summaries are keyed by a chained hash of the turns they cover, so any caller
+that can hand over the history (Gradio's chat history, a ConversationAgent's
+ring buffer) shares them without tracking sessions. Extending a summary is
+incremental (previous summary + the turns that just left the window) and
+runs on a background thread: a request never waits for it, and until it
+lands the newest summary that is already available is used.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from document_pipeline import estimate_tokens
+
+# Tokens of chat history (summary + recent turns) allowed per provider; the
+# system prompt, the new question and the reply come on top of this
+PROVIDER_HISTORY_BUDGETS = {
+    "huggingface": 3000,
+    "gpt4": 6000,
+    "gemini": 8000,
+    "perplexity": 3000,
+    "ninjaai": 3000,
+    "lmstudio": 2000,
+}
+DEFAULT_HISTORY_BUDGET = 3000
+DEFAULT_SUMMARY_TOKENS = 400
+DEFAULT_SUMMARY_CACHE_SIZE = 512
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a legal Q&A conversation. Keep the facts, "
+    "parties, dates, jurisdictions, amounts and conclusions that later questions "
+    "may rely on. Stay under {max_words} words.\n\n"
+    "Current summary:\n{summary}\n\nNew turns:\n{turns}"
+)
+
+_FIRST_SENTENCE = re.compile(r'^(.+?[.!?])(?:\s|$)', re.DOTALL)
+
+Turn = Tuple[str, str]  # (user message, assistant reply)
+
+
+def normalize_history(history) -> List[Turn]:
+    """
+    Accept Gradio history as [user, assistant] pairs or as role/content
+    message dicts, or ConversationAgent turn dicts; return (user, assistant) pairs.
+    """
+    turns: List[Turn] = []
+    pending_user = None
+    for item in history or ():
+        if isinstance(item, dict) and "role" in item:
+            if item["role"] == "user":
+                if pending_user is not None:
+                    turns.append((pending_user, ""))
+                pending_user = item.get("content") or ""
+            elif item["role"] == "assistant":
+                turns.append((pending_user or "", item.get("content") or ""))
+                pending_user = None
+        elif isinstance(item, dict):
+            turns.append((item.get("user") or "", item.get("assistant") or ""))
+        else:
+            user_msg, assistant_msg = item[0], item[1]
+            turns.append((user_msg or "", assistant_msg or ""))
+    if pending_user is not None:
+        turns.append((pending_user, ""))
+    return turns
+
+
+def _turn_tokens(turn: Turn) -> int:
+    return estimate_tokens(turn[0]) + estimate_tokens(turn[1])
+
+
+def _chain_hashes(turns: Sequence[Turn]) -> List[str]:
+    """hashes[k] identifies the first k turns; hashes[0] is the empty prefix."""
+    hashes = [""]
+    for user_msg, assistant_msg in turns:
+        hasher = hashlib.sha256(hashes[-1].encode("ascii"))
+        hasher.update(user_msg.encode("utf-8"))
+        hasher.update(b"\x1f")
+        hasher.update(assistant_msg.encode("utf-8"))
+        hashes.append(hasher.hexdigest())
+    return hashes
+
+
+def extractive_summary(summary: str, turns: Sequence[Turn], max_tokens: int = DEFAULT_SUMMARY_TOKENS) -> str:
+    """
+    LLM-free summary update: one line per turn with the question and the
+    first sentence of the answer. When over budget the oldest lines go first.
+    """
+    lines = summary.splitlines() if summary else []
+    for user_msg, assistant_msg in turns:
+        answer = assistant_msg.strip()
+        match = _FIRST_SENTENCE.match(answer)
+        answer = (match.group(1) if match else answer)[:300]
+        lines.append(f"- Q: {' '.join(user_msg.split())[:200]} A: {' '.join(answer.split())}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+@dataclass
+class ContextWindow:
+    """Chat context for one request."""
+    summary: str
+    recent_turns: List[Turn]
+    summarized_turns: int
+    prompt_tokens: int
+    full_history_tokens: int
+    budget: int
+    omitted_turns: int = 0  # left the window but not yet in the summary
+
+    @property
+    def saved_tokens(self) -> int:
+        return max(0, self.full_history_tokens - self.prompt_tokens)
+
+    def to_messages(self) -> List[Dict[str, str]]:
+        """Chat-completion messages to place between the system prompt and the new question."""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        for user_msg, assistant_msg in self.recent_turns:
+            if user_msg:
+                messages.append({"role": "user", "content": user_msg})
+            if assistant_msg:
+                messages.append({"role": "assistant", "content": assistant_msg})
+        return messages
+
+    def to_text(self) -> str:
+        """Plain-text rendering for providers that take a single prompt."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation:\n{self.summary}")
+        for i, (user_msg, assistant_msg) in enumerate(self.recent_turns, 1):
+            parts.append(f"[Turn {i}]\nQ: {user_msg}\nA: {assistant_msg}")
+        return "\n\n".join(parts)
+
+
+class ConversationContextEngine:
+    """
+    Builds token-budgeted chat context.
+
+    summarize_fn(prompt) -> str may call an LLM; it runs on a single
+    background thread. Without it, summaries are extractive.
+    """
+
+    def __init__(self, summarize_fn: Optional[Callable[[str], str]] = None,
+                 summary_max_tokens: int = DEFAULT_SUMMARY_TOKENS,
+                 cache_size: int = DEFAULT_SUMMARY_CACHE_SIZE,
+                 budgets: Optional[Dict[str, int]] = None):
+        self.summarize_fn = summarize_fn
+        self.summary_max_tokens = summary_max_tokens
+        self.cache_size = cache_size
+        self.budgets = budgets or PROVIDER_HISTORY_BUDGETS
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()  # prefix hash -> summary
+        self._pending = set()  # prefix hashes being summarized
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="context-summary")
+        self.stats = {"requests": 0, "prompt_tokens": 0, "full_history_tokens": 0, "summaries_built": 0}
+
+    def budget_for(self, provider: str) -> int:
+        return self.budgets.get(provider, DEFAULT_HISTORY_BUDGET)
+
+    def _get_summary(self, prefix_hash: str) -> Optional[str]:
+        with self._lock:
+            summary = self._summaries.get(prefix_hash)
+            if summary is not None:
+                self._summaries.move_to_end(prefix_hash)
+            return summary
+
+    def _store_summary(self, prefix_hash: str, summary: str):
+        with self._lock:
+            self._summaries[prefix_hash] = summary
+            self._summaries.move_to_end(prefix_hash)
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+            self.stats["summaries_built"] += 1
+
+    def _summarize(self, base_summary: str, new_turns: Sequence[Turn]) -> str:
+        if self.summarize_fn is None:
+            return extractive_summary(base_summary, new_turns, self.summary_max_tokens)
+        turns_text = "\n".join(f"Q: {u}\nA: {a}" for u, a in new_turns)
+        prompt = SUMMARY_PROMPT.format(max_words=self.summary_max_tokens * 3 // 4,
+                                       summary=base_summary or "(none)", turns=turns_text)
+        try:
+            return self.summarize_fn(prompt).strip()
+        except Exception as e:
+            print(f"Context summary error, using extractive summary: {str(e)}")
+            return extractive_summary(base_summary, new_turns, self.summary_max_tokens)
+
+    def _extend_summary(self, hashes: List[str], turns: List[Turn], base_k: int, target_k: int):
+        try:
+            summary = self._get_summary(hashes[base_k]) if base_k else ""
+            self._store_summary(hashes[target_k], self._summarize(summary or "", turns[base_k:target_k]))
+        finally:
+            with self._lock:
+                self._pending.discard(hashes[target_k])
+
+    def _schedule(self, hashes: List[str], turns: List[Turn], base_k: int, target_k: int):
+        with self._lock:
+            if hashes[target_k] in self._pending:
+                return
+            self._pending.add(hashes[target_k])
+        self._executor.submit(self._extend_summary, hashes, list(turns), base_k, target_k)
+
+    def build(self, history, provider: str = "huggingface", budget: Optional[int] = None) -> ContextWindow:
+        """
+        Context for the next request: a summary of older turns plus as many
+        recent turns as fit in the budget. Never blocks on summarization.
+        """
+        turns = normalize_history(history)
+        budget = budget or self.budget_for(provider)
+        turn_tokens = [_turn_tokens(turn) for turn in turns]
+        full_tokens = sum(turn_tokens)
+
+        if full_tokens <= budget:
+            window = ContextWindow("", turns, 0, full_tokens, full_tokens, budget)
+            self._record(window)
+            return window
+
+        # Newest turns first, keeping room for the summary
+        recent_budget = budget - self.summary_max_tokens
+        start, used = len(turns), 0
+        while start > 0 and used + turn_tokens[start - 1] <= recent_budget:
+            start -= 1
+            used += turn_tokens[start]
+        recent = turns[start:]
+        if not recent and turns:
+            # A single turn larger than the budget: keep it, trimmed from the top
+            user_msg, assistant_msg = turns[-1]
+            keep_chars = max(0, (recent_budget - estimate_tokens(user_msg)) * 4)
+            recent = [(user_msg, assistant_msg[-keep_chars:] if keep_chars else "")]
+            start = len(turns) - 1
+            used = _turn_tokens(recent[0])
+
+        # Best summary already available for some prefix of turns[:start]
+        hashes = _chain_hashes(turns[:start])
+        summary, covered = "", 0
+        for k in range(start, 0, -1):
+            cached = self._get_summary(hashes[k])
+            if cached is not None:
+                summary, covered = cached, k
+                break
+        if covered < start:
+            self._schedule(hashes, turns, covered, start)
+
+        window = ContextWindow(
+            summary=summary,
+            recent_turns=recent,
+            summarized_turns=covered,
+            prompt_tokens=used + (estimate_tokens(summary) if summary else 0),
+            full_history_tokens=full_tokens,
+            budget=budget,
+            omitted_turns=start - covered
+        )
+        self._record(window)
+        return window
+
+    def _record(self, window: ContextWindow):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_tokens"] += window.prompt_tokens
+            self.stats["full_history_tokens"] += window.full_history_tokens
+
+    def wait_for_summaries(self, timeout: Optional[float] = None):
+        """Block until queued summary updates finish (benchmarks and shutdown)."""
+        self._executor.submit(lambda: None).result(timeout)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["cached_summaries"] = len(self._summaries)
+        full = stats["full_history_tokens"]
+        stats["token_reduction"] = f"{(1 - stats['prompt_tokens'] / full) * 100 if full else 0.0:.1f}%"
+        return stats
+
+
+_context_engine = None
+_context_engine_lock = threading.Lock()
+
+
+def get_context_engine() -> ConversationContextEngine:
+    """Process-wide context engine shared by the chat UI and the conversation agent."""
+    global _context_engine
+    with _context_engine_lock:
+        if _context_engine is None:
+            _context_engine = ConversationContextEngine()
+        return _context_engine
@@ -6,6 +6,11 @@ Handles Q&A interactions with text-to-speech capabilities
 import asyncio
 import io
 import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import tempfile
@@ -18,6 +23,109 @@ except ImportError:
 import numpy as np
 import soundfile as sf
 
+from utils.tts_cache import get_tts_cache
+
+# Edge TTS accepts at most this many characters per request
+MAX_TTS_CHARS = 2000
+# Sentences shorter than this are merged with the next one: fewer requests,
+# and more natural prosody than reading "Yes." on its own
+MIN_SPEECH_CHARS = 60
+DEFAULT_TTS_CONCURRENCY = 3
+
+# Turns kept in memory per session; older ones fall off the ring buffer
+DEFAULT_MAX_HISTORY = 50
+DEFAULT_MAX_SESSIONS = 1000
+DEFAULT_SESSION_IDLE_SECONDS = 30 * 60
+
+# Terminal punctuation (optionally closed by a quote or bracket) followed by whitespace
+SENTENCE_END = re.compile(r'[.!?]["\')\]]*\s+|\n\s*\n')
+# Periods that usually do not end a sentence in legal text
+ABBREVIATIONS = frozenset({
+    "v", "vs", "no", "nos", "art", "sec", "secs", "para", "cf", "e.g", "i.e", "etc", "inc", "ltd",
+    "co", "corp", "mr", "mrs", "ms", "dr", "st", "jr", "sr", "u.s", "u.s.c", "f", "f.2d", "f.3d",
+    "f.supp", "supp", "ct", "cir", "app", "id", "ibid", "ch", "pp", "p", "vol", "ed", "rev", "stat"
+})
+
+
+class SentenceSegmenter:
+    """
+    Splits a stream of text chunks into speakable sentences.
+    feed() returns the sentences completed by the new chunk; flush()
+    returns whatever is left once the stream ends.
+    """
+
+    def __init__(self, min_chars: int = MIN_SPEECH_CHARS, max_chars: int = MAX_TTS_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._pending = ""  # complete sentences waiting to reach min_chars
+
+    def _is_boundary(self, text: str, end: int) -> bool:
+        if text[end - 1] != ".":
+            return True
+        words = text[:end - 1].rsplit(None, 1)
+        word = words[-1].lower().lstrip("(\"'") if words else ""
+        # "42 U.S.C." and "Smith v. Jones" are not sentence ends; neither is a lone initial
+        return not (word in ABBREVIATIONS or len(word) == 1)
+
+    def feed(self, chunk: str) -> List[str]:
+        self._buffer += chunk
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            if not self._is_boundary(self._buffer, match.start() + 1):
+                continue
+            sentences.extend(self._add(self._buffer[start:match.end()]))
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        if len(self._buffer) > self.max_chars:
+            # No boundary in a very long run of text: cut it at whitespace
+            pieces = split_for_tts(self._buffer, self.max_chars)
+            self._buffer = pieces.pop()
+            for piece in pieces:
+                sentences.extend(self._add(piece + " "))
+        return sentences
+
+    def _add(self, sentence: str) -> List[str]:
+        self._pending += sentence
+        if len(self._pending.strip()) < self.min_chars:
+            return []
+        ready, self._pending = self._pending, ""
+        return split_for_tts(ready, self.max_chars)
+
+    def flush(self) -> List[str]:
+        remainder = (self._pending + self._buffer).strip()
+        self._pending = self._buffer = ""
+        return split_for_tts(remainder, self.max_chars) if remainder else []
+
+
+def split_for_tts(text: str, max_chars: int = MAX_TTS_CHARS) -> List[str]:
+    """
+    Split text into pieces of at most max_chars, preferring sentence
+    boundaries, then whitespace, so nothing is dropped.
+    """
+    pieces = []
+    text = text.strip()
+    while len(text) > max_chars:
+        window = text[:max_chars]
+        cut = max((m.end() for m in SENTENCE_END.finditer(window)), default=0)
+        if cut < max_chars // 2:
+            cut = window.rfind(" ")
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def new_audio_path() -> str:
+    """A fresh temp file for one synthesized reply, so concurrent requests never share one."""
+    fd, path = tempfile.mkstemp(prefix="proverbs_tts_", suffix=".mp3")
+    os.close(fd)
+    return path
+
 
 class ConversationAgent:
     """
@@ -29,7 +137,10 @@ class ConversationAgent:
     - Audio file generation
     """
 
-    def __init__(self, voice: str = "en-US-AriaNeural", rate: float = 1.0, pitch: int = 0):
+    def __init__(self, voice: str = "en-US-AriaNeural", rate: float = 1.0, pitch: int = 0,
+                 tts_concurrency: int = DEFAULT_TTS_CONCURRENCY, use_tts_cache: bool = True,
+                 session_id: Optional[str] = None, max_history: int = DEFAULT_MAX_HISTORY,
+                 store: Optional["ConversationStore"] = None):
         """
         Initialize conversation agent
 
@@ -37,12 +148,28 @@ class ConversationAgent:
             voice: Edge TTS voice (default: Aria, US English)
             rate: Speech rate (0.5-2.0, default 1.0)
             pitch: Pitch adjustment (-20 to 20, default 0)
+            tts_concurrency: Max Edge TTS requests in flight per response
+            use_tts_cache: Reuse audio already synthesized for the same text and voice
+            session_id: Session this agent serves (default: a timestamp)
+            max_history: Turns kept in memory
+            store: Optional ConversationStore that persists turns
         """
         self.voice = voice
         self.rate = rate
         self.pitch = pitch
-        self.conversation_history: List[Dict] = []
-        self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.tts_concurrency = tts_concurrency
+        self.tts_cache = get_tts_cache() if use_tts_cache else None
+        self.session_id = session_id or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.store = store
+        self._history_lock = threading.Lock()
+        self.conversation_history: deque = deque(maxlen=max_history)
+        # Newest stored turn_id this history reflects, and the store's
+        # data_version when that was last checked (see sync_history)
+        self._last_turn_id: Optional[int] = None
+        self._synced_version: Optional[int] = None
+        if store is not None:
+            self._synced_version = store.data_version()
+            self.reload_history()
         self.tts_available = edge_tts is not None
 
         # Available voices (popular options)
@@ -56,58 +183,229 @@ class ConversationAgent:
 
     def add_turn(self, user_query: str, assistant_response: str, mode: str = "general", ai_provider: str = "huggingface"):
         """Add a conversation turn to history"""
-        self.conversation_history.append({
+        turn = {
             "timestamp": datetime.now().isoformat(),
             "user": user_query,
             "assistant": assistant_response,
             "mode": mode,
             "ai_provider": ai_provider
-        })
+        }
+        with self._history_lock:
+            self.conversation_history.append(turn)
+        if self.store is not None:
+            previous, turn_id = self.store.save_turn(self.session_id, turn, keep=self.conversation_history.maxlen)
+            with self._history_lock:
+                if previous == self._last_turn_id:
+                    self._last_turn_id = turn_id
+                    return
+            # Another worker wrote to this session since we last looked
+            self.reload_history()
+
+    def get_conversation_context(self, max_turns: Optional[int] = None, provider: str = "huggingface") -> str:
+        """
+        Get formatted conversation context for follow-up questions: a rolling
+        summary of older turns plus the recent turns that fit the provider's
+        token budget (optionally only the last max_turns turns)
+        """
+        from context_engine import get_context_engine
 
-    def get_conversation_context(self, max_turns: int = 5) -> str:
-        """Get formatted conversation context for follow-up questions"""
-        if not self.conversation_history:
+        with self._history_lock:
+            history = list(self.conversation_history)
+        if max_turns:
+            history = history[-max_turns:]
+        if not history:
             return ""
 
-        recent_turns = self.conversation_history[-max_turns:]
-        context = "Previous conversation context:\n"
-
-        for i, turn in enumerate(recent_turns, 1):
-            context += f"\n[Turn {i}]\nQ: {turn['user']}\nA: {turn['assistant'][:200]}...\n"
-
-        return context
+        window = get_context_engine().build(history, provider)
+        return "Previous conversation context:\n\n" + window.to_text()
+
+    def reload_history(self):
+        """Replace the in-memory turns with the store's, e.g. after another worker added some."""
+        if self.store is None:
+            return
+        # Marker first: a turn committed in between makes the next sync
+        # reload again rather than go unnoticed
+        latest = self.store.latest_turn_id(self.session_id)
+        turns = self.store.load_turns(self.session_id, self.conversation_history.maxlen)
+        with self._history_lock:
+            self.conversation_history.clear()
+            self.conversation_history.extend(turns)
+            self._last_turn_id = latest
+
+    def sync_history(self):
+        """
+        Reload turns only if another worker changed this session. Free when
+        nothing at all was committed elsewhere (data_version); otherwise one
+        indexed MAX(turn_id) lookup for this session decides.
+        """
+        if self.store is None:
+            return
+        version = self.store.data_version()
+        if version is not None and version == self._synced_version:
+            return
+        if self.store.latest_turn_id(self.session_id) != self._last_turn_id:
+            self.reload_history()
+        self._synced_version = version
 
     def clear_history(self):
         """Clear conversation history"""
-        self.conversation_history = []
+        with self._history_lock:
+            self.conversation_history.clear()
+            self._last_turn_id = None
+        if self.store is not None:
+            self.store.delete_session(self.session_id)
 
     def get_history_summary(self) -> Dict:
         """Get summary statistics of conversation"""
+        with self._history_lock:
+            history = list(self.conversation_history)
         return {
-            "total_turns": len(self.conversation_history),
+            "total_turns": len(history),
             "session_id": self.session_id,
-            "first_turn": self.conversation_history[0]["timestamp"] if self.conversation_history else None,
-            "last_turn": self.conversation_history[-1]["timestamp"] if self.conversation_history else None,
-            "ai_providers_used": list(set(turn["ai_provider"] for turn in self.conversation_history)),
-            "modes_used": list(set(turn["mode"] for turn in self.conversation_history))
+            "first_turn": history[0]["timestamp"] if history else None,
+            "last_turn": history[-1]["timestamp"] if history else None,
+            "ai_providers_used": list(set(turn["ai_provider"] for turn in history)),
+            "modes_used": list(set(turn["mode"] for turn in history))
         }
 
+    def _voice_settings(self, voice: Optional[str] = None, rate: Optional[float] = None,
+                        pitch: Optional[int] = None) -> Tuple[str, float, int]:
+        """(voice, rate, pitch) for one request; overrides never change the agent's defaults."""
+        return (voice or self.voice, self.rate if rate is None else rate, self.pitch if pitch is None else pitch)
+
+    def _communicate(self, text: str, settings: Tuple[str, float, int]):
+        voice_name, rate, pitch = settings
+        return edge_tts.Communicate(
+            text=text,
+            voice=voice_name,
+            rate=f"{rate:+.0%}".replace("+", "+") if rate != 1.0 else "+0%",
+            pitch=f"{pitch:+d}Hz" if pitch != 0 else "+0Hz"
+        )
+
+    def audio_cache_key(self, text: str, voice: Optional[str] = None, rate: Optional[float] = None,
+                        pitch: Optional[int] = None) -> str:
+        """TTS cache key for text spoken with these settings (the agent's defaults where omitted)."""
+        return self.tts_cache.key(text, *self._voice_settings(voice, rate, pitch))
+
+    async def cache_speech(self, text: str, voice: Optional[str] = None, rate: Optional[float] = None,
+                           pitch: Optional[int] = None) -> Optional[str]:
+        """
+        Make sure the TTS cache holds text spoken with these settings and
+        return its key. A hit only checks the entry; the audio is never read
+        back, since the caller serves it from the cache by key.
+        """
+        if self.tts_cache is None or not self.tts_available or not text or not text.strip():
+            return None
+        settings = self._voice_settings(voice, rate, pitch)
+        key = self.tts_cache.key(text, *settings)
+        if self.tts_cache.get_path(key) is None:
+            self.tts_cache.set(key, await self._synthesize_pieces(split_for_tts(text), settings))
+        return key
+
+    async def _synthesize(self, text: str, settings: Tuple[str, float, int]) -> bytes:
+        """Synthesize one piece of at most MAX_TTS_CHARS characters to MP3 bytes."""
+        if self.tts_cache is None:
+            return await self._synthesize_uncached(text, settings)
+        key = self.tts_cache.key(text, *settings)
+        audio = self.tts_cache.get(key)
+        if audio is None:
+            audio = await self._synthesize_uncached(text, settings)
+            self.tts_cache.set(key, audio)
+        return audio
+
+    async def _stream_audio(self, text: str, settings: Tuple[str, float, int]):
+        """Edge TTS audio chunks for one piece, as they arrive over the websocket."""
+        async for message in self._communicate(text, settings).stream():
+            if message["type"] == "audio":
+                yield message["data"]
+
+    async def _synthesize_uncached(self, text: str, settings: Tuple[str, float, int]) -> bytes:
+        buffer = io.BytesIO()
+        async for chunk in self._stream_audio(text, settings):
+            buffer.write(chunk)
+        return buffer.getvalue()
+
+    async def iter_speech(self, text: str, voice: Optional[str] = None, rate: Optional[float] = None,
+                          pitch: Optional[int] = None, chunk_size: int = 64 * 1024):
+        """
+        Async generator of MP3 bytes for text, without touching disk.
+
+        Cached audio is replayed in chunk_size pieces. Otherwise the first
+        piece is relayed chunk by chunk as Edge TTS produces it, while the
+        remaining pieces are synthesized concurrently and follow in order.
+        The complete audio is added to the TTS cache afterwards.
+        """
+        if not self.tts_available or not text or not text.strip():
+            return
+        settings = self._voice_settings(voice, rate, pitch)
+        key = self.tts_cache.key(text, *settings) if self.tts_cache is not None else None
+        cached = self.tts_cache.get(key) if key else None
+        if cached is not None:
+            for start in range(0, len(cached), chunk_size):
+                yield cached[start:start + chunk_size]
+            return
+
+        first, *rest = split_for_tts(text)
+        semaphore = asyncio.Semaphore(max(1, self.tts_concurrency - 1))
+
+        async def bounded(piece):
+            async with semaphore:
+                return await self._synthesize_uncached(piece, settings)
+
+        prefetch = [asyncio.ensure_future(bounded(piece)) for piece in rest]
+        buffer = io.BytesIO()
+        try:
+            async for chunk in self._stream_audio(first, settings):
+                buffer.write(chunk)
+                yield chunk
+            for task in prefetch:
+                audio = await task
+                buffer.write(audio)
+                for start in range(0, len(audio), chunk_size):
+                    yield audio[start:start + chunk_size]
+        finally:
+            for task in prefetch:
+                task.cancel()
+        if key:
+            self.tts_cache.set(key, buffer.getvalue())
+
+    async def _synthesize_pieces(self, pieces: List[str], settings: Tuple[str, float, int]) -> bytes:
+        semaphore = asyncio.Semaphore(self.tts_concurrency)
+
+        async def bounded(piece):
+            async with semaphore:
+                # The caller caches the joined audio, so pieces bypass the cache
+                return await self._synthesize_uncached(piece, settings)
+
+        # MP3 frames are self-delimiting, so the segments concatenate cleanly
+        return b"".join(await asyncio.gather(*(bounded(piece) for piece in pieces)))
+
     async def text_to_speech(
         self,
         text: str,
         output_path: Optional[str] = None,
-        voice: Optional[str] = None
+        voice: Optional[str] = None,
+        rate: Optional[float] = None,
+        pitch: Optional[int] = None
     ) -> Tuple[Optional[bytes], Optional[str]]:
         """
         Convert text to speech using Edge TTS
 
+        Text longer than one Edge TTS request is split at sentence
+        boundaries and the pieces are synthesized concurrently. Nothing is
+        written to disk unless output_path is given; callers that need a
+        file should pass a path of their own (e.g. from new_audio_path()),
+        since any shared path can be overwritten by a concurrent request.
+
         Args:
             text: Text to convert
-            output_path: Optional path to save audio file
+            output_path: Optional path to save the audio file to
             voice: Optional voice override
+            rate: Optional speech rate override
+            pitch: Optional pitch override
 
         Returns:
-            Tuple of (audio_bytes, output_file_path)
+            Tuple of (audio_bytes, output_path or None)
         """
         if not self.tts_available:
             return None, None
@@ -116,29 +414,21 @@ class ConversationAgent:
             return None, None
 
         try:
-            voice_name = voice or self.voice
-
-            # Sanitize text to max 2000 characters (Edge TTS limit per request)
-            text = text[:2000]
-
-            # Create temporary file if no output path specified
-            if output_path is None:
-                output_path = os.path.join(tempfile.gettempdir(), f"proverbs_tts_{self.session_id}.mp3")
-
-            # Format voice string for edge-tts
-            communicate = edge_tts.Communicate(
-                text=text,
-                voice=voice_name,
-                rate=f"{self.rate:+.0%}".replace("+", "+") if self.rate != 1.0 else "+0%",
-                pitch=f"{self.pitch:+d}Hz" if self.pitch != 0 else "+0Hz"
-            )
-
-            # Save to file
-            await communicate.save(output_path)
-
-            # Read file as bytes
-            with open(output_path, 'rb') as f:
-                audio_bytes = f.read()
+            settings = self._voice_settings(voice, rate, pitch)
+
+            if self.tts_cache is not None:
+                key = self.tts_cache.key(text, *settings)
+                audio_bytes = self.tts_cache.get(key)
+                if audio_bytes is None:
+                    audio_bytes = await self._synthesize_pieces(split_for_tts(text), settings)
+                    self.tts_cache.set(key, audio_bytes)
+            else:
+                audio_bytes = await self._synthesize_pieces(split_for_tts(text), settings)
+
+            # Never the cache's own file: eviction may unlink it at any time
+            if output_path is not None:
+                with open(output_path, 'wb') as f:
+                    f.write(audio_bytes)
 
             return audio_bytes, output_path
 
@@ -201,19 +491,29 @@ class ConversationAgent:
         self,
         text_generator,
         enable_audio: bool = True,
-        voice: Optional[str] = None
+        voice: Optional[str] = None,
+        pipelined: bool = False
     ):
         """
-        Stream text response and generate audio when complete
+        Stream text response and generate audio
 
         Args:
-            text_generator: Generator yielding text chunks
+            text_generator: Async generator yielding text chunks
             enable_audio: Whether to generate audio
             voice: Optional voice override
+            pipelined: Synthesize sentence by sentence while text is still
+                streaming, instead of once the full response is in
 
         Returns:
-            Generator yielding (text_chunk, audio_data, is_complete)
+            Generator yielding (text_chunk, audio_data, is_complete).
+            In pipelined mode each audio_data is one sentence's MP3 segment,
+            in order, and the final item is ("", None, True).
         """
+        if pipelined and enable_audio and self.tts_available:
+            async for item in self._stream_sentence_audio(text_generator, self._voice_settings(voice)):
+                yield item
+            return
+
         full_response = ""
 
         # Stream the text
@@ -226,6 +526,49 @@ class ConversationAgent:
             audio_result = await self.process_response_with_audio(full_response, enable_audio, voice)
             yield "", audio_result["audio"], True
 
+    async def _stream_sentence_audio(self, text_generator, settings: Tuple[str, float, int]):
+        """
+        Pipelined TTS: each completed sentence is handed to Edge TTS at once
+        (at most tts_concurrency in flight) while the LLM keeps generating.
+        Finished segments are yielded strictly in sentence order.
+        """
+        segmenter = SentenceSegmenter()
+        semaphore = asyncio.Semaphore(self.tts_concurrency)
+        pending = deque()  # synthesis tasks, in sentence order
+
+        async def synthesize(sentence):
+            async with semaphore:
+                try:
+                    return await self._synthesize(sentence, settings)
+                except Exception as e:
+                    # Skip a failed sentence rather than abort the whole answer
+                    print(f"TTS Error: {str(e)}")
+                    return None
+
+        def schedule(sentences):
+            for sentence in sentences:
+                pending.append(asyncio.ensure_future(synthesize(sentence)))
+
+        try:
+            async for chunk in text_generator:
+                yield chunk, None, False
+                schedule(segmenter.feed(chunk))
+                while pending and pending[0].done():
+                    audio = pending.popleft().result()
+                    if audio:
+                        yield "", audio, False
+
+            schedule(segmenter.flush())
+            while pending:
+                audio = await pending.popleft()
+                if audio:
+                    yield "", audio, False
+            yield "", None, True
+        finally:
+            # Consumer went away: stop synthesizing sentences nobody will hear
+            for task in pending:
+                task.cancel()
+
     def get_voice_options(self) -> Dict[str, str]:
         """Get available voice options"""
         return self.available_voices
@@ -238,17 +581,167 @@ class ConversationAgent:
         return False
 
 
+class ConversationStore:
+    """SQLite persistence for conversation turns, so sessions survive restarts."""
+
+    def __init__(self, db_manager=None):
+        from database_manager import DatabaseManager
+        self.db = db_manager or DatabaseManager(persistent=True)
+
+    def load_turns(self, session_id: str, limit: int) -> List[Dict]:
+        rows = self.db.execute_query(
+            "SELECT timestamp, user, assistant, mode, ai_provider FROM conversation_turns "
+            "WHERE session_id = ? ORDER BY turn_id DESC LIMIT ?",
+            (session_id, limit)
+        )
+        return rows[::-1]
+
+    def latest_turn_id(self, session_id: str) -> Optional[int]:
+        """Newest turn_id of the session, or None. turn_id is AUTOINCREMENT, so any change moves it."""
+        rows = self.db.execute_query(
+            "SELECT MAX(turn_id) AS turn_id FROM conversation_turns WHERE session_id = ?", (session_id,)
+        )
+        return rows[0]["turn_id"] if rows else None
+
+    def save_turn(self, session_id: str, turn: Dict, keep: Optional[int] = None) -> Tuple[Optional[int], int]:
+        """Returns (the session's newest turn_id before this one, the new turn_id)."""
+        with self.db.transaction() as conn:
+            previous = conn.execute(
+                "SELECT MAX(turn_id) FROM conversation_turns WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            turn_id = conn.execute(
+                "INSERT INTO conversation_turns (session_id, timestamp, user, assistant, mode, ai_provider) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, turn["timestamp"], turn["user"], turn["assistant"], turn["mode"], turn["ai_provider"])
+            ).lastrowid
+            if keep:
+                # Storage is bounded like the in-memory ring buffer
+                conn.execute(
+                    "DELETE FROM conversation_turns WHERE session_id = ? AND turn_id <= ("
+                    "SELECT turn_id FROM conversation_turns WHERE session_id = ? "
+                    "ORDER BY turn_id DESC LIMIT 1 OFFSET ?)",
+                    (session_id, session_id, keep)
+                )
+        return previous, turn_id
+
+    def delete_session(self, session_id: str):
+        self.db.execute_non_query("DELETE FROM conversation_turns WHERE session_id = ?", (session_id,))
+
+    def data_version(self) -> Optional[int]:
+        """Changes whenever another process commits turns (see DatabaseManager.data_version)."""
+        return self.db.data_version()
+
+
+class ConversationSessionManager:
+    """
+    One ConversationAgent per session_id, so users never share history or
+    voice settings. Sessions idle for longer than idle_seconds are evicted
+    (as are the least recently used ones beyond max_sessions); with a store,
+    an evicted session reloads its recent turns on its next request.
+
+    With a store, several API worker processes can serve the same session:
+    before a cached agent is handed out it checks (via sync_history, outside
+    the manager's lock) whether another process changed that session's
+    turns, and reloads only then. Without a store, history lives in one
+    process only, so requests for a session must all reach the same worker.
+    """
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, idle_seconds: float = DEFAULT_SESSION_IDLE_SECONDS,
+                 store: Optional[ConversationStore] = None, **agent_options):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.store = store
+        self.agent_options = agent_options
+        # session_id -> (agent, last used)
+        self._sessions: "OrderedDict[str, Tuple[ConversationAgent, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float):
+        # Least recently used first, so idle sessions sit at the front
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - last_used <= self.idle_seconds:
+                break
+            del self._sessions[session_id]
+
+    def get(self, session_id: Optional[str] = None) -> ConversationAgent:
+        """Agent for session_id, created on first use. None starts a new session."""
+        session_id = session_id or uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                agent = entry[0]
+                self._sessions[session_id] = (agent, now)
+                self._sessions.move_to_end(session_id)
+                self._evict(now)
+        if entry is not None:
+            # Database reads happen outside the lock, so one session's
+            # resync never holds up requests for the others
+            agent.sync_history()
+            return agent
+
+        agent = ConversationAgent(session_id=session_id, store=self.store, **self.agent_options)
+        with self._lock:
+            # Another request may have created the session meanwhile
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                agent = entry[0]
+            self._sessions[session_id] = (agent, now)
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+        return agent
+
+    def reset(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry:
+            entry[0].clear_history()
+        elif self.store is not None:
+            self.store.delete_session(session_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+_session_manager = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager() -> ConversationSessionManager:
+    """
+    Process-wide session manager. Turns are persisted to SQLite when
+    CONVERSATION_PERSIST is set, which is required when the API runs with
+    more than one uvicorn worker (the Dockerfile uses four).
+    """
+    global _session_manager
+    with _session_manager_lock:
+        if _session_manager is None:
+            store = ConversationStore() if os.getenv("CONVERSATION_PERSIST", "").lower() in ("1", "true", "yes") else None
+            _session_manager = ConversationSessionManager(store=store)
+        return _session_manager
+
+
 # Singleton instance
 _conversation_agent = None
 
-def get_conversation_agent() -> ConversationAgent:
-    """Get or create conversation agent singleton"""
+def get_conversation_agent(session_id: Optional[str] = None) -> ConversationAgent:
+    """
+    Get the agent for session_id, or the shared default agent when no
+    session is given (the single-user Gradio UI)
+    """
+    if session_id:
+        return get_session_manager().get(session_id)
     global _conversation_agent
     if _conversation_agent is None:
         _conversation_agent = ConversationAgent()
     return _conversation_agent
 
-def reset_conversation_agent():
+def reset_conversation_agent(session_id: Optional[str] = None):
     """Reset conversation agent"""
+    if session_id:
+        get_session_manager().reset(session_id)
+        return
     global _conversation_agent
     _conversation_agent = ConversationAgent()
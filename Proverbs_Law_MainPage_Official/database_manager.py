@@ -2,10 +2,21 @@
 
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+BUSY_TIMEOUT_SECONDS = 30.0
 
 class DatabaseManager:
-    def __init__(self, db_name: str = "proverbs_legal_ai.db"):
+    def __init__(self, db_name: str = "proverbs_legal_ai.db", persistent: bool = False):
         self.db_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), db_name)
+        # A persistent manager reuses one connection for every statement, which
+        # is what makes PRAGMA data_version meaningful: it only moves when
+        # *another* connection (another worker process) commits.
+        self.persistent = persistent
+        self._conn = None
+        self._lock = threading.RLock()
         self._initialize_db()
 
     def _initialize_db(self):
@@ -41,18 +52,148 @@ class DatabaseManager:
                     title TEXT NOT NULL,
                     file_path TEXT, -- Storing file path or reference
                     uploaded_at TEXT NOT NULL,
+                    blob_sha256 TEXT, -- Content address in the BlobStore, if ingested
                     FOREIGN KEY (case_id) REFERENCES cases(case_id) ON DELETE CASCADE
                 )
             """)
+            # Databases created before the blob store existed lack blob_sha256
+            columns = [row[1] for row in cursor.execute("PRAGMA table_info(case_documents)")]
+            if "blob_sha256" not in columns:
+                cursor.execute("ALTER TABLE case_documents ADD COLUMN blob_sha256 TEXT")
+            # Content-addressed blobs and their reference counts
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    ref_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            # Document ingestion jobs (ingestion_queue.py); leases let another
+            # worker reclaim a job whose worker died mid-run
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    file_type TEXT,
+                    status TEXT NOT NULL DEFAULT 'queued', -- queued, running, done, failed
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL DEFAULT 3,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    error TEXT,
+                    result TEXT, -- JSON summary once done
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS ingest_jobs_claim ON ingest_jobs (status, created_at)")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_events (
+                    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    stage TEXT,
+                    status TEXT NOT NULL,
+                    progress REAL,
+                    message TEXT,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS ingest_events_job ON ingest_events (job_id, event_id)")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS document_chunks (
+                    job_id TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    heading TEXT,
+                    content TEXT NOT NULL,
+                    tokens INTEGER,
+                    PRIMARY KEY (job_id, chunk_index)
+                )
+            """)
+            # Conversation turns per session (conversation_agent.ConversationStore)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_turns (
+                    turn_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    user TEXT NOT NULL,
+                    assistant TEXT NOT NULL,
+                    mode TEXT,
+                    ai_provider TEXT
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS conversation_turns_session ON conversation_turns (session_id, turn_id)")
+            # Voice profiles (voice_profiles.py): float16 speaker embeddings
+            # per recording, and their weighted mean per profile
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS voice_profiles (
+                    name TEXT PRIMARY KEY,
+                    embedding BLOB NOT NULL,
+                    dims INTEGER NOT NULL,
+                    recordings INTEGER NOT NULL DEFAULT 0,
+                    total_seconds REAL NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS voice_recordings (
+                    recording_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    profile_name TEXT NOT NULL,
+                    blob_sha256 TEXT NOT NULL,
+                    duration REAL NOT NULL,
+                    voiced_frames INTEGER NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created_at TEXT NOT NULL,
+                    UNIQUE (profile_name, blob_sha256)
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS voice_recordings_blob ON voice_recordings (blob_sha256)")
+            # Login sessions (session_store.ExpiringSessionStore); only a hash of
+            # the HuggingFace token is stored
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS auth_sessions (
+                    username TEXT PRIMARY KEY,
+                    token_hash TEXT NOT NULL,
+                    email TEXT,
+                    contact_email TEXT,
+                    avatar_url TEXT,
+                    login_time REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS auth_sessions_expiry ON auth_sessions (expires_at)")
+            # Per-scope write counters, bumped in the same transaction as the
+            # writes they cover. PRAGMA data_version moves on a commit to any
+            # table; a scope's row only moves when its own tables change.
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS cache_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('cases', 0)")
             conn.commit()
 
     def _get_connection(self):
         """Returns a database connection."""
-        return sqlite3.connect(self.db_path)
+        if not self.persistent:
+            return sqlite3.connect(self.db_path)
+        if self._conn is None:
+            # Persistent connections belong to long-lived workers that share
+            # the file with other processes: WAL lets readers run alongside a
+            # writer, and the busy timeout waits out short write locks instead
+            # of failing with "database is locked".
+            self._conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        return self._conn
 
     def execute_query(self, query: str, params: tuple = ()) -> Optional[List[Any]]:
         """Executes a read query and returns results."""
-        with self._get_connection() as conn:
+        with self._lock, self._get_connection() as conn:
             conn.row_factory = sqlite3.Row # Allows accessing columns by name
             cursor = conn.cursor()
             cursor.execute(query, params)
@@ -60,10 +201,43 @@ class DatabaseManager:
 
     def execute_non_query(self, query: str, params: tuple = ()) -> int:
         """Executes a write query (INSERT, UPDATE, DELETE) and returns lastrowid or rowcount."""
-        with self._get_connection() as conn:
+        with self._lock, self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, params)
             conn.commit()
             if query.strip().upper().startswith("INSERT"):
                 return cursor.lastrowid
             return cursor.rowcount
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Runs a block of statements inside BEGIN IMMEDIATE ... COMMIT.
+        The write lock is taken up front, so a read followed by an update
+        (e.g. claiming a queued job) is atomic across processes.
+        """
+        with self._lock:
+            conn = self._get_connection()
+            conn.row_factory = sqlite3.Row
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                if not self.persistent:
+                    conn.close()
+
+    def data_version(self) -> Optional[int]:
+        """
+        Returns SQLite's PRAGMA data_version for the persistent connection.
+        The value changes whenever another connection commits to the database
+        file, so callers can use it to detect writes made by other workers.
+        Returns None for non-persistent managers, where it carries no meaning.
+        """
+        if not self.persistent:
+            return None
+        with self._lock:
+            return self._get_connection().execute("PRAGMA data_version").fetchone()[0]
@@ -0,0 +1,337 @@
+"""
+Document Pipeline for ProVerBs Law
+Structure-aware chunking and map-reduce summarization of long documents.
+
+Extracted text is split along its legal structure (articles, sections,
+clauses, numbered paragraphs) into chunks that fit a token budget, with a
+little overlap so a clause cut at a boundary keeps its context. Chunks are
+summarized concurrently across whichever LLM providers are configured, then
+the summaries are reduced into one. Chunk summaries are cached on disk by the
+hash of the chunk's own heading and body, not the overlap borrowed from its
+neighbour, so re-summarizing an edited document only pays for the chunks
+that changed. Reduce steps are cached by the hash of their prompt.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from utils.disk_cache import DiskCache, get_disk_cache
+
+# Providers take a prompt and return the completion text, raising on failure
+Provider = Callable[[str], Awaitable[str]]
+
+DEFAULT_CHUNK_TOKENS = 1500
+DEFAULT_OVERLAP_TOKENS = 120
+DEFAULT_MAX_CONCURRENCY = 4
+SUMMARY_CACHE_NAMESPACE = "chunk_summary:v2"
+
+# Top-level headings always start a new chunk, which keeps chunk boundaries
+# (and so cache keys) stable in sections the user did not touch
+SECTION_PATTERN = re.compile(
+    r"^\s*(?:ARTICLE|Article|SECTION|Section|PART|Part|CHAPTER|Chapter|SCHEDULE|Schedule|EXHIBIT|Exhibit)\s+[\dIVXLC]+[.:)]?"
+    r"|^\s*§+\s*\d"
+    r"|^\s*[IVXLC]+\.\s+[A-Z]"
+)
+# Lower-level units that may share a chunk with their neighbours
+CLAUSE_PATTERN = re.compile(
+    r"^\s*(?:\d+(?:\.\d+)*[.)]\s+|\([a-zA-Z0-9]{1,4}\)\s+|[a-z][.)]\s+|(?:Clause|CLAUSE)\s+\d+|WHEREAS\b|NOW,? THEREFORE\b)"
+)
+SENTENCE_PATTERN = re.compile(r"(?<=[.;:!?])\s+(?=[A-Z(\"'])")
+
+MAP_PROMPT = (
+    "Summarize this excerpt of a legal document. Keep parties, dates, amounts, "
+    "obligations, conditions and section references. Do not add facts.\n\n"
+    "{context}Excerpt ({heading}):\n{body}"
+)
+REDUCE_PROMPT = (
+    "Combine these summaries of consecutive parts of one legal document into a "
+    "single coherent legal summary. Preserve parties, dates, amounts, "
+    "obligations and section references; remove repetition.\n\n{summaries}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English legal prose)."""
+    return len(text) // 4 + 1
+
+
+@dataclass
+class Chunk:
+    """One token-budgeted piece of a document."""
+    index: int
+    heading: str
+    body: str
+    context: str = ""  # overlap carried from the previous chunk
+    tokens: int = 0
+
+    @property
+    def text(self) -> str:
+        return f"{self.context}\n{self.body}" if self.context else self.body
+
+
+class LegalChunker:
+    """Splits text into chunks along sections, clauses and numbered paragraphs."""
+
+    def __init__(self, max_tokens: int = DEFAULT_CHUNK_TOKENS, overlap_tokens: int = DEFAULT_OVERLAP_TOKENS):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def _sections(self, text: str) -> List[Dict[str, Any]]:
+        """Group lines into top-level sections, each a list of clause-level units."""
+        sections = [{'heading': "Preamble", 'units': [[]]}]
+        for line in text.splitlines():
+            if SECTION_PATTERN.match(line):
+                sections.append({'heading': line.strip()[:80], 'units': [[line]]})
+            elif CLAUSE_PATTERN.match(line) or (not line.strip() and sections[-1]['units'][-1]):
+                sections[-1]['units'].append([line])
+            else:
+                sections[-1]['units'][-1].append(line)
+        for section in sections:
+            section['units'] = [unit for unit in ("\n".join(lines).strip() for lines in section['units']) if unit]
+        return [section for section in sections if section['units']]
+
+    def _split_oversized(self, unit: str, budget: int) -> List[str]:
+        """Break a unit larger than the budget at sentences, then at words."""
+        pieces, current = [], ""
+        for sentence in SENTENCE_PATTERN.split(unit):
+            if estimate_tokens(sentence) > budget:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.extend(self._split_words(sentence, budget))
+                continue
+            candidate = f"{current} {sentence}".strip()
+            if current and estimate_tokens(candidate) > budget:
+                pieces.append(current)
+                candidate = sentence
+            current = candidate
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _split_words(self, sentence: str, budget: int) -> List[str]:
+        """Pack words into pieces within the budget; a word too long for any piece is cut."""
+        max_chars = budget * 4 - 1  # longest text estimate_tokens keeps within budget
+        pieces, current = [], ""
+        for word in sentence.split():
+            while len(word) > max_chars:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(word[:max_chars])
+                word = word[max_chars:]
+            candidate = f"{current} {word}" if current else word
+            if estimate_tokens(candidate) > budget:
+                pieces.append(current)
+                candidate = word
+            current = candidate
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _overlap(self, body: str) -> str:
+        """Trailing sentences of body worth at most overlap_tokens."""
+        if not self.overlap_tokens:
+            return ""
+        tail = []
+        for sentence in reversed(SENTENCE_PATTERN.split(body)):
+            if estimate_tokens(" ".join([sentence] + tail)) > self.overlap_tokens:
+                break
+            tail.insert(0, sentence)
+        if not tail:
+            tail = [body[-(self.overlap_tokens * 4 - 1):]]
+        return " ".join(tail)
+
+    def chunk(self, text: str) -> List[Chunk]:
+        budget = self.max_tokens - self.overlap_tokens
+        chunks: List[Chunk] = []
+        for section in self._sections(text):
+            current: List[str] = []
+            for unit in section['units']:
+                parts = [unit] if estimate_tokens(unit) <= budget else self._split_oversized(unit, budget)
+                for part in parts:
+                    if current and estimate_tokens("\n".join(current + [part])) > budget:
+                        chunks.append(Chunk(len(chunks), section['heading'], "\n".join(current)))
+                        current = []
+                    current.append(part)
+            if current:
+                chunks.append(Chunk(len(chunks), section['heading'], "\n".join(current)))
+
+        for previous, chunk in zip(chunks, chunks[1:]):
+            chunk.context = self._overlap(previous.body)
+        for chunk in chunks:
+            chunk.tokens = estimate_tokens(chunk.text)
+        return chunks
+
+
+class DocumentSummarizer:
+    """
+    Map-reduce summarizer over one or more async providers.
+
+    Chunks are assigned to providers round-robin, at most max_concurrency at
+    a time; a chunk whose provider fails is retried on the next one. When the
+    chunk summaries together exceed the chunk budget they are reduced in
+    groups, level by level, until one summary remains.
+    """
+
+    def __init__(self, providers: List[Provider], chunker: Optional[LegalChunker] = None,
+                 cache: Optional[DiskCache] = None, use_cache: bool = True,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        if not providers:
+            raise ValueError("DocumentSummarizer needs at least one provider")
+        self.providers = providers
+        self.chunker = chunker or LegalChunker()
+        self.cache = cache if cache is not None or not use_cache else get_disk_cache()
+        self.max_concurrency = max_concurrency
+        self._next_provider = 0
+
+    async def _complete(self, prompt: str, semaphore: asyncio.Semaphore, stats: Dict[str, int],
+                        cache_material: Optional[str] = None) -> str:
+        material = prompt if cache_material is None else cache_material
+        key = hashlib.sha256(material.encode("utf-8")).hexdigest()
+        if self.cache is not None:
+            cached = self.cache.get(SUMMARY_CACHE_NAMESPACE, key)
+            if cached is not None:
+                stats['cached'] += 1
+                return cached.decode("utf-8")
+
+        start = self._next_provider
+        self._next_provider = (self._next_provider + 1) % len(self.providers)
+        errors = []
+        async with semaphore:
+            for offset in range(len(self.providers)):
+                provider = self.providers[(start + offset) % len(self.providers)]
+                try:
+                    summary = (await provider(prompt)).strip()
+                    break
+                except Exception as e:
+                    errors.append(str(e))
+            else:
+                raise RuntimeError("All providers failed: " + "; ".join(errors))
+
+        stats['generated'] += 1
+        if self.cache is not None and summary:
+            self.cache.set(SUMMARY_CACHE_NAMESPACE, key, summary.encode("utf-8"))
+        return summary
+
+    async def _reduce(self, summaries: List[str], semaphore: asyncio.Semaphore, stats: Dict[str, int]) -> str:
+        while len(summaries) > 1:
+            # Groups hold at least two summaries, so every level halves the count
+            groups, current = [], []
+            for summary in summaries:
+                if len(current) >= 2 and estimate_tokens("\n\n".join(current + [summary])) > self.chunker.max_tokens:
+                    groups.append(current)
+                    current = []
+                current.append(summary)
+            groups.append(current)
+            summaries = await asyncio.gather(*(
+                self._complete(REDUCE_PROMPT.format(summaries="\n\n".join(
+                    f"[Part {i + 1}]\n{text}" for i, text in enumerate(group)
+                )), semaphore, stats) if len(group) > 1 else asyncio.sleep(0, group[0])
+                for group in groups
+            ))
+        return summaries[0]
+
+    async def summarize(self, text: str) -> Dict[str, Any]:
+        """
+        Summarize text. Returns the summary plus chunk, cache and timing
+        counts: chunks, generated, cached and seconds.
+        """
+        started = time.perf_counter()
+        chunks = self.chunker.chunk(text)
+        stats = {'generated': 0, 'cached': 0}
+        if not chunks:
+            return {'summary': "", 'chunks': 0, 'seconds': 0.0, **stats}
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        summaries = await asyncio.gather(*(
+            self._complete(MAP_PROMPT.format(
+                context=f"Preceding text, for context only:\n{chunk.context}\n\n" if chunk.context else "",
+                heading=chunk.heading,
+                body=chunk.body
+            ), semaphore, stats, cache_material=f"map\x1f{chunk.heading}\x1f{chunk.body}")
+            for chunk in chunks
+        ))
+        summary = await self._reduce(list(summaries), semaphore, stats)
+        return {
+            'summary': summary,
+            'chunks': len(chunks),
+            'seconds': round(time.perf_counter() - started, 3),
+            **stats
+        }
+
+    def summarize_sync(self, text: str) -> Dict[str, Any]:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.summarize(text))
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self.summarize(text)).result()
+
+
+# ============================================================================
+# PROVIDERS
+# ============================================================================
+
+def huggingface_provider(token: Optional[str] = None, model: str = "meta-llama/Llama-3.3-70B-Instruct",
+                         max_tokens: int = 700) -> Provider:
+    from huggingface_hub import AsyncInferenceClient
+    client = AsyncInferenceClient(token=token, model=model)
+
+    async def complete(prompt: str) -> str:
+        response = await client.chat_completion([{"role": "user", "content": prompt}], max_tokens=max_tokens)
+        return response.choices[0].message.content or ""
+    return complete
+
+
+def openai_provider(api_key: str, model: str = "gpt-4-turbo-preview", max_tokens: int = 700) -> Provider:
+    import httpx
+
+    async def complete(prompt: str) -> str:
+        async with httpx.AsyncClient(timeout=120) as client:
+            response = await client.post(
+                "https://api.openai.com/v1/chat/completions",
+                headers={"Authorization": f"Bearer {api_key}"},
+                json={"model": model, "messages": [{"role": "user", "content": prompt}], "max_tokens": max_tokens}
+            )
+            response.raise_for_status()
+            return response.json()['choices'][0]['message']['content'] or ""
+    return complete
+
+
+def gemini_provider(api_key: str, model: str = "gemini-1.5-pro", max_tokens: int = 700) -> Provider:
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    gemini = genai.GenerativeModel(model)
+
+    async def complete(prompt: str) -> str:
+        response = await gemini.generate_content_async(
+            prompt, generation_config=genai.types.GenerationConfig(max_output_tokens=max_tokens)
+        )
+        return response.text
+    return complete
+
+
+def default_providers(hf_token: Optional[str] = None) -> List[Provider]:
+    """Every provider with credentials available: HuggingFace, then OpenAI and Gemini from env."""
+    providers = []
+    try:
+        providers.append(huggingface_provider(hf_token or os.getenv("HF_TOKEN")))
+    except ImportError:
+        pass
+    if os.getenv("OPENAI_API_KEY"):
+        providers.append(openai_provider(os.getenv("OPENAI_API_KEY")))
+    if os.getenv("GOOGLE_API_KEY"):
+        try:
+            providers.append(gemini_provider(os.getenv("GOOGLE_API_KEY")))
+        except ImportError:
+            pass
+    return providers
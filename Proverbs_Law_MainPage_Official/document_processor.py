@@ -10,12 +10,20 @@ import tempfile
 import os
 import uuid
 from datetime import datetime
-import re
+
+from utils.html_utils import charset_from_content_type, html_stream_to_text, html_to_text
+from utils.ingest_utils import IngestStats, DocumentTooLargeError, MAX_DOWNLOAD_BYTES, iter_response_chunks, spool_response
+
+URL_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
 
 class DocumentProcessor:
     """Handles processing of various document types including files, URLs, and direct text input."""
     
-    def __init__(self):
+    def __init__(self, max_document_bytes=MAX_DOWNLOAD_BYTES):
+        self.max_document_bytes = max_document_bytes
+        self._batch_ocr = None
         try:
             from utils.ocr_utils import OCRProcessor
             self.ocr_processor = OCRProcessor()
@@ -40,6 +48,11 @@ class DocumentProcessor:
             # Create a unique ID for this document
             doc_id = str(uuid.uuid4())
             
+            stats = IngestStats()
+            stats.bytes = os.path.getsize(file_path)
+            if stats.bytes > self.max_document_bytes:
+                return None, f"File too large: {stats.bytes} bytes (limit {self.max_document_bytes})"
+            
             # Process based on file type
             if ext == ".pdf":
                 content = self._process_pdf(file_path)
@@ -59,7 +72,8 @@ class DocumentProcessor:
                     'content': content,
                     'file_type': ext,
                     'upload_date': datetime.now().isoformat(),
-                    'source_type': 'file_upload'
+                    'source_type': 'file_upload',
+                    'ingest_stats': self._finish_stats(stats)
                 }, None
             else:
                 return None, f"Failed to extract content from {filename}"
@@ -67,6 +81,10 @@ class DocumentProcessor:
         except Exception as e:
             return None, f"Error processing file: {str(e)}"
     
+    def _finish_stats(self, stats):
+        stats.sample()
+        return stats.to_dict()
+    
     def process_url(self, url):
         """Process content from a URL."""
         try:
@@ -75,41 +93,64 @@ class DocumentProcessor:
                 return None, "Please enter a valid URL starting with http:// or https://"
             
             # Fetch content from URL
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            content_type = response.headers.get('content-type', '').lower()
-            
-            if 'text/html' in content_type or 'text/plain' in content_type:
-                content = self._extract_text_from_html(response.text)
-            elif 'application/pdf' in content_type:
-                content = self._process_pdf_from_bytes(response.content)
-            else:
-                return None, f"Unsupported content type: {content_type}"
+            stats = IngestStats()
+            with requests.get(url, headers=URL_HEADERS, timeout=30, stream=True) as response:
+                response.raise_for_status()
+                
+                content_type = response.headers.get('content-type', '').lower()
+                
+                if 'text/html' in content_type or 'text/plain' in content_type:
+                    # Decode and tokenize chunk by chunk as the body arrives
+                    chunks = iter_response_chunks(response, max_bytes=self.max_document_bytes, stats=stats)
+                    encoding = charset_from_content_type(content_type)
+                    if 'text/html' in content_type:
+                        content = html_stream_to_text(chunks, encoding)
+                    else:
+                        content = b"".join(chunks).decode(encoding, errors='replace').strip()
+                elif 'application/pdf' in content_type:
+                    # Spool to disk in chunks instead of holding the body in memory
+                    pdf_path = spool_response(response, suffix=".pdf", max_bytes=self.max_document_bytes, stats=stats)
+                    try:
+                        content = self._process_pdf_from_path(pdf_path, stats)
+                    finally:
+                        os.remove(pdf_path)
+                else:
+                    return None, f"Unsupported content type: {content_type}"
             
             if content:
-                doc_id = str(uuid.uuid4())
-                return {
-                    'id': doc_id,
-                    'filename': f"URL_Content_{url.split('/')[-1] or 'webpage'}",
-                    'content': content,
-                    'file_type': content_type,
-                    'upload_date': datetime.now().isoformat(),
-                    'source_type': 'url',
-                    'source_url': url
-                }, None
+                return self._url_document(url, content, content_type, stats), None
             else:
                 return None, "Failed to extract content from URL"
                 
+        except DocumentTooLargeError as e:
+            return None, f"Document too large: {str(e)}"
         except requests.RequestException as e:
             return None, f"Error fetching URL: {str(e)}"
         except Exception as e:
             return None, f"Error processing URL content: {str(e)}"
     
+    def _url_document(self, url, content, content_type, stats):
+        return {
+            'id': str(uuid.uuid4()),
+            'filename': f"URL_Content_{url.split('/')[-1] or 'webpage'}",
+            'content': content,
+            'file_type': content_type,
+            'upload_date': datetime.now().isoformat(),
+            'source_type': 'url',
+            'source_url': url,
+            'ingest_stats': self._finish_stats(stats)
+        }
+    
+    def process_urls(self, urls, per_host_limit=None):
+        """
+        Fetch many URLs concurrently over one pooled connection set.
+        Yields (url, document, error) as each URL completes; unchanged pages
+        are revalidated against the local HTTP cache instead of re-downloaded.
+        """
+        from utils.url_ingest import AsyncURLIngester, DEFAULT_PER_HOST_LIMIT
+        ingester = AsyncURLIngester(self, per_host_limit=per_host_limit or DEFAULT_PER_HOST_LIMIT)
+        yield from ingester.ingest_sync(urls)
+    
     def process_text(self, text_content, source_name="Direct Input"):
         """Process direct text input."""
         try:
@@ -133,23 +174,29 @@ class DocumentProcessor:
         """Extract text from PDF file."""
         try:
             if self.pdf_processor:
-                with open(file_path, 'rb') as f:
-                    return self.pdf_processor.extract_text(f)
+                # Large filings are split across worker processes by page range
+                return self.pdf_processor.extract_text_parallel(file_path)
             else:
                 # Fallback to PyPDF2 if available
                 try:
                     import PyPDF2
-                    text = ""
                     with open(file_path, 'rb') as f:
                         reader = PyPDF2.PdfReader(f)
-                        for page in reader.pages:
-                            text += page.extract_text() + "\n"
-                    return text
+                        return "\n".join(page.extract_text() or "" for page in reader.pages)
                 except ImportError:
                     return "PDF processing not available. Please install PyPDF2."
         except Exception as e:
             return f"Error processing PDF: {str(e)}"
     
+    def _process_pdf_from_path(self, pdf_path, stats=None):
+        """Extract text from a spooled PDF through a memory map."""
+        try:
+            if self.pdf_processor:
+                return self.pdf_processor.extract_text_from_path(pdf_path, stats=stats)
+            return "PDF processing not available. Please install PyPDF2."
+        except Exception as e:
+            return f"Error processing PDF from URL: {str(e)}"
+    
     def _process_pdf_from_bytes(self, pdf_bytes):
         """Extract text from PDF bytes."""
         try:
@@ -158,12 +205,9 @@ class DocumentProcessor:
             else:
                 try:
                     import PyPDF2
-                    text = ""
                     pdf_file = io.BytesIO(pdf_bytes)
                     reader = PyPDF2.PdfReader(pdf_file)
-                    for page in reader.pages:
-                        text += page.extract_text() + "\n"
-                    return text
+                    return "\n".join(page.extract_text() or "" for page in reader.pages)
                 except ImportError:
                     return "PDF processing not available. Please install PyPDF2."
         except Exception as e:
@@ -175,19 +219,8 @@ class DocumentProcessor:
             image = Image.open(file_path)
             
             if self.ocr_processor:
-                # Try handwriting detection first
-                handwriting_info = self.ocr_processor.detect_handwriting(image)
-                
-                if handwriting_info['is_handwritten']:
-                    text = self.ocr_processor.extract_from_handwriting(image)
-                    if not text.strip():
-                        text = self.ocr_processor.extract_text(image, enhance=True)
-                else:
-                    text = self.ocr_processor.extract_text(image, enhance=True)
-                
-                if not text.strip():
-                    confidence_result = self.ocr_processor.extract_text_with_confidence(image)
-                    text = confidence_result['text']
+                # Handwriting detection, then the matching OCR pass
+                text = self.ocr_processor.ocr_image(image)['text']
             else:
                 # Fallback to basic pytesseract if available
                 try:
@@ -204,6 +237,41 @@ class DocumentProcessor:
         except Exception as e:
             return f"Error processing image: {str(e)}"
     
+    def process_images(self, image_paths, max_workers=None):
+        """
+        OCR many images on the shared worker pool.
+        Yields (image_path, text) pairs as each image finishes.
+        """
+        if not self.ocr_processor:
+            for path in image_paths:
+                yield path, self._process_image(path)
+            return
+        
+        if self._batch_ocr is None:
+            from utils.ocr_utils import BatchOCREngine
+            self._batch_ocr = BatchOCREngine(max_workers=max_workers)
+        
+        for result in self._batch_ocr.process(list(image_paths)):
+            text = result['text']
+            if not text.strip():
+                text = "No text could be extracted from the image."
+            yield result['source'], text
+    
+    def chunk_document(self, document, max_tokens=None):
+        """Split a processed document's content into token-budgeted chunks."""
+        from document_pipeline import LegalChunker, DEFAULT_CHUNK_TOKENS
+        return LegalChunker(max_tokens=max_tokens or DEFAULT_CHUNK_TOKENS).chunk(document['content'])
+    
+    def summarize_document(self, document, providers=None):
+        """
+        Map-reduce summary of a processed document across the configured LLM
+        providers. Chunk summaries are cached, so re-processing an edited
+        document only re-summarizes the sections that changed.
+        """
+        from document_pipeline import DocumentSummarizer, default_providers
+        summarizer = DocumentSummarizer(providers or default_providers())
+        return summarizer.summarize_sync(document['content'])
+    
     def _process_text_file(self, file_path):
         """Extract text from plain text file."""
         try:
@@ -225,36 +293,28 @@ class DocumentProcessor:
             return f"Error processing text file: {str(e)}"
     
     def _process_docx(self, file_path):
-        """Extract text from Word document."""
+        """Extract text from Word document, including tables, headers and footnotes."""
         try:
-            try:
-                from docx import Document
-                doc = Document(file_path)
-                text = "\n".join([para.text for para in doc.paragraphs])
-                return text
-            except ImportError:
-                return "Word document processing requires python-docx. Please install it or convert to PDF."
+            from utils.docx_utils import extract_docx_text
+            return extract_docx_text(file_path)
             
         except Exception as e:
             return f"Error processing Word document: {str(e)}"
     
+    def process_docx_batch(self, docx_paths, max_workers=None):
+        """
+        Extract many Word documents on a process pool.
+        Yields (docx_path, text) pairs as each document finishes.
+        """
+        from utils.docx_utils import extract_docx_batch
+        for path, text, error in extract_docx_batch(docx_paths, max_workers=max_workers):
+            yield path, text if error is None else f"Error processing Word document: {error}"
+    
     def _extract_text_from_html(self, html_content):
-        """Extract text content from HTML."""
+        """Extract text content from HTML, keeping headings and lists as markdown."""
         try:
-            # Remove script and style elements
-            clean_html = re.sub(r'<(script|style)[^<]*?</\1>', '', html_content, flags=re.IGNORECASE | re.DOTALL)
-            
-            # Remove HTML tags
-            text = re.sub(r'<[^>]+>', '', clean_html)
-            
-            # Clean up whitespace
-            text = re.sub(r'\s+', ' ', text).strip()
-            
-            # Limit length for processing
-            if len(text) > 10000:
-                text = text[:10000] + "..."
-            
-            return text
+            # No truncation: long pages are split by chunk_document() instead
+            return html_to_text(html_content)
             
         except Exception as e:
             return f"Error extracting text from HTML: {str(e)}"
@@ -1,90 +1,237 @@
 # handwritten_note_interpreter.py
 
 from typing import Dict, List, Any, Optional
-from huggingface_hub import InferenceClient
+from huggingface_hub import InferenceClient, AsyncInferenceClient
 import pytesseract
 from PIL import Image
 import io
 import base64
+import asyncio
+import mimetypes
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from document_pipeline import DocumentSummarizer, DEFAULT_CHUNK_TOKENS, estimate_tokens
+from utils.image_utils import VisionImagePreprocessor
+from utils.ocr_cache import get_ocr_cache
 
 # Tesseract-OCR needs to be installed and its path added to PATH or specified here
 # pytesseract.pytesseract.tesseract_cmd = r'C:\ Program Files\Tesseract-OCR\tesseract.exe' # Example for Windows
 
+TRANSCRIPTION_PROMPT = (
+    "Carefully transcribe all handwritten text in this image accurately. "
+    "If parts are illegible, use [?] or [illegible]. Maintain the layout."
+)
+
+PENMANSHIP_PROMPT = (
+    "Analyze the penmanship in this image. Focus on: "
+    "1. Writing style (cursive, print, hybrid) "
+    "2. Slant, pressure, and letter formation "
+    "3. Consistency and readability "
+    "4. Unique characteristics that identifying the 'hand' of the writer. "
+    "Provide a detailed psychological and structural analysis of the handwriting."
+)
+
+
 class HandwrittenNoteInterpreter:
     """
     Enhanced Handwriting Interpreter with Vision-AI.
     Analyzes penmanship and extracts legal data from images/PDFs.
     """
-    def __init__(self, hf_token: str = None, vision_model: str = "meta-llama/Llama-3.2-11B-Vision-Instruct"):
+    def __init__(self, hf_token: str = None, vision_model: str = "meta-llama/Llama-3.2-11B-Vision-Instruct", use_cache: bool = True, preprocess: bool = True):
         self.client = InferenceClient(token=hf_token, model=vision_model)
+        self.async_client = AsyncInferenceClient(token=hf_token, model=vision_model)
         self.vision_model = vision_model
+        self.cache = get_ocr_cache() if use_cache else None
+        self.preprocessor = VisionImagePreprocessor() if preprocess else None
+
+    def _prepare_image(self, image_path: str, image_data: bytes) -> Dict[str, Any]:
+        """Oriented, cropped, downsized data URL; the raw bytes with their real mime type as a fallback."""
+        if self.preprocessor is not None:
+            try:
+                return self.preprocessor.prepare(image_data)
+            except Exception as e:
+                print(f"Image preprocessing failed, uploading original: {e}")
+        mime = mimetypes.guess_type(image_path)[0] if image_path else None
+        if mime is None:
+            # No usable name: ask Pillow what the bytes actually are
+            try:
+                mime = Image.MIME.get(Image.open(io.BytesIO(image_data)).format)
+            except Exception:
+                mime = None
+        mime = mime or "application/octet-stream"
+        return {
+            "data_url": f"data:{mime};base64,{base64.b64encode(image_data).decode('utf-8')}",
+            "mime_type": mime,
+            "original_bytes": len(image_data),
+            "upload_bytes": len(image_data),
+            "reduction": "0.0%"
+        }
+
+    @staticmethod
+    def _vision_messages(image_url: str, prompt: str) -> List[Dict[str, Any]]:
+        """Multi-modal chat message; image_url is a prebuilt data URL."""
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": image_url}}
+                ]
+            }
+        ]
+
+    def _stream_chat(self, messages: List[Dict[str, Any]], max_tokens: int = 2048) -> str:
+        response = ""
+        for chunk in self.client.chat_completion(
+            messages, 
+            max_tokens=max_tokens, 
+            stream=True
+        ):
+            if chunk.choices and chunk.choices[0].delta.content:
+                response += chunk.choices[0].delta.content
+        return response
+
+    def _call_vision_llm(self, image_url: str, prompt: str) -> str:
+        """Blocking vision call; image_url is a data URL from _prepare_image."""
+        try:
+            return self._stream_chat(self._vision_messages(image_url, prompt))
+        except Exception as e:
+            return f"Vision-AI Error: {str(e)}"
+
+    async def _stream_chat_async(self, messages: List[Dict[str, Any]], max_tokens: int = 2048) -> str:
+        response = ""
+        stream = await self.async_client.chat_completion(messages, max_tokens=max_tokens, stream=True)
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                response += chunk.choices[0].delta.content
+        return response
 
-    def _call_vision_llm(self, image_base64: str, prompt: str) -> str:
-        """Helper to call Vision-LLM with an image."""
+    async def _call_vision_llm_async(self, image_url: str, prompt: str) -> str:
+        """Non-blocking vision call; image_url is built once per note and shared."""
         try:
-            # Construct multi-modal message
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}
-                        }
-                    ]
-                }
-            ]
-            
-            response = ""
-            for chunk in self.client.chat_completion(
-                messages, 
-                max_tokens=2048, 
-                stream=True
-            ):
-                if chunk.choices and chunk.choices[0].delta.content:
-                    response += chunk.choices[0].delta.content
-            return response
+            return await self._stream_chat_async(self._vision_messages(image_url, prompt))
         except Exception as e:
             return f"Vision-AI Error: {str(e)}"
 
-    def analyze_penmanship(self, image_base64: str) -> str:
+    async def _call_text_llm_async(self, prompt: str, max_tokens: int = 1024) -> str:
+        """Text-only call on the same model; no image is uploaded."""
+        try:
+            return await self._stream_chat_async([{"role": "user", "content": prompt}], max_tokens=max_tokens)
+        except Exception as e:
+            return f"Vision-AI Error: {str(e)}"
+
+    def analyze_penmanship(self, image_base64: str, name: str = "") -> str:
         """
         Learns and analyzes the penmanship style (pinmanship).
+
+        The upload goes through the same preprocessing as transcription, so
+        the data URL carries the image's real format rather than assuming
+        JPEG.
         """
-        prompt = (
-            "Analyze the penmanship in this image. Focus on: "
-            "1. Writing style (cursive, print, hybrid) "
-            "2. Slant, pressure, and letter formation "
-            "3. Consistency and readability "
-            "4. Unique characteristics that identifying the 'hand' of the writer. "
-            "Provide a detailed psychological and structural analysis of the handwriting."
-        )
-        return self._call_vision_llm(image_base64, prompt)
+        try:
+            image_data = base64.b64decode(image_base64)
+        except Exception as e:
+            return f"Vision-AI Error: invalid base64 image: {str(e)}"
+        return self._call_vision_llm(self._prepare_image(name, image_data)["data_url"], PENMANSHIP_PROMPT)
 
-    def process_handwritten_note(self, image_path: str) -> Dict[str, Any]:
+    async def process_handwritten_note_async(self, image_path: str) -> Dict[str, Any]:
         """
         Process handwriting: Transcription + Penmanship Analysis + Summary.
+
+        Transcription and penmanship analysis run concurrently against the
+        same encoded image; the summary is a text-only call on the finished
+        transcription, so end-to-end latency is roughly one vision round
+        trip plus a short text completion.
         """
         with open(image_path, "rb") as f:
             image_data = f.read()
-            image_base64 = base64.b64encode(image_data).decode("utf-8")
 
-        transcription_prompt = (
-            "Carefully transcribe all handwritten text in this image accurately. "
-            "If parts are illegible, use [?] or [illegible]. Maintain the layout."
+        # Re-uploads and confirmed rescans of the same page reuse the earlier analysis
+        namespace = f"vision_note:{self.vision_model}"
+        fingerprint = None
+        if self.cache is not None:
+            cached, fingerprint = self.cache.lookup(namespace, image_data)
+            if cached is not None:
+                return cached
+
+        payload = self._prepare_image(image_path, image_data)
+        image_url = payload.pop("data_url")
+
+        started = time.perf_counter()
+        transcription, penmanship = await asyncio.gather(
+            self._call_vision_llm_async(image_url, TRANSCRIPTION_PROMPT),
+            self._call_vision_llm_async(image_url, PENMANSHIP_PROMPT)
         )
-        
-        transcription = self._call_vision_llm(image_base64, transcription_prompt)
-        penmanship = self.analyze_penmanship(image_base64)
-        
-        summary_prompt = f"Summarize the following legal note transciption: \n\n{transcription}"
-        # We can use the same vision model for text-only summary or a text-only model
-        summary = self._call_vision_llm(image_base64, "Provide a legal summary of the text you just transcribed.")
+        payload["vision_seconds"] = round(time.perf_counter() - started, 3)
 
-        return {
+        if transcription.startswith("Vision-AI Error"):
+            summary = "Summary not generated: transcription failed."
+        else:
+            summary = await self.summarize_transcription_async(transcription)
+
+        result = {
             "transcription": transcription,
             "penmanship_analysis": penmanship,
             "legal_summary": summary,
-            "model_used": self.vision_model
+            "model_used": self.vision_model,
+            "upload_stats": payload
         }
+        failed = any(value.startswith("Vision-AI Error") for value in (transcription, penmanship, summary))
+        if fingerprint is not None and not failed:
+            self.cache.store(namespace, fingerprint, result)
+        return result
+
+    def transcribe_image(self, image_data: bytes, name: str = "page.png") -> Dict[str, Any]:
+        """
+        Transcription only, for callers such as the PDF page pipeline that
+        run pages on worker threads and build the summary themselves.
+        Uses the blocking client, which is safe to share across threads.
+        """
+        payload = self._prepare_image(name, image_data)
+        image_url = payload.pop("data_url")
+        started = time.perf_counter()
+        try:
+            transcription = self._stream_chat(self._vision_messages(image_url, TRANSCRIPTION_PROMPT))
+        except Exception as e:
+            transcription = f"Vision-AI Error: {str(e)}"
+        payload["vision_seconds"] = round(time.perf_counter() - started, 3)
+        return {"transcription": transcription, "upload_stats": payload}
+
+    async def _complete_text(self, prompt: str) -> str:
+        """Raising variant of _call_text_llm_async, used as a DocumentSummarizer provider."""
+        response = await self._call_text_llm_async(prompt)
+        if response.startswith("Vision-AI Error"):
+            raise RuntimeError(response)
+        return response
+
+    async def summarize_transcription_async(self, transcription: str) -> str:
+        if estimate_tokens(transcription) <= DEFAULT_CHUNK_TOKENS:
+            return await self._call_text_llm_async(
+                f"Summarize the following legal note transcription: \n\n{transcription}"
+            )
+        # Multi-page transcriptions are chunked and map-reduced rather than
+        # sent whole into one prompt
+        try:
+            result = await DocumentSummarizer([self._complete_text], use_cache=self.cache is not None).summarize(transcription)
+            return result['summary']
+        except Exception as e:
+            return f"Vision-AI Error: {str(e)}"
+
+    @staticmethod
+    def _run_sync(coro):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        # Called from inside an event loop (e.g. an async Gradio handler):
+        # run the coroutine on its own loop in a helper thread.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, coro).result()
+
+    def process_handwritten_note(self, image_path: str) -> Dict[str, Any]:
+        """Blocking wrapper around process_handwritten_note_async."""
+        return self._run_sync(self.process_handwritten_note_async(image_path))
+
+    def summarize_transcription(self, transcription: str) -> str:
+        return self._run_sync(self.summarize_transcription_async(transcription))
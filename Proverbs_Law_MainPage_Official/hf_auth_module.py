@@ -1,29 +1,166 @@
 """
 HuggingFace User Authentication Module
 Secure login system for ProVerBs Ultimate Brain
+
+Token verification goes through a cache keyed by the token's SHA-256:
+valid tokens are trusted for TOKEN_CACHE_TTL, rejected ones are remembered
+for NEGATIVE_CACHE_TTL, and concurrent logins with the same token share one
+whoami() call, which runs on a worker thread so the event loop never blocks.
+Sessions live in an ExpiringSessionStore (session_store.py): slim records,
+expiry-ordered with a background sweeper, written through to SQLite (token
+hash only, never the token) so they survive restarts.
 """
 
 import gradio as gr
 from huggingface_hub import HfApi, whoami
 from datetime import datetime, timedelta
+import asyncio
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Optional, Dict, Tuple
 import json
 
+from database_manager import DatabaseManager
+from session_store import ExpiringSessionStore, SessionRecord
+
+TOKEN_CACHE_TTL = 600  # seconds a verified token is trusted without asking HuggingFace
+NEGATIVE_CACHE_TTL = 60  # seconds a rejected token is refused without asking again
+TOKEN_CACHE_SIZE = 1024
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenRejectedError(Exception):
+    """HuggingFace refused the token (as opposed to a network failure)."""
+
+
+def _is_auth_failure(error: Exception) -> bool:
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status in (401, 403)
+
+
+class TokenVerificationCache:
+    """
+    whoami() results by token hash, with TTLs for accepted and rejected
+    tokens and single-flight lookups. Only the profile fields a session
+    needs are kept.
+    """
+
+    def __init__(self, ttl: float = TOKEN_CACHE_TTL, negative_ttl: float = NEGATIVE_CACHE_TTL,
+                 max_entries: int = TOKEN_CACHE_SIZE, verify_fn=None, max_workers: int = 4):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.verify_fn = verify_fn or (lambda token: whoami(token=token))
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Dict], str]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hf-whoami")
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0}
+
+    def _lookup(self, token_hash: str):
+        """Cached (user_info, error) or None; caller holds the lock."""
+        entry = self._entries.get(token_hash)
+        if entry is None:
+            return None
+        expires, user_info, error = entry
+        if time.monotonic() >= expires:
+            del self._entries[token_hash]
+            return None
+        self._entries.move_to_end(token_hash)
+        self.stats["hits" if user_info is not None else "negative_hits"] += 1
+        return user_info, error
+
+    def _store(self, token_hash: str, user_info: Optional[Dict], error: str = ""):
+        ttl = self.ttl if user_info is not None else self.negative_ttl
+        with self._lock:
+            self._entries[token_hash] = (time.monotonic() + ttl, user_info, error)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _fetch(self, token_hash: str, token: str) -> Dict:
+        try:
+            try:
+                info = self.verify_fn(token)
+            except Exception as e:
+                if _is_auth_failure(e):
+                    self._store(token_hash, None, str(e))
+                    raise TokenRejectedError(str(e)) from e
+                raise  # network trouble says nothing about the token; don't cache it
+            user_info = {
+                "name": info.get("name", "Unknown"),
+                "email": info.get("email", "N/A"),
+                "avatarUrl": info.get("avatarUrl", ""),
+            }
+            self._store(token_hash, user_info)
+            return user_info
+        finally:
+            # Cached before leaving the in-flight table, so no caller misses both
+            with self._lock:
+                self._inflight.pop(token_hash, None)
+
+    def _submit(self, token: str):
+        """Returns (user_info, None) from the cache or (None, future) for a lookup."""
+        token_hash = hash_token(token)
+        with self._lock:
+            cached = self._lookup(token_hash)
+            if cached is not None:
+                user_info, error = cached
+                if user_info is None:
+                    raise TokenRejectedError(error)
+                return user_info, None
+            future = self._inflight.get(token_hash)
+            if future is None:
+                self.stats["misses"] += 1
+                future = self._executor.submit(self._fetch, token_hash, token)
+                self._inflight[token_hash] = future
+        return None, future
+
+    def verify(self, token: str) -> Dict:
+        """Blocking verification; raises TokenRejectedError for bad tokens."""
+        user_info, future = self._submit(token)
+        return user_info if future is None else future.result()
+
+    async def verify_async(self, token: str) -> Dict:
+        """Awaitable verification; whoami() runs off the event loop."""
+        user_info, future = self._submit(token)
+        return user_info if future is None else await asyncio.wrap_future(future)
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._entries.pop(hash_token(token), None)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        return stats
+
+
 class HFAuthManager:
     """
     HuggingFace Authentication Manager
     Handles user login, session management, and access control
     """
     
-    def __init__(self):
+    def __init__(self, db_manager: Optional[DatabaseManager] = None,
+                 token_cache: Optional[TokenVerificationCache] = None):
         self.api = HfApi()
-        self.sessions = {}  # {username: {token, expires, profile}}
+        self.db = db_manager or DatabaseManager(persistent=True)
+        self.token_cache = token_cache or TokenVerificationCache()
+        self.sessions = ExpiringSessionStore(self.db)
         self.session_duration = timedelta(hours=24)
     
     def login(self, hf_token: str, user_email: str = "") -> Tuple[bool, str, Optional[Dict]]:
         """
-        Login with HuggingFace token
+        Login with HuggingFace token (blocking; prefer login_async in handlers)
         
         Returns:
             (success, message, user_profile)
@@ -32,34 +169,44 @@ class HFAuthManager:
             return False, "⚠️ Please enter your HuggingFace token", None
         
         token = hf_token.strip()
-        supplied_email = user_email.strip() if user_email else ""
+        try:
+            user_info = self.token_cache.verify(token)
+        except Exception as e:
+            return False, self._login_failed_message(e), None
+        return self._start_session(token, user_info, user_email)
+    
+    async def login_async(self, hf_token: str, user_email: str = "") -> Tuple[bool, str, Optional[Dict]]:
+        """
+        Login with HuggingFace token without blocking the event loop
         
+        Returns:
+            (success, message, user_profile)
+        """
+        if not hf_token or not hf_token.strip():
+            return False, "⚠️ Please enter your HuggingFace token", None
+        
+        token = hf_token.strip()
         try:
-            # Verify token and get user info
-            user_info = whoami(token=token)
-            
-            username = user_info.get('name', 'Unknown')
-            hf_email = user_info.get('email', 'N/A')
-            avatar_url = user_info.get('avatarUrl', '')
-            
-            # Use user-supplied email if provided, otherwise fall back to HF profile email
-            contact_email = supplied_email if supplied_email else hf_email
-            
-            # Create session
-            session = {
-                'token': token,
-                'username': username,
-                'email': hf_email,
-                'contact_email': contact_email,
-                'avatar_url': avatar_url,
-                'login_time': datetime.now(),
-                'expires': datetime.now() + self.session_duration,
-                'full_info': user_info
-            }
-            
-            self.sessions[username] = session
-            
-            success_msg = f"""
+            user_info = await self.token_cache.verify_async(token)
+        except Exception as e:
+            return False, self._login_failed_message(e), None
+        return self._start_session(token, user_info, user_email)
+    
+    def _start_session(self, token: str, user_info: Dict, user_email: str) -> Tuple[bool, str, Dict]:
+        username = user_info['name']
+        hf_email = user_info['email']
+        
+        # Use user-supplied email if provided, otherwise fall back to HF profile email
+        supplied_email = user_email.strip() if user_email else ""
+        contact_email = supplied_email if supplied_email else hf_email
+        
+        login_time = time.time()
+        record = SessionRecord(username, hash_token(token), hf_email, contact_email, user_info['avatarUrl'],
+                               login_time, login_time + self.session_duration.total_seconds())
+        self.sessions.put(record)
+        session = self._session_dict(record)
+        
+        success_msg = f"""
 ✅ **Login Successful!**
 
 **Welcome, {username}!**
@@ -71,14 +218,14 @@ class HFAuthManager:
 
 🎉 You now have full access to ProVerBs Ultimate Brain!
             """
-            
-            return True, success_msg, session
-            
-        except Exception as e:
-            error_msg = f"""
+        
+        return True, success_msg, session
+    
+    def _login_failed_message(self, error: Exception) -> str:
+        return f"""
 ❌ **Login Failed**
 
-{str(e)}
+{str(error)}
 
 **Common Issues:**
 - Invalid token
@@ -91,49 +238,40 @@ class HFAuthManager:
 3. Select "read" permissions
 4. Copy and paste here
             """
-            return False, error_msg, None
+    
+    def _session_dict(self, record: SessionRecord) -> Dict:
+        return {
+            'token_hash': record.token_hash,
+            'username': record.username,
+            'email': record.email,
+            'contact_email': record.contact_email,
+            'avatar_url': record.avatar_url,
+            'login_time': datetime.fromtimestamp(record.login_time),
+            'expires': datetime.fromtimestamp(record.expires_at)
+        }
     
     def logout(self, username: str) -> str:
         """Logout user"""
-        if username in self.sessions:
-            del self.sessions[username]
+        if self.sessions.remove(username):
             return f"✅ {username} logged out successfully"
         return "⚠️ No active session found"
     
     def is_authenticated(self, username: str) -> bool:
         """Check if user is authenticated"""
-        if username not in self.sessions:
-            return False
-        
-        session = self.sessions[username]
-        if datetime.now() > session['expires']:
-            del self.sessions[username]
-            return False
-        
-        return True
+        return self.sessions.get(username) is not None
     
     def get_session(self, username: str) -> Optional[Dict]:
         """Get user session"""
-        if self.is_authenticated(username):
-            return self.sessions[username]
-        return None
+        record = self.sessions.get(username)
+        return self._session_dict(record) if record else None
     
     def extend_session(self, username: str) -> bool:
-        """Extend session duration"""
-        if username in self.sessions:
-            self.sessions[username]['expires'] = datetime.now() + self.session_duration
-            return True
-        return False
+        """Extend session duration (sliding expiration)"""
+        return self.sessions.extend(username, self.session_duration.total_seconds())
     
     def get_active_users_count(self) -> int:
         """Get count of active authenticated users"""
-        # Clean expired sessions
-        expired = [u for u, s in self.sessions.items() if datetime.now() > s['expires']]
-        for u in expired:
-            del self.sessions[u]
-        
-        return len(self.sessions)
-
+        return self.sessions.count()
 
 # Global auth manager
 auth_manager = HFAuthManager()
@@ -178,7 +316,7 @@ def create_login_interface(app_token_state: gr.State):
 
             ### Security:
             - 🔒 Your token is **never stored** permanently
-            - 🔒 Tokens are **encrypted** in session
+            - 🔒 Sessions keep only a **SHA-256 hash** of your token
             - 🔒 Sessions **expire** after 24 hours
             - 🔒 You can **logout** anytime
             """)
@@ -228,8 +366,8 @@ def create_login_interface(app_token_state: gr.State):
             session_info = gr.Markdown("")
 
     # Login handler
-    def handle_login(email, token):
-        success, message, session = auth_manager.login(token, user_email=email)
+    async def handle_login(email, token):
+        success, message, session = await auth_manager.login_async(token, user_email=email)
 
         if success:
             username = session['username']
@@ -345,7 +483,7 @@ def create_login_interface(app_token_state: gr.State):
 
     ### Data Privacy:
     - We **never store** your token on servers
-    - Tokens are kept in **memory only** during your session
+    - Sessions keep only a **one-way hash** of your token
     - Sessions **automatically expire** after 24 hours
     - You can **revoke tokens** anytime at HuggingFace
 
@@ -0,0 +1,367 @@
+# ingestion_queue.py
+
+"""
+Persistent document ingestion queue.
+
+Uploaded files are recorded as jobs in SQLite and processed by worker
+processes through four stages: detect the file type, extract text (running
+OCR on image pages), chunk, and index the chunks. Every stage change is also
+written to ingest_events, which the API tails for polling and SSE.
+
+A worker claims a job with a time-limited lease and renews it as it makes
+progress. If the worker crashes, the lease expires and another worker
+reclaims the job. Stages are idempotent (indexing replaces the job's chunks
+in one transaction), so a retried job never leaves duplicates behind. Jobs
+that fail with an error get up to max_attempts tries.
+"""
+
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from database_manager import DatabaseManager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LEASE_SECONDS = 120
+POLL_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+DEFAULT_MAX_ATTEMPTS = 3
+# Deployments point this at a data volume; the default is git-ignored
+UPLOAD_DIR = os.environ.get(
+    "PROVERBS_UPLOAD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_uploads")
+)
+LEADER_LOCK_PATH = os.path.join(tempfile.gettempdir(), "proverbs_ingest_workers.lock")
+STAGES = ("detect", "extract", "ocr", "chunk", "index")
+
+IMAGE_SIGNATURES = (b"\x89PNG\r\n\x1a\n", b"\xff\xd8\xff", b"GIF87a", b"GIF89a", b"BM", b"II*\x00", b"MM\x00*")
+
+
+class PermanentJobError(Exception):
+    """A failure that retrying cannot fix, such as an unsupported file type."""
+
+
+class LeaseLostError(Exception):
+    """The job's lease expired and another worker now owns it."""
+
+
+def detect_file_type(path: str) -> str:
+    """Sniff the file's leading bytes; the uploaded filename is not trusted."""
+    with open(path, "rb") as f:
+        head = f.read(8)
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(IMAGE_SIGNATURES):
+        return "image"
+    if head.startswith(b"PK") and zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            if "word/document.xml" in archive.namelist():
+                return "docx"
+        raise PermanentJobError("Zip archive is not a Word document")
+    with open(path, "rb") as f:
+        sample = f.read(64 * 1024)
+    if b"\x00" not in sample:
+        return "txt"
+    raise PermanentJobError("Unsupported file type")
+
+
+class JobQueue:
+    """SQLite-backed job queue with leases, retries and an event log."""
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None):
+        self.db = db_manager or DatabaseManager(persistent=True)
+
+    def _now(self) -> str:
+        return datetime.now().isoformat()
+
+    def _event(self, conn, job_id: str, status: str, stage: Optional[str] = None,
+               progress: Optional[float] = None, message: Optional[str] = None):
+        conn.execute(
+            "INSERT INTO ingest_events (job_id, stage, status, progress, message, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, stage, status, progress, message, self._now())
+        )
+
+    def enqueue(self, filename: str, file_path: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> str:
+        job_id = uuid.uuid4().hex
+        now = self._now()
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT INTO ingest_jobs (job_id, filename, file_path, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, filename, file_path, max_attempts, now, now)
+            )
+            self._event(conn, job_id, "queued", progress=0.0)
+        return job_id
+
+    def claim(self, worker_id: str, lease_seconds: int = LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest queued job, or a running job whose lease expired.
+        Returns the job row, or None when there is nothing to do.
+        """
+        now = time.time()
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM ingest_jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND lease_expires < ?) ORDER BY created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job["attempts"] >= job["max_attempts"]:
+                # Its last worker died mid-run: give up rather than crash-loop
+                conn.execute(
+                    "UPDATE ingest_jobs SET status = 'failed', lease_owner = NULL, error = ?, updated_at = ? "
+                    "WHERE job_id = ?",
+                    ("Worker lost during final attempt", self._now(), job["job_id"])
+                )
+                self._event(conn, job["job_id"], "failed", job["stage"], message="Worker lost during final attempt")
+                return None
+            conn.execute(
+                "UPDATE ingest_jobs SET status = 'running', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                (worker_id, now + lease_seconds, self._now(), job["job_id"])
+            )
+            job["attempts"] += 1
+            self._event(conn, job["job_id"], "running", job["stage"], job["progress"],
+                        f"Attempt {job['attempts']} of {job['max_attempts']}")
+        return job
+
+    def update(self, job_id: str, worker_id: str, stage: str, progress: float,
+               message: Optional[str] = None, lease_seconds: int = LEASE_SECONDS, **fields):
+        """Record stage progress and renew the lease. Raises LeaseLostError if the job moved on."""
+        assignments = "".join(f", {column} = ?" for column in fields)
+        with self.db.transaction() as conn:
+            updated = conn.execute(
+                f"UPDATE ingest_jobs SET stage = ?, progress = ?, lease_expires = ?, updated_at = ?{assignments} "
+                "WHERE job_id = ? AND lease_owner = ? AND status = 'running'",
+                (stage, progress, time.time() + lease_seconds, self._now(), *fields.values(), job_id, worker_id)
+            ).rowcount
+            if not updated:
+                raise LeaseLostError(job_id)
+            self._event(conn, job_id, "running", stage, progress, message)
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]):
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE ingest_jobs SET status = 'done', stage = 'index', progress = 1.0, lease_owner = NULL, "
+                "result = ?, error = NULL, updated_at = ? WHERE job_id = ? AND lease_owner = ?",
+                (json.dumps(result), self._now(), job_id, worker_id)
+            )
+            self._event(conn, job_id, "done", "index", 1.0)
+
+    def fail(self, job_id: str, worker_id: str, error: str, permanent: bool = False) -> str:
+        """Requeue the job if it has attempts left, otherwise mark it failed. Returns the new status."""
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts, stage FROM ingest_jobs WHERE job_id = ? AND lease_owner = ?",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return "lost"
+            status = "failed" if permanent or row["attempts"] >= row["max_attempts"] else "queued"
+            conn.execute(
+                "UPDATE ingest_jobs SET status = ?, lease_owner = NULL, lease_expires = NULL, error = ?, "
+                "updated_at = ? WHERE job_id = ?",
+                (status, error, self._now(), job_id)
+            )
+            self._event(conn, job_id, status, row["stage"], message=error)
+        return status
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = self.db.execute_query("SELECT * FROM ingest_jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return None
+        job = rows[0]
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job.pop("lease_owner", None)
+        return job
+
+    def get_events(self, job_id: str, after_event_id: int = 0) -> List[Dict[str, Any]]:
+        return self.db.execute_query(
+            "SELECT * FROM ingest_events WHERE job_id = ? AND event_id > ? ORDER BY event_id",
+            (job_id, after_event_id)
+        )
+
+    def get_chunks(self, job_id: str) -> List[Dict[str, Any]]:
+        return self.db.execute_query(
+            "SELECT chunk_index, heading, content, tokens FROM document_chunks WHERE job_id = ? ORDER BY chunk_index",
+            (job_id,)
+        )
+
+    def index_chunks(self, job_id: str, worker_id: str, chunks):
+        """Replace the job's chunks atomically, so a retried job never duplicates them."""
+        with self.db.transaction() as conn:
+            owner = conn.execute("SELECT lease_owner FROM ingest_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if owner is None or owner["lease_owner"] != worker_id:
+                raise LeaseLostError(job_id)
+            conn.execute("DELETE FROM document_chunks WHERE job_id = ?", (job_id,))
+            conn.executemany(
+                "INSERT INTO document_chunks (job_id, chunk_index, heading, content, tokens) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, chunk.index, chunk.heading, chunk.text, chunk.tokens) for chunk in chunks]
+            )
+
+
+class IngestionWorker:
+    """Runs claimed jobs through detect -> extract/ocr -> chunk -> index."""
+
+    def __init__(self, queue: Optional[JobQueue] = None, worker_id: Optional[str] = None):
+        self.queue = queue or JobQueue()
+        self.worker_id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._processor = None
+
+    @property
+    def processor(self):
+        # Loaded on first use so idle workers stay cheap
+        if self._processor is None:
+            from document_processor import DocumentProcessor
+            self._processor = DocumentProcessor()
+        return self._processor
+
+    def _extract_pdf(self, job: Dict[str, Any]) -> str:
+        from utils.pdf_pages import PDFPagePipeline
+
+        pages = []
+        pipeline = PDFPagePipeline(ocr_processor=self.processor.ocr_processor, method='ocr')
+        for page in pipeline.iter_pages(job["file_path"]):
+            pages.append(page["text"])
+            stage = "ocr" if page["source"] == "ocr" else "extract"
+            self.queue.update(job["job_id"], self.worker_id, stage, 0.1 + 0.6 * page["page"] / page["page_count"],
+                              f"Page {page['page']} of {page['page_count']} ({page['source']})")
+        return "\n\n".join(pages).strip()
+
+    def _extract(self, job: Dict[str, Any], file_type: str) -> str:
+        if file_type == "pdf":
+            return self._extract_pdf(job)
+        if file_type == "image":
+            self.queue.update(job["job_id"], self.worker_id, "ocr", 0.2)
+            text = self.processor._process_image(job["file_path"])
+            # DocumentProcessor reports image failures as text rather than raising
+            if text.startswith(("OCR processing not available", "No text could be extracted")):
+                raise PermanentJobError(text)
+            if text.startswith("Error processing image"):
+                raise RuntimeError(text)
+            return text
+        self.queue.update(job["job_id"], self.worker_id, "extract", 0.2)
+        if file_type == "docx":
+            from utils.docx_utils import extract_docx_text
+            return extract_docx_text(job["file_path"])
+        with open(job["file_path"], "rb") as f:
+            return f.read().decode("utf-8", errors="replace")
+
+    def run_job(self, job: Dict[str, Any]):
+        from document_pipeline import LegalChunker
+
+        job_id = job["job_id"]
+        try:
+            self.queue.update(job_id, self.worker_id, "detect", 0.05)
+            file_type = detect_file_type(job["file_path"])
+            self.queue.update(job_id, self.worker_id, "detect", 0.1, f"Detected {file_type}", file_type=file_type)
+
+            text = self._extract(job, file_type)
+            if not text.strip():
+                raise PermanentJobError("No text could be extracted")
+
+            self.queue.update(job_id, self.worker_id, "chunk", 0.8)
+            chunks = LegalChunker().chunk(text)
+
+            self.queue.update(job_id, self.worker_id, "index", 0.9, f"{len(chunks)} chunks")
+            self.queue.index_chunks(job_id, self.worker_id, chunks)
+            self.queue.complete(job_id, self.worker_id, {
+                "file_type": file_type,
+                "characters": len(text),
+                "chunks": len(chunks),
+                "preview": text[:500]
+            })
+        except LeaseLostError:
+            # Another worker owns the job now; drop our copy quietly
+            return
+        except (PermanentJobError, ImportError) as e:
+            self.queue.fail(job_id, self.worker_id, str(e), permanent=True)
+        except Exception as e:
+            self.queue.fail(job_id, self.worker_id, f"{type(e).__name__}: {str(e)}")
+        finally:
+            status = (self.queue.get_job(job_id) or {}).get("status")
+            if status in ("done", "failed"):
+                try:
+                    os.remove(job["file_path"])
+                except OSError:
+                    pass
+
+    def run_forever(self, poll_seconds: float = POLL_SECONDS):
+        failures = 0
+        while True:
+            try:
+                job = self.queue.claim(self.worker_id)
+                if job is not None:
+                    self.run_job(job)
+                failures = 0
+            except Exception as e:
+                # Usually a transient "database is locked"; nothing restarts
+                # a dead worker, so log, back off and keep going. An unfinished
+                # job's lease runs out and it is reclaimed.
+                failures += 1
+                delay = min(MAX_BACKOFF_SECONDS, poll_seconds * 2 ** failures)
+                print(f"Ingestion worker {self.worker_id} error ({type(e).__name__}: {str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            if job is None:
+                time.sleep(poll_seconds)
+
+
+_leader_lock_file = None
+
+
+def _worker_main():
+    IngestionWorker().run_forever()
+
+
+def _acquire_leader_lock(lock_path: str = LEADER_LOCK_PATH) -> bool:
+    """
+    Take an exclusive, non-blocking lock held for the life of this process.
+    Under `uvicorn --workers N` every API process runs the startup hook;
+    only the one that wins this lock starts ingestion workers. If it exits,
+    the OS drops the lock and its replacement process takes over.
+    """
+    global _leader_lock_file
+    if fcntl is None:
+        return True  # no flock (Windows): assume a single API process
+    lock_file = open(lock_path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _leader_lock_file = lock_file  # keep the descriptor, and the lock, open
+    return True
+
+
+def start_workers(count: Optional[int] = None) -> List[multiprocessing.Process]:
+    """
+    Start ingestion worker processes (INGEST_WORKERS, default 2).
+    Spawned rather than forked, so workers do not inherit the API's
+    threads and open connections.
+
+    Safe to call from every API process: only the process holding the
+    leader lock starts workers, so a deployment runs INGEST_WORKERS worker
+    processes in total, however many uvicorn workers serve the API.
+    """
+    if not _acquire_leader_lock():
+        return []
+    count = count if count is not None else int(os.getenv("INGEST_WORKERS", "2"))
+    context = multiprocessing.get_context("spawn")
+    workers = []
+    for _ in range(count):
+        process = context.Process(target=_worker_main, daemon=True)
+        process.start()
+        workers.append(process)
+    return workers
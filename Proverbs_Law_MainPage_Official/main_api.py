@@ -1,11 +1,13 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, File, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import Response, StreamingResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import json
 import asyncio
+import base64
 import os
+import uuid
 import gradio as gr
 from typing import List, Dict, Optional, Any
 from expert_router import ExpertRouter
@@ -15,7 +17,11 @@ from harmonic_sequencer import HarmonicSequencer
 # Import the core reasoning brain and Gradio interface
 from unified_brain import UnifiedBrain, ReasoningContext
 from intelligence_discovery import ModelDiscoveryEngine
-from conversation_agent import get_conversation_agent
+from conversation_agent import get_conversation_agent, get_session_manager
+from context_engine import get_context_engine
+from case_management_module import CaseManager
+from ingestion_queue import JobQueue, UPLOAD_DIR, start_workers
+from utils.ingest_utils import MAX_DOWNLOAD_BYTES
 from app import create_login_interface # Assuming app.py is refactored to export the block
 
 app = FastAPI(title="ProVerBs Legal AI - Ultimate Brain API")
@@ -61,12 +67,16 @@ class AudioRequest(BaseModel):
     voice: str = "en-US-AriaNeural"
     rate: float = 1.0
     pitch: int = 0
+    session_id: Optional[str] = None
 
 brain = UnifiedBrain()
 discovery_engine = ModelDiscoveryEngine()
 router = ExpertRouter()
 corrector = StatusCorrectionModule()
 sequencer = HarmonicSequencer()
+case_manager = CaseManager()
+ingest_queue = JobQueue()
+ingest_workers = []
 
 # Mount the compiled Next.js 3D Frontend
 # This directory is created during the Multi-Stage Docker Build
@@ -146,6 +156,8 @@ async def process_conversation(request: ConversationRequest):
         from app import ultimate_brain
         from huggingface_hub import InferenceClient
 
+        session_agent = get_session_manager().get(request.session_id)
+
         # Process with Ultimate Brain
         brain_result = await ultimate_brain.process_legal_query(
             query=request.query,
@@ -195,11 +207,13 @@ async def process_conversation(request: ConversationRequest):
             # Placeholder for other providers
             response_text = f"[{request.ai_provider.upper()}] Response would be generated here"
 
+        session_agent.add_turn(request.query, response_text, request.mode, request.ai_provider)
+
         return {
             "success": True,
             "response": response_text,
             "reasoning": reasoning_info,
-            "session_id": request.session_id,
+            "session_id": session_agent.session_id,
             "mode": request.mode,
             "ai_provider": request.ai_provider
         }
@@ -213,36 +227,89 @@ async def generate_audio(request: AudioRequest):
     """
     Generate audio from text using text-to-speech
 
+    The audio goes into the TTS cache and the response says where to fetch
+    it; nothing is written to or read back from a temp file. Without a TTS
+    cache the MP3 comes back inline, base64-encoded, as "audio_base64".
+
     Returns:
     {
-        "audio_path": "/tmp/audio_file.mp3",
+        "audio_key": "<sha256>",
+        "audio_url": "/api/conversation/audio/<sha256>",
         "success": true
     }
     """
     try:
-        agent = get_conversation_agent()
-
-        # Set voice and speech settings
-        agent.voice = request.voice
-        agent.rate = request.rate
-        agent.pitch = request.pitch
+        agent = get_conversation_agent(request.session_id)
 
-        # Generate audio
-        audio_bytes, audio_path = await agent.text_to_speech(request.text)
-
-        if not audio_path:
-            raise Exception("Failed to generate audio")
-
-        return {
+        # Per-request voice settings; the agent's defaults stay untouched
+        voice_settings = {"voice": request.voice, "rate": request.rate, "pitch": request.pitch}
+        result = {
             "success": True,
-            "audio_path": audio_path,
             "message": "Audio generated successfully"
         }
 
+        if agent.tts_cache is not None:
+            # A cache hit costs one lookup; the client fetches the bytes by key
+            audio_key = await agent.cache_speech(request.text, **voice_settings)
+            if not audio_key:
+                raise Exception("Failed to generate audio")
+            result["audio_key"] = audio_key
+            result["audio_url"] = f"/api/conversation/audio/{audio_key}"
+            return result
+
+        audio_bytes = b"".join([chunk async for chunk in agent.iter_speech(request.text, **voice_settings)])
+        if not audio_bytes:
+            raise Exception("Failed to generate audio")
+        result["audio_base64"] = base64.b64encode(audio_bytes).decode("ascii")
+        return result
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audio generation error: {str(e)}")
 
 
+@app.post("/api/conversation/audio/stream")
+async def stream_audio(request: AudioRequest):
+    """
+    Stream synthesized speech as audio/mpeg with chunked transfer encoding.
+    Chunks are relayed from Edge TTS as they are produced (or replayed from
+    the TTS cache), so playback can start before synthesis finishes and
+    nothing is written to a temp file.
+    """
+    agent = get_conversation_agent(request.session_id)
+    if not agent.tts_available:
+        raise HTTPException(status_code=503, detail="Text-to-speech is not available")
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="No text to synthesize")
+
+    return StreamingResponse(
+        agent.iter_speech(request.text, voice=request.voice, rate=request.rate, pitch=request.pitch),
+        media_type="audio/mpeg",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@app.get("/api/conversation/audio/{audio_key}")
+async def cached_audio(audio_key: str):
+    """Serve synthesized speech straight from the TTS cache."""
+    agent = get_conversation_agent()
+    if agent.tts_cache is None or len(audio_key) != 64 or not all(c in "0123456789abcdef" for c in audio_key):
+        raise HTTPException(status_code=404, detail="Audio not found")
+    # Read into memory rather than FileResponse: eviction could unlink the
+    # cache file between the lookup and the send
+    audio = agent.tts_cache.peek(audio_key)
+    if audio is None:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    return Response(
+        audio,
+        media_type="audio/mpeg",
+        headers={
+            "ETag": f'"{audio_key}"',
+            # Keyed by text and voice settings, so the audio behind a key never changes
+            "Cache-Control": "public, max-age=31536000, immutable"
+        }
+    )
+
+
 @app.get("/api/conversation/status")
 async def conversation_status():
     """
@@ -253,9 +320,129 @@ async def conversation_status():
         "status": "online",
         "service": "conversation_agent",
         "tts_available": agent.tts_available,
+        "tts_cache": agent.tts_cache.get_stats() if agent.tts_cache is not None else None,
+        "active_sessions": len(get_session_manager()),
+        "context_engine": get_context_engine().get_stats(),
         "available_voices": agent.get_voice_options()
     }
 
+@app.get("/api/case-documents/{document_id}/content")
+async def case_document_content(document_id: int):
+    """
+    Serve a stored case document straight from the blob store.
+    FileResponse streams from disk (and uses zero-copy sendfile where the
+    server supports it), so large exhibits never pass through Python memory.
+    """
+    document = case_manager.get_document(document_id)
+    if not document or not document.get("blob_sha256"):
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    blob_path = case_manager.blob_store.path_for(document["blob_sha256"])
+    if not os.path.isfile(blob_path):
+        raise HTTPException(status_code=404, detail="Document content missing from store")
+
+    return FileResponse(
+        blob_path,
+        filename=document["title"],
+        headers={
+            "ETag": f'"{document["blob_sha256"]}"',
+            # Content-addressed: the bytes behind a digest never change
+            "Cache-Control": "private, max-age=31536000, immutable"
+        }
+    )
+
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+EVENT_POLL_SECONDS = 0.5
+
+
+@app.on_event("startup")
+async def start_ingestion_workers():
+    """
+    Worker processes pick up queued jobs, including any left over from a crash.
+    Every uvicorn worker runs this hook; only one of them (the leader-lock
+    holder) actually starts the INGEST_WORKERS ingestion processes.
+    """
+    ingest_workers.extend(start_workers())
+
+
+@app.post("/api/documents", status_code=202)
+async def upload_document(file: UploadFile = File(...)):
+    """
+    Stream an upload to disk and queue it for ingestion.
+    Returns the job id immediately; poll /api/documents/{job_id} or
+    subscribe to /api/documents/{job_id}/events for progress.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, uuid.uuid4().hex)
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_DOWNLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds the {MAX_DOWNLOAD_BYTES} byte limit")
+                out.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    finally:
+        await file.close()
+
+    job_id = await asyncio.to_thread(ingest_queue.enqueue, file.filename or "upload", path)
+    return {"job_id": job_id, "status": "queued", "bytes": size}
+
+
+@app.get("/api/documents/{job_id}")
+async def document_job_status(job_id: str):
+    job = await asyncio.to_thread(ingest_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/documents/{job_id}/events")
+async def document_job_events(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of a job's stage progress. Events carry their
+    ingest_events id, so a reconnecting client resumes via Last-Event-ID.
+    """
+    if await asyncio.to_thread(ingest_queue.get_job, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    last_id = request.headers.get("last-event-id", "0")
+    last_id = int(last_id) if last_id.isdigit() else 0
+
+    async def event_generator():
+        nonlocal last_id
+        while not await request.is_disconnected():
+            events = await asyncio.to_thread(ingest_queue.get_events, job_id, last_id)
+            for event in events:
+                last_id = event["event_id"]
+                yield f"id: {last_id}\nevent: {event['status']}\ndata: {json.dumps(event)}\n\n"
+                if event["status"] in ("done", "failed"):
+                    return
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/api/documents/{job_id}/chunks")
+async def document_job_chunks(job_id: str):
+    job = await asyncio.to_thread(ingest_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return {"job_id": job_id, "chunks": await asyncio.to_thread(ingest_queue.get_chunks, job_id)}
+
+
+@app.post("/api/maintain/blob-gc")
+async def blob_garbage_collect(background_tasks: BackgroundTasks):
+    """Remove stored blobs that are no longer referenced by any document."""
+    background_tasks.add_task(case_manager.blob_store.collect_garbage)
+    return {"status": "Collecting...", "store": case_manager.blob_store.get_stats()}
+
 @app.post("/api/maintain/self-evolve")
 async def self_evolve(background_tasks: BackgroundTasks):
     """
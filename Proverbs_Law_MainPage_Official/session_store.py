@@ -0,0 +1,228 @@
+# session_store.py
+
+"""
+Expiry-ordered store for login sessions.
+
+Sessions are kept in a dict for O(1) lookup plus a min-heap of
+(expires_at, username) entries, so expiring sessions costs O(log n) per
+session that actually expired instead of a scan over all of them. Extending
+a session pushes a new heap entry and leaves the old one behind; stale
+entries are recognised and dropped when they reach the top of the heap. A
+background sweeper pops due entries on an interval, so expired sessions are
+released even when nobody calls into the store.
+
+Records hold only what the UI shows, and are written through to the
+auth_sessions table so they survive restarts. Several processes can share
+that table: whenever PRAGMA data_version shows another connection has
+committed, a lookup re-reads that session's row once per new version (so a
+logout anywhere revokes it everywhere, and repeat lookups stay in memory)
+and counts resynchronise the whole store.
+"""
+
+import heapq
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from database_manager import DatabaseManager
+
+DEFAULT_SWEEP_INTERVAL = 60  # seconds
+
+
+class SessionRecord:
+    __slots__ = ("username", "token_hash", "email", "contact_email", "avatar_url", "login_time", "expires_at")
+
+    def __init__(self, username: str, token_hash: str, email: str, contact_email: str,
+                 avatar_url: str, login_time: float, expires_at: float):
+        self.username = username
+        self.token_hash = token_hash
+        self.email = email
+        self.contact_email = contact_email
+        self.avatar_url = avatar_url
+        self.login_time = login_time
+        self.expires_at = expires_at
+
+    @classmethod
+    def from_row(cls, row: Dict) -> "SessionRecord":
+        return cls(row["username"], row["token_hash"], row["email"], row["contact_email"],
+                   row["avatar_url"], row["login_time"], row["expires_at"])
+
+
+class ExpiringSessionStore:
+    def __init__(self, db_manager: Optional[DatabaseManager] = None,
+                 sweep_interval: float = DEFAULT_SWEEP_INTERVAL, start_sweeper: bool = True):
+        self.db = db_manager or DatabaseManager(persistent=True)
+        self.sweep_interval = sweep_interval
+        self._records: Dict[str, SessionRecord] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._version: Optional[int] = None
+        # Users whose row was re-read at _checked_version, since the last reload
+        self._checked_version: Optional[int] = None
+        self._checked: set = set()
+        self.stats = {"expired": 0, "sweeps": 0, "reloads": 0}
+        self.db.execute_non_query("DELETE FROM auth_sessions WHERE expires_at <= ?", (time.time(),))
+        self._reload()
+        if start_sweeper:
+            threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True).start()
+
+    def _changed_elsewhere(self) -> bool:
+        """True when another connection may have written auth_sessions since the last reload."""
+        version = self.db.data_version()
+        return version is None or version != self._version
+
+    def _reload(self):
+        # Under the lock so a local put() cannot land between the SELECT and
+        # the swap. The version is read first: a commit made elsewhere during
+        # the SELECT shows up as a change on the next check, not as a miss.
+        with self._lock:
+            version = self.db.data_version()
+            rows = self.db.execute_query("SELECT * FROM auth_sessions WHERE expires_at > ?", (time.time(),))
+            self._records = {row["username"]: SessionRecord.from_row(row) for row in rows}
+            self._heap = [(record.expires_at, record.username) for record in self._records.values()]
+            heapq.heapify(self._heap)
+            self._version = version
+            self._checked_version, self._checked = None, set()
+            self.stats["reloads"] += 1
+
+    def _push(self, record: SessionRecord):
+        """Caller holds the lock."""
+        heapq.heappush(self._heap, (record.expires_at, record.username))
+        # Every extension leaves a stale entry behind; rebuild once they dominate
+        if len(self._heap) > 2 * len(self._records) + 64:
+            self._heap = [(r.expires_at, r.username) for r in self._records.values()]
+            heapq.heapify(self._heap)
+
+    def _pop_expired(self, now: float) -> List[str]:
+        """Remove sessions due by now; caller holds the lock. Returns their usernames."""
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, username = heapq.heappop(self._heap)
+            record = self._records.get(username)
+            if record is not None and record.expires_at == expires_at:
+                del self._records[username]
+                expired.append(username)
+        self.stats["expired"] += len(expired)
+        return expired
+
+    def put(self, record: SessionRecord):
+        with self._lock:
+            self._records[record.username] = record
+            self._push(record)
+        self.db.execute_non_query(
+            "INSERT OR REPLACE INTO auth_sessions "
+            "(username, token_hash, email, contact_email, avatar_url, login_time, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (record.username, record.token_hash, record.email, record.contact_email,
+             record.avatar_url, record.login_time, record.expires_at)
+        )
+
+    def _needs_row_check(self, username: str, version: Optional[int]) -> bool:
+        """
+        True when the user's row must be re-read: another connection has
+        committed since the last reload and this user has not been checked
+        at that version yet.
+        """
+        if version is None:
+            return True
+        if version == self._version:
+            return False
+        with self._lock:
+            if version != self._checked_version:
+                self._checked_version, self._checked = version, set()
+            return username not in self._checked
+
+    def get(self, username: str) -> Optional[SessionRecord]:
+        """Live session or None; never returns an expired or revoked one."""
+        now = time.time()
+        version = self.db.data_version()
+        if self._needs_row_check(username, version):
+            # Another process may have logged this user out, in or extended
+            # the session: the row is the truth (one primary-key lookup)
+            rows = self.db.execute_query(
+                "SELECT * FROM auth_sessions WHERE username = ? AND expires_at > ?", (username, now)
+            )
+            with self._lock:
+                if version is not None and version == self._checked_version:
+                    self._checked.add(username)
+                if not rows:
+                    self._records.pop(username, None)
+                    return None
+                fresh = SessionRecord.from_row(rows[0])
+                record = self._records.get(username)
+                if record is None or (record.token_hash, record.expires_at) != (fresh.token_hash, fresh.expires_at):
+                    record = self._records[username] = fresh
+                    self._push(record)
+            return record
+        with self._lock:
+            record = self._records.get(username)
+        if record is None or record.expires_at <= now:
+            return None
+        return record
+
+    def extend(self, username: str, duration: float) -> bool:
+        """Sliding expiration: O(log n) heap push, one row update."""
+        now = time.time()
+        expires_at = now + duration
+        # The row decides: a session revoked by another process stays revoked
+        updated = self.db.execute_non_query(
+            "UPDATE auth_sessions SET expires_at = ? WHERE username = ? AND expires_at > ?",
+            (expires_at, username, now)
+        )
+        with self._lock:
+            record = self._records.get(username)
+            if not updated:
+                self._records.pop(username, None)
+                return False
+            if record is None:
+                rows = self.db.execute_query("SELECT * FROM auth_sessions WHERE username = ?", (username,))
+                if not rows:
+                    return False
+                record = self._records[username] = SessionRecord.from_row(rows[0])
+            record.expires_at = expires_at
+            self._push(record)
+        return True
+
+    def remove(self, username: str) -> bool:
+        with self._lock:
+            removed = self._records.pop(username, None) is not None
+        # Its heap entry is dropped as stale when it surfaces
+        deleted = self.db.execute_non_query("DELETE FROM auth_sessions WHERE username = ?", (username,))
+        return removed or deleted > 0
+
+    def count(self) -> int:
+        if self._changed_elsewhere():
+            self._reload()
+        with self._lock:
+            self._pop_expired(time.time())
+            return len(self._records)
+
+    def sweep(self) -> int:
+        """Drop due sessions from memory and the database. Returns how many expired here."""
+        now = time.time()
+        if self._changed_elsewhere():
+            self._reload()
+        with self._lock:
+            expired = self._pop_expired(now)
+            self.stats["sweeps"] += 1
+        # Index range delete; also catches rows expired in other processes
+        self.db.execute_non_query("DELETE FROM auth_sessions WHERE expires_at <= ?", (now,))
+        return len(expired)
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Session sweep error: {str(e)}")
+
+    def close(self):
+        self._stop.set()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["active"] = len(self._records)
+            stats["heap_entries"] = len(self._heap)
+        return stats
@@ -6,10 +6,21 @@ Complete voice cloning, recording, playback, and processing
 import gradio as gr
 import os
 import subprocess
-import json
 from datetime import datetime
 from typing import Optional, Tuple
 import tempfile
+import time
+import soundfile as sf
+import audio_processing
+from voice_synthesis import DEFAULT_VOICE_STYLE, SUPERTONIC_REF, get_voice_engine, helper_api_matches, load_helper, list_voice_styles
+from blob_store import BlobStore
+from voice_profiles import VoiceProfileStore, cosine_similarity
+
+# Preset voices are analysed like recordings and stored as profiles under
+# this prefix, so matching a recording to a preset needs no synthesis
+PRESET_PROFILE_PREFIX = "supertonic-preset:"
+CALIBRATION_TEXT = ("The court will now hear arguments in the matter before it. "
+                    "Please state your full name and address for the record.")
 
 class SupertonicVoiceCloning:
     """
@@ -18,7 +29,8 @@ class SupertonicVoiceCloning:
     
     def __init__(self):
         self.supertonic_installed = False
-        self.recordings = []
+        self.blob_store = BlobStore()
+        self.profiles = VoiceProfileStore(db_manager=self.blob_store.db_manager, blob_store=self.blob_store)
         self.check_installation()
     
     def check_installation(self):
@@ -48,10 +60,21 @@ class SupertonicVoiceCloning:
             if result.returncode != 0:
                 return f"[ERROR] Failed to clone repository: {result.stderr}"
             
+            # The synthesis engine builds on py/helper.py, which has no stable
+            # API; SUPERTONIC_REF pins the release it is known to work with
+            supertonic_path = os.path.join(os.path.dirname(__file__), "supertonic")
+            if SUPERTONIC_REF:
+                result = subprocess.run(
+                    ["git", "-C", supertonic_path, "checkout", "--quiet", SUPERTONIC_REF],
+                    capture_output=True,
+                    text=True
+                )
+                if result.returncode != 0:
+                    return f"[ERROR] Failed to check out {SUPERTONIC_REF}: {result.stderr}"
+            
             progress(0.5, desc="[DOWNLOAD] Downloading voice models...")
             
             # Download ONNX models
-            supertonic_path = os.path.join(os.path.dirname(__file__), "supertonic")
             result = subprocess.run(
                 ["git", "clone",
                  "https://huggingface.co/Supertone/supertonic",
@@ -66,7 +89,18 @@ class SupertonicVoiceCloning:
             progress(1.0, desc="[OK] Installation complete!")
             
             self.supertonic_installed = True
-            return "[OK] Supertonic installed successfully!\n\nYou can now use voice cloning features."
+            commit = subprocess.run(
+                ["git", "-C", supertonic_path, "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True
+            ).stdout.strip()
+            try:
+                helper_note = ("tuned session pool enabled" if helper_api_matches(load_helper())
+                               else "helper API differs from the tested one; using its default loader")
+            except Exception as e:
+                helper_note = f"helper not loadable: {str(e)}"
+            return (f"[OK] Supertonic installed successfully!\n[VERSION] {commit or 'unknown'} ({helper_note})\n\n"
+                    "You can now use voice cloning features.")
             
         except Exception as e:
             return f"[ERROR] Installation failed: {str(e)}"
@@ -77,27 +111,40 @@ class SupertonicVoiceCloning:
             return None, "[WARNING] No audio provided. Please record or upload audio."
         
         try:
-            # Save recording
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"voice_{voice_name}_{timestamp}.wav"
-            filepath = os.path.join(tempfile.gettempdir(), filename)
+            # Save recording into the content-addressed store; re-saving the
+            # same take only adds a reference instead of another copy
+            blob = self.blob_store.ingest_file(audio_input)
             
-            # Copy audio file
-            import shutil
-            shutil.copy(audio_input, filepath)
+            # Speaker embedding is computed once here and kept with the profile
+            profile = self.profiles.add_recording(voice_name, blob)
             
-            # Add to recordings list
-            self.recordings.append({
-                "name": voice_name,
-                "file": filepath,
-                "timestamp": timestamp
-            })
-            
-            return audio_input, f"[OK] Voice recorded: {voice_name}\n[FILE] Saved as: {filename}"
+            stored = "already stored, reference added" if blob["deduplicated"] else "stored"
+            analysed = "embedding reused" if profile["embedding_reused"] else "embedding computed"
+            return audio_input, (f"[OK] Voice recorded: {voice_name}\n[FILE] {blob['sha256'][:12]} ({stored})\n"
+                                 f"[PROFILE] {profile['recordings']} recording(s), {profile['duration']:.1f}s ({analysed})")
             
         except Exception as e:
             return None, f"[ERROR] Recording failed: {str(e)}"
     
+    def _preset_embeddings(self, engine):
+        """Speaker embedding per preset style path; each preset is synthesized and analysed once, ever."""
+        embeddings = {}
+        for style_path in list_voice_styles():
+            name = PRESET_PROFILE_PREFIX + os.path.basename(style_path)
+            profile = self.profiles.get_profile(name)
+            if profile is None:
+                audio, sample_rate = engine.synthesize(CALIBRATION_TEXT, style_path)
+                fd, sample_path = tempfile.mkstemp(suffix=".wav")
+                os.close(fd)
+                try:
+                    sf.write(sample_path, audio, sample_rate)
+                    self.profiles.add_recording(name, self.blob_store.ingest_file(sample_path))
+                finally:
+                    os.remove(sample_path)
+                profile = self.profiles.get_profile(name)
+            embeddings[style_path] = profile["embedding"]
+        return embeddings
+    
     def clone_voice(self, source_audio, target_text: str, progress=gr.Progress()):
         """Clone voice with target text"""
         if not self.supertonic_installed:
@@ -110,18 +157,43 @@ class SupertonicVoiceCloning:
             return None, "[WARNING] No target text provided."
         
         try:
+            # Warm, pooled ONNX sessions; None until the models are downloaded
+            engine = get_voice_engine()
+            if engine is None:
+                return None, "[ERROR] Supertonic models or onnxruntime not available. Please install first."
+            
+            # Supertonic speaks with preset voice styles; it cannot clone an
+            # arbitrary recording. Use the preset whose stored speaker
+            # embedding is closest to the recording's, and say so.
             progress(0.3, desc="[MIC] Analyzing voice...")
+            source_embedding = self.profiles.embedding_for_file(source_audio)
+            presets = self._preset_embeddings(engine)
+            style_path, similarity = None, None
+            if presets:
+                style_path, similarity = max(
+                    ((path, cosine_similarity(source_embedding, embedding)) for path, embedding in presets.items()),
+                    key=lambda match: match[1]
+                )
+            style_name = os.path.basename(style_path) if style_path else DEFAULT_VOICE_STYLE
+            match_note = f" (closest to your recording, similarity {similarity:.2f})" if style_path else ""
             
-            # Simulate voice cloning (replace with actual Supertonic call)
             progress(0.6, desc="[SPEAKER] Synthesizing speech...")
+            started = time.perf_counter()
+            audio, sample_rate = engine.synthesize(target_text, style_path)
+            elapsed = time.perf_counter() - started
             
-            # For now, return source audio as placeholder
-            # TODO: Integrate actual Supertonic voice cloning
-            result_file = source_audio
+            result_file = os.path.join(tempfile.gettempdir(), f"cloned_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.wav")
+            sf.write(result_file, audio, sample_rate)
             
             progress(1.0, desc="[OK] Voice cloning complete!")
             
-            return result_file, f"[OK] Voice cloned successfully!\n\n[TEXT] Text: {target_text[:100]}..."
+            duration = len(audio) / sample_rate
+            return result_file, (
+                f"[OK] Speech synthesized with Supertonic preset voice {style_name}{match_note}\n"
+                f"[WARNING] Supertonic does not clone from a recording; your audio only chose the preset.\n\n"
+                f"[TEXT] Text: {target_text[:100]}...\n"
+                f"[TIME] {duration:.1f}s of speech in {elapsed:.2f}s (RTF {elapsed / max(duration, 1e-6):.3f})"
+            )
             
         except Exception as e:
             return None, f"[ERROR] Voice cloning failed: {str(e)}"
@@ -139,41 +211,38 @@ class SupertonicVoiceCloning:
                 "pitch_shift": "[NOTE] Pitch adjusted"
             }
             
-            # Return processed audio (placeholder)
-            return audio_file, f"[OK] {effects.get(processing_type, 'Processing complete')}"
+            # Streamed block by block, so long recordings are never loaded whole
+            result = audio_processing.process_file(audio_file, processing_type)
+            details = f"[TIME] {result['duration']:.1f}s of audio in {result['seconds']:.2f}s"
+            if result.get("silent"):
+                details += " | near-silent input, level left unchanged"
+            elif "gain_db" in result:
+                details += f" | gain {result['gain_db']:+.1f} dB"
+            return result["output_path"], f"[OK] {effects.get(processing_type, 'Processing complete')}\n{details}"
             
         except Exception as e:
             return None, f"[ERROR] Processing failed: {str(e)}"
     
     def get_recordings_list(self):
         """Get list of saved recordings"""
-        if not self.recordings:
+        recordings = [rec for rec in self.profiles.list_recordings()
+                      if not rec['profile_name'].startswith(PRESET_PROFILE_PREFIX)]
+        if not recordings:
             return "No recordings yet."
         
         recordings_text = "📼 Saved Recordings:\n\n"
-        for i, rec in enumerate(self.recordings, 1):
-            recordings_text += f"{i}. **{rec['name']}** - {rec['timestamp']}\n"
-            recordings_text += f"   📁 {rec['file']}\n\n"
+        for i, rec in enumerate(recordings, 1):
+            recordings_text += f"{i}. **{rec['profile_name']}** - {rec['created_at'][:19]} ({rec['duration']:.1f}s)\n"
+            recordings_text += f"   📁 {self.blob_store.path_for(rec['blob_sha256'])}\n\n"
         
         return recordings_text
     
     def export_voice_profile(self, voice_name: str):
         """Export voice profile for later use"""
-        recordings = [r for r in self.recordings if r['name'] == voice_name]
-        
-        if not recordings:
-            return None, f"❌ No recordings found for: {voice_name}"
-        
         try:
-            profile = {
-                "voice_name": voice_name,
-                "recordings": recordings,
-                "created": datetime.now().isoformat()
-            }
-            
             profile_file = os.path.join(tempfile.gettempdir(), f"voice_profile_{voice_name}.json")
-            with open(profile_file, 'w') as f:
-                json.dump(profile, f, indent=2)
+            if not self.profiles.export_profile(voice_name, profile_file):
+                return None, f"❌ No recordings found for: {voice_name}"
             
             return profile_file, f"✅ Voice profile exported: {voice_name}"
             
@@ -0,0 +1,145 @@
+"""
+Size-bounded on-disk cache shared by the OCR, summarization and TTS layers.
+
+Values are stored as files under <cache_dir>/<namespace>/<key[:2]>/<key>;
+a SQLite index tracks sizes and last access so the least recently used
+entries are evicted once the total exceeds max_bytes. Several processes may
+share one cache directory.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.environ.get("PROVERBS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "proverbs_cache"))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+
+
+class DiskCache:
+    """LRU, size-bounded key/value store of bytes on disk."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+
+    def path_for(self, namespace, key):
+        return os.path.join(self.cache_dir, namespace.replace(":", "_").replace("/", "_"), key[:2], key)
+
+    def _touch(self, namespace, key):
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                (time.time(), namespace, key)
+            ).rowcount > 0
+
+    def get_path(self, namespace, key):
+        """Path of a cached value, or None on a miss. Counts as an access."""
+        path = self.path_for(namespace, key)
+        if self._touch(namespace, key) and os.path.isfile(path):
+            self.hits += 1
+            return path
+        self.misses += 1
+        return None
+
+    def get(self, namespace, key):
+        path = self.get_path(namespace, key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted by another process between the lookup and the read
+            return None
+
+    def set(self, namespace, key, value):
+        path = self.path_for(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, size, last_access) VALUES (?, ?, ?, ?)",
+                (namespace, key, len(value), time.time())
+            )
+        self._evict()
+        return path
+
+    def get_json(self, namespace, key):
+        value = self.get(namespace, key)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, namespace, key, value):
+        return self.set(namespace, key, json.dumps(value).encode("utf-8"))
+
+    def delete(self, namespace, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        try:
+            os.remove(self.path_for(namespace, key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for namespace, key, size in self._conn.execute(
+                "SELECT namespace, key, size FROM entries ORDER BY last_access"
+            ):
+                victims.append((namespace, key))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        for namespace, key in victims:
+            self.delete(namespace, key)
+
+    def get_stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{(self.hits / lookups * 100) if lookups else 0.0:.2f}%"
+        }
+
+
+_disk_cache = None
+_disk_cache_lock = threading.Lock()
+
+
+def get_disk_cache():
+    """Process-wide DiskCache on the default directory."""
+    global _disk_cache
+    with _disk_cache_lock:
+        if _disk_cache is None:
+            _disk_cache = DiskCache()
+        return _disk_cache
@@ -0,0 +1,206 @@
+"""
+Streaming DOCX text extraction.
+
+Reads the WordprocessingML parts straight out of the zip with expat, so no
+element tree (let alone python-docx's object model) is ever built: memory
+stays flat however long the agreement is. Output is markdown-ish text in
+reading order: page headers, then the body with paragraphs, headings, list
+items and tables (one row per line, cells joined with |), then footers and
+the footnote and endnote bodies referenced from the text as [^n].
+"""
+
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from xml.parsers import expat
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+READ_SIZE = 64 * 1024
+_HEADING_STYLE = re.compile(r'^(?:Heading|heading)\s*(\d)$')
+_PART_NUMBER = re.compile(r'(\d+)')
+
+
+def _w(name):
+    return f"{W} {name}"
+
+
+def _part_order(name):
+    match = _PART_NUMBER.search(os.path.basename(name))
+    return int(match.group(1)) if match else 0
+
+
+class _PartParser:
+    """
+    Expat handlers for one XML part. Completed blocks accumulate in
+    self.blocks and are drained by the caller after every read.
+    """
+
+    def __init__(self, note_tag=None):
+        self.blocks = []
+        self._note_tag = note_tag  # 'footnote' / 'endnote' when parsing notes parts
+        self._note_id = None
+        self._runs = []
+        self._in_text = False
+        self._style = None
+        self._numbered = False
+        self._rows = []  # stack of the current row's cells, one list per open table
+        self._cell = []  # stack of paragraph texts in the current cell, per open table
+        self._table = []  # finished rows of the outermost open table
+        self._skip_depth = 0  # inside deleted text or field instructions
+
+        self.parser = expat.ParserCreate(namespace_separator=" ")
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self._start
+        self.parser.EndElementHandler = self._end
+        self.parser.CharacterDataHandler = self._data
+
+    def _start(self, name, attrs):
+        if name == _w('t'):
+            self._in_text = True
+        elif name in (_w('delText'), _w('instrText')):
+            self._skip_depth += 1
+        elif name == _w('tab'):
+            self._runs.append("\t")
+        elif name in (_w('br'), _w('cr')):
+            self._runs.append("\n")
+        elif name == _w('pStyle'):
+            self._style = attrs.get(_w('val'))
+        elif name == _w('numPr'):
+            self._numbered = True
+        elif name in (_w('footnoteReference'), _w('endnoteReference')):
+            prefix = "^" if name == _w('footnoteReference') else "^e"
+            self._runs.append(f"[{prefix}{attrs.get(_w('id'))}]")
+        elif name == _w('tbl'):
+            self._rows.append([])
+            self._cell.append([])
+        elif name == _w('tr') and self._rows:
+            self._rows[-1] = []
+        elif self._note_tag and name == _w(self._note_tag):
+            note_type = attrs.get(_w('type'))
+            self._note_id = None if note_type in ('separator', 'continuationSeparator', 'continuationNotice') \
+                else attrs.get(_w('id'))
+
+    def _end(self, name):
+        if name == _w('t'):
+            self._in_text = False
+        elif name in (_w('delText'), _w('instrText')):
+            self._skip_depth -= 1
+        elif name == _w('p'):
+            self._end_paragraph()
+        elif name == _w('tc') and self._rows:
+            self._rows[-1].append(" ".join(self._cell[-1]))
+            self._cell[-1] = []
+        elif name == _w('tr') and self._rows:
+            row = " | ".join(cell.strip() for cell in self._rows[-1])
+            if row.strip(" |"):
+                if len(self._rows) > 1:
+                    # Row of a nested table: fold it into the enclosing cell
+                    self._cell[-2].append(f"| {row} |")
+                else:
+                    self._table.append(f"| {row} |")
+        elif name == _w('tbl') and self._rows:
+            self._rows.pop()
+            self._cell.pop()
+            if not self._rows and self._table:
+                # One block per table so the rows stay on consecutive lines
+                self._emit("\n".join(self._table))
+                self._table = []
+
+    def _data(self, data):
+        if self._in_text and not self._skip_depth:
+            self._runs.append(data)
+
+    def _end_paragraph(self):
+        text = "".join(self._runs).strip()
+        style, numbered = self._style, self._numbered
+        self._runs, self._style, self._numbered = [], None, False
+        if not text:
+            return
+        if self._cell:
+            # Paragraphs inside a table cell become part of that cell
+            self._cell[-1].append(text)
+            return
+        heading = _HEADING_STYLE.match(style or "")
+        if heading:
+            text = "#" * min(int(heading.group(1)), 6) + " " + text
+        elif style == "Title":
+            text = "# " + text
+        elif numbered:
+            text = "- " + text
+        self._emit(text)
+
+    def _emit(self, text):
+        if self._note_tag:
+            if self._note_id is None:
+                return
+            prefix = "^" if self._note_tag == 'footnote' else "^e"
+            text = f"[{prefix}{self._note_id}]: {text}"
+        self.blocks.append(text)
+
+
+def _iter_part(archive, name, note_tag=None):
+    handler = _PartParser(note_tag)
+    with archive.open(name) as part:
+        while True:
+            data = part.read(READ_SIZE)
+            handler.parser.Parse(data, not data)
+            if handler.blocks:
+                yield from handler.blocks
+                handler.blocks = []
+            if not data:
+                break
+
+
+def iter_docx_blocks(docx_path):
+    """Yield text blocks of a .docx file in reading order."""
+    with zipfile.ZipFile(docx_path) as archive:
+        names = set(archive.namelist())
+        if "word/document.xml" not in names:
+            raise ValueError("Not a Word document: word/document.xml is missing")
+        headers = sorted((n for n in names if re.match(r'word/header\d*\.xml$', n)), key=_part_order)
+        footers = sorted((n for n in names if re.match(r'word/footer\d*\.xml$', n)), key=_part_order)
+
+        seen = set()  # first/even/default headers often repeat the same text
+        for name in headers:
+            for block in _iter_part(archive, name):
+                if block not in seen:
+                    seen.add(block)
+                    yield block
+        yield from _iter_part(archive, "word/document.xml")
+        for name in footers:
+            for block in _iter_part(archive, name):
+                if block not in seen:
+                    seen.add(block)
+                    yield block
+        for name, tag in (("word/footnotes.xml", 'footnote'), ("word/endnotes.xml", 'endnote')):
+            if name in names:
+                yield from _iter_part(archive, name, note_tag=tag)
+
+
+def extract_docx_text(docx_path):
+    return "\n\n".join(iter_docx_blocks(docx_path))
+
+
+def _extract_docx_worker(docx_path):
+    try:
+        return docx_path, extract_docx_text(docx_path), None
+    except Exception as e:
+        return docx_path, None, str(e)
+
+
+def extract_docx_batch(docx_paths, max_workers=None):
+    """
+    Extract many .docx files on a process pool.
+    Yields (path, text, error) as each file finishes.
+    """
+    docx_paths = list(docx_paths)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(docx_paths) or 1)
+    if max_workers < 2:
+        for path in docx_paths:
+            yield _extract_docx_worker(path)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_extract_docx_worker, path) for path in docx_paths]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,251 @@
+"""
+Streaming HTML-to-text extraction.
+
+A single-pass tokenizer over the body as it downloads: one compiled regex
+recognises tags, text between them is collected, and script/style bodies
+are skipped with one search for their end tag (so a '<' inside a script no
+longer derails anything). Page chrome (nav, footer, aside, site header) is
+dropped; headings and lists come out as markdown so the chunker still sees
+the document's structure. This is several times faster than html.parser,
+which dispatches through Python for every attribute and entity.
+"""
+
+import codecs
+import html
+import re
+
+# Subtrees whose text never reaches the output
+SKIP_TAGS = {'head', 'script', 'style', 'noscript', 'template', 'svg', 'iframe', 'nav', 'footer', 'aside',
+             'button', 'select'}
+SKIP_ROLES = {'navigation', 'banner', 'contentinfo', 'search', 'complementary'}
+BLOCK_TAGS = {'p', 'div', 'section', 'article', 'main', 'blockquote', 'pre', 'table', 'tr',
+              'dl', 'dt', 'dd', 'figure', 'figcaption', 'address', 'hr', 'center', 'form', 'fieldset', 'body'}
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+# Elements whose content is raw text up to the matching end tag
+RAW_TEXT_END = {tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in ('script', 'style')}
+# Tags that change the output; others (a, span, em, ...) are passed over
+# without a method call unless they carry attributes that might hide them
+STRUCTURAL_TAGS = (SKIP_TAGS | BLOCK_TAGS | set(HEADING_TAGS) | set(RAW_TEXT_END)
+                   | {'ul', 'ol', 'li', 'br', 'td', 'th', 'article', 'main', 'header'})
+
+# A complete tag, or failing that any '<' (handled by hand in feed)
+_TAG_OR_LT = re.compile(r"""<(/?)([a-zA-Z][^\s/>]*)((?:[^>"']|"[^"]*"|'[^']*')*)>|<""")
+_ROLE = re.compile(r"""\brole\s*=\s*["']?([\w-]+)""", re.IGNORECASE)
+_HIDDEN = re.compile(r'(?:^|\s)hidden(?:[\s=/]|$)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+MAX_TAG_CHARS = 64 * 1024  # longer than this without a '>' and it was never a tag
+
+
+class HTMLTextExtractor:
+    """
+    Incremental HTML to markdown-ish text. Call feed() with each decoded
+    chunk, then close() and get_text(). Completed blocks can be drained
+    early with pop_blocks() to keep memory flat on very large pages.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._raw = None  # end-tag pattern while inside <script>/<style>
+        self._skip = []  # tag names of the dropped subtrees we are inside
+        self._content_depth = 0  # inside <article>/<main>: <header> there is content
+        self._lists = []  # [tag, item counter] per open list
+        self._prefix = ""
+        self._inline = []
+        self._pre = 0
+        self._blocks = []
+
+    def feed(self, data, final=False):
+        buf = self._buffer + data
+        pos, length = 0, len(buf)
+        inline = self._inline
+        while pos < length:
+            if self._raw is not None:
+                match = self._raw.search(buf, pos)
+                if match is None:
+                    # Keep only enough of the tail to spot a split end tag
+                    pos = max(pos, length - 16)
+                    break
+                pos = match.end()
+                self._raw = None
+                continue
+
+            match = _TAG_OR_LT.search(buf, pos)
+            if match is None:
+                if not self._skip:
+                    inline.append(buf[pos:])
+                pos = length
+                break
+            lt = match.start()
+            if lt > pos and not self._skip:
+                inline.append(buf[pos:lt])
+            pos = lt
+
+            name = match.group(2)
+            if name is not None:
+                pos = match.end()
+                tag = name.lower()
+                if tag in STRUCTURAL_TAGS or self._skip or (match.group(3) and not match.group(1)):
+                    self._tag(match.group(1), tag, match.group(3))
+                    inline = self._inline
+                continue
+
+            # A '<' that did not open a complete tag
+            if buf.startswith('<!--', lt):
+                end = buf.find('-->', lt + 4)
+                if end == -1:
+                    if final:
+                        pos = length
+                    break
+                pos = end + 3
+                continue
+            following = buf[lt + 1:lt + 2]
+            if not following:
+                if final:
+                    self._text('<')
+                    pos = length
+                break
+            if following in '!?':
+                # Doctype, CDATA or processing instruction
+                end = buf.find('>', lt)
+                if end == -1:
+                    if final:
+                        pos = length
+                    break
+                pos = end + 1
+            elif (following.isalpha() or following == '/') and not final and length - lt < MAX_TAG_CHARS:
+                # Looks like a tag that has not completed yet: its closing '>'
+                # (or the end of a quoted attribute holding a '>') is still to
+                # come. Wait, so the result never depends on where chunks split;
+                # only the final flush decides it was a literal '<'.
+                break
+            else:
+                self._text('<')  # a literal '<' in text
+                pos = lt + 1
+        self._buffer = buf[pos:]
+
+    def _tag(self, closing, tag, attrs):
+        if closing:
+            self.handle_endtag(tag)
+            return
+        if tag in RAW_TEXT_END:
+            self._raw = RAW_TEXT_END[tag]
+            return
+        self.handle_starttag(tag, attrs)
+        if attrs.endswith('/') and tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def _text(self, data):
+        if not self._skip:
+            self._inline.append(data)
+
+    def _flush(self):
+        text = html.unescape("".join(self._inline))
+        self._inline = []
+        if not self._pre:
+            text = _WHITESPACE.sub(" ", text).strip()
+        if text:
+            self._blocks.append(self._prefix + text)
+        self._prefix = ""
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip:
+            if tag == self._skip[-1] and tag not in VOID_TAGS:
+                self._skip.append(tag)
+            return
+        if tag not in VOID_TAGS and (tag in SKIP_TAGS or (tag == 'header' and not self._content_depth)
+                                     or (attrs and self._hidden_by_attributes(attrs))):
+            self._skip.append(tag)
+            return
+
+        if tag in ('article', 'main'):
+            self._content_depth += 1
+        if tag in HEADING_TAGS:
+            self._flush()
+            self._prefix = "#" * HEADING_TAGS[tag] + " "
+        elif tag in ('ul', 'ol'):
+            self._flush()
+            self._lists.append([tag, 0])
+        elif tag == 'li':
+            self._flush()
+            indent = "  " * max(len(self._lists) - 1, 0)
+            if self._lists and self._lists[-1][0] == 'ol':
+                self._lists[-1][1] += 1
+                self._prefix = f"{indent}{self._lists[-1][1]}. "
+            else:
+                self._prefix = f"{indent}- "
+        elif tag == 'br':
+            self._inline.append("\n" if self._pre else " ")
+            if not self._pre:
+                self._flush()
+        elif tag in ('td', 'th'):
+            self._inline.append(" | ")
+        elif tag in BLOCK_TAGS:
+            self._flush()
+            if tag == 'pre':
+                self._pre += 1
+
+    @staticmethod
+    def _hidden_by_attributes(attrs):
+        if 'role' in attrs or 'ROLE' in attrs:
+            role = _ROLE.search(attrs)
+            if role and role.group(1).lower() in SKIP_ROLES:
+                return True
+        return ('hidden' in attrs or 'HIDDEN' in attrs) and _HIDDEN.search(attrs) is not None
+
+    def handle_endtag(self, tag):
+        if self._skip:
+            if tag == self._skip[-1]:
+                self._skip.pop()
+            return
+        if tag in ('article', 'main') and self._content_depth:
+            self._content_depth -= 1
+        if tag in ('ul', 'ol'):
+            self._flush()
+            if self._lists:
+                self._lists.pop()
+        elif tag in HEADING_TAGS or tag == 'li' or tag in BLOCK_TAGS:
+            self._flush()
+            if tag == 'pre' and self._pre:
+                self._pre -= 1
+
+    def close(self):
+        self.feed("", final=True)
+        self._flush()
+
+    def pop_blocks(self):
+        """Return and forget the blocks completed so far."""
+        blocks, self._blocks = self._blocks, []
+        return blocks
+
+    def get_text(self):
+        return "\n\n".join(self._blocks)
+
+
+def html_to_text(html):
+    extractor = HTMLTextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return extractor.get_text()
+
+
+def html_stream_to_text(chunks, encoding='utf-8'):
+    """Extract text from an iterable of raw byte chunks, decoding incrementally."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    extractor = HTMLTextExtractor()
+    for chunk in chunks:
+        extractor.feed(decoder.decode(chunk))
+    extractor.feed(decoder.decode(b"", final=True))
+    extractor.close()
+    return extractor.get_text()
+
+
+def charset_from_content_type(content_type, default='utf-8'):
+    """Charset named in a Content-Type header, if Python knows it."""
+    match = re.search(r'charset=["\']?([\w.:-]+)', content_type or "", re.IGNORECASE)
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return default
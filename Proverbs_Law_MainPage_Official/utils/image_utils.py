@@ -0,0 +1,123 @@
+"""
+Image preprocessing for vision-LLM uploads.
+
+Phone photos of handwritten notes are routinely 3-8 MB, mis-rotated and
+mostly desk or margin. The vision models used here tile their input at
+560 px and work at most 2x2 tiles, so anything above ~1120 px per side is
+downscaled server-side anyway; sending it only costs upload time. This
+module orients, crops and downsizes once, re-encodes with tuned quality and
+keeps the result in a small LRU keyed by the source hash.
+"""
+
+import base64
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image, ImageChops, ImageFilter, ImageOps
+
+VISION_MAX_SIDE = 1120
+CROP_THRESHOLD = 40  # grey levels away from the background that count as content
+CROP_MARGIN = 0.02  # keep 2% of the page around the content box
+CROP_ANALYSIS_SIDE = 512
+FORMAT_OPTIONS = {
+    "JPEG": ("image/jpeg", {"quality": 85, "optimize": True, "progressive": True}),
+    "WEBP": ("image/webp", {"quality": 80, "method": 4}),
+}
+
+
+def _background_level(gray):
+    """Median of the four corner pixels: paper colour for a photographed page."""
+    width, height = gray.size
+    corners = sorted(gray.getpixel(point) for point in
+                     ((0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)))
+    return (corners[1] + corners[2]) // 2
+
+
+def crop_to_content(image, threshold=CROP_THRESHOLD, margin=CROP_MARGIN):
+    """Crop away uniform background around the writing; returns image unchanged if nothing stands out."""
+    # Work on a blurred thumbnail: faster, and sensor noise or desk texture
+    # no longer reads as content
+    gray = image.convert("L")
+    gray.thumbnail((CROP_ANALYSIS_SIDE, CROP_ANALYSIS_SIDE))
+    gray = gray.filter(ImageFilter.GaussianBlur(2))
+    background = Image.new("L", gray.size, _background_level(gray))
+    mask = ImageChops.difference(gray, background).point(lambda value: 255 if value > threshold else 0)
+    bbox = mask.getbbox()
+    if bbox is None:
+        return image
+    scale_x, scale_y = image.width / gray.width, image.height / gray.height
+    pad_x, pad_y = int(image.width * margin), int(image.height * margin)
+    left, top, right, bottom = bbox
+    bbox = (max(0, int(left * scale_x) - pad_x), max(0, int(top * scale_y) - pad_y),
+            min(image.width, int(right * scale_x) + pad_x), min(image.height, int(bottom * scale_y) + pad_y))
+    return image.crop(bbox) if bbox != (0, 0, image.width, image.height) else image
+
+
+class VisionImagePreprocessor:
+    """
+    Turns raw image bytes into a data URL sized for a vision model.
+
+    Results are cached by SHA-256 of the source bytes plus the settings, so
+    the transcription and penmanship calls for one note, and repeat uploads,
+    encode the image once.
+    """
+
+    def __init__(self, max_side=VISION_MAX_SIDE, image_format="JPEG", crop=True, cache_size=64):
+        if image_format not in FORMAT_OPTIONS:
+            raise ValueError(f"Unsupported image format: {image_format}")
+        self.max_side = max_side
+        self.image_format = image_format
+        self.crop = crop
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def prepare(self, image_data):
+        """
+        Return a dict with the data URL, its mime type and size stats:
+        original_bytes, upload_bytes, reduction, original_size, upload_size
+        and preprocess_seconds.
+        """
+        key = (hashlib.sha256(image_data).hexdigest(), self.max_side, self.image_format, self.crop)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return dict(self._cache[key], cached=True)
+
+        started = time.perf_counter()
+        image = Image.open(io.BytesIO(image_data))
+        original_size = image.size
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            # Flatten alpha onto white so transparent scans do not turn black
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, "white")
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        if self.crop:
+            image = crop_to_content(image)
+        if max(image.size) > self.max_side:
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+
+        mime, options = FORMAT_OPTIONS[self.image_format]
+        buffer = io.BytesIO()
+        image.save(buffer, format=self.image_format, **options)
+        encoded = buffer.getvalue()
+
+        payload = {
+            "data_url": f"data:{mime};base64,{base64.b64encode(encoded).decode('utf-8')}",
+            "mime_type": mime,
+            "original_bytes": len(image_data),
+            "upload_bytes": len(encoded),
+            "reduction": f"{(1 - len(encoded) / len(image_data)) * 100:.1f}%" if image_data else "0.0%",
+            "original_size": list(original_size),
+            "upload_size": list(image.size),
+            "preprocess_seconds": round(time.perf_counter() - started, 3)
+        }
+        with self._lock:
+            self._cache[key] = payload
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return dict(payload, cached=False)
@@ -0,0 +1,251 @@
+"""
+OCR / vision result cache: exact pixel matches, plus confirmed rescans.
+
+An exact match answers first. Its key is the SHA-256 of the decoded pixels
+(mode, size and raw bytes), so a re-saved or re-encoded upload hits. Failing
+that, a 64-bit difference hash of the page's ink, split into four 16-bit
+bands, finds earlier pages that look alike through an indexed lookup; a
+rescan almost always keeps at least one band intact. A candidate is only
+served after a pixel check: its stored ink mask is aligned onto the new page
+and no 32x32 block may hold more than a few pixels of ink the other page does
+not explain. Two copies of a form that differ only in an amount or a date
+fail that check, so a near match never hands back another document's result;
+a rescan that fails it just costs a fresh OCR run. Results are JSON
+documents stored in a DiskCache, so DocumentProcessor, OCRProcessor and
+HandwrittenNoteInterpreter share one size-bounded cache.
+"""
+
+import hashlib
+import io
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from utils.disk_cache import DiskCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+
+PAGE_NAMESPACE_SUFFIX = ":page"  # stored ink masks, next to the results
+MAX_HASH_DISTANCE = 12  # of 64 bits; candidates further away are not checked
+MAX_CANDIDATES = 3
+MASK_MAX_SIDE = 3508  # A4 at 300 dpi; larger scans are scaled down first
+# Below this a changed digit is too few pixels to tell from scanner noise, so
+# smaller images only ever match exactly
+MIN_RESCAN_SIDE = 1600
+ALIGN_SIDES = (600, 1200)  # alignment is estimated on copies these sizes
+INK_TOLERANCE = 1  # pixels of residual misalignment forgiven around each stroke
+BLOCK = 32
+DEFAULT_MAX_UNEXPLAINED_INK = 3  # pixels per block
+
+
+def content_key(data):
+    """SHA-256 of a PIL image's mode, size and pixels; encoded bytes are decoded first."""
+    if not isinstance(data, Image.Image):
+        try:
+            data = Image.open(io.BytesIO(data))
+            data.load()
+        except Exception:
+            # Not an image Pillow can decode: fall back to the raw bytes
+            return hashlib.sha256(data).hexdigest()
+    hasher = hashlib.sha256()
+    hasher.update(f"{data.mode}:{data.size}".encode("utf-8"))
+    hasher.update(data.tobytes())
+    return hasher.hexdigest()
+
+
+def ink_mask(image, max_side=MASK_MAX_SIDE):
+    """uint8 array, 1 where Otsu's threshold calls the pixel ink."""
+    gray = image if image.mode == "L" else image.convert("L")
+    if max(gray.size) > max_side:
+        # Exact scaling: an integer reduce() could halve the resolution
+        scale = max_side / max(gray.size)
+        gray = gray.resize((max(1, round(gray.width * scale)), max(1, round(gray.height * scale))), Image.BOX)
+    _, mask = cv2.threshold(np.asarray(gray), 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    return mask
+
+
+def perceptual_hash(mask):
+    """Difference hash: sign of horizontal ink-density gradients on a 9x8 grid."""
+    small = cv2.resize(mask.astype(np.float32), (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _bands(phash):
+    return [(phash >> shift) & 0xFFFF for shift in (48, 32, 16, 0)]
+
+
+def _encode_mask(mask):
+    buffer = io.BytesIO()
+    Image.fromarray(mask * 255).convert("1").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _decode_mask(data):
+    return (np.asarray(Image.open(io.BytesIO(data)).convert("L")) > 0).astype(np.uint8)
+
+
+def _align(query, reference):
+    """reference warped onto query's pixel grid, or None when no affine fit is found."""
+    warp = np.eye(2, 3, dtype=np.float32)
+    previous_scale = None
+    # Coarse to fine: the small level finds large shifts, the larger one
+    # pins strokes down to a fraction of a pixel at full resolution
+    for side in ALIGN_SIDES:
+        scale = side / max(query.shape)
+        size = (max(1, round(query.shape[1] * scale)), max(1, round(query.shape[0] * scale)))
+        small_query = cv2.GaussianBlur(cv2.resize(query.astype(np.float32), size, interpolation=cv2.INTER_AREA),
+                                       (0, 0), 1.0)
+        small_reference = cv2.GaussianBlur(cv2.resize(reference.astype(np.float32), size,
+                                                      interpolation=cv2.INTER_AREA), (0, 0), 1.0)
+        if previous_scale is not None:
+            warp[:, 2] *= scale / previous_scale
+        try:
+            _, warp = cv2.findTransformECC(small_query, small_reference, warp, cv2.MOTION_AFFINE,
+                                           (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 100, 1e-5), None, 5)
+        except cv2.error:
+            return None
+        previous_scale = scale
+    # The fit maps small query coordinates to small, query-shaped reference
+    # coordinates; rescale both ends to full resolution
+    to_reference = np.array([[reference.shape[1] / size[0]], [reference.shape[0] / size[1]]], dtype=np.float32)
+    full = np.hstack([warp[:, :2] * scale, warp[:, 2:]]) * to_reference
+    return cv2.warpAffine(reference, full, (query.shape[1], query.shape[0]),
+                          flags=cv2.INTER_NEAREST | cv2.WARP_INVERSE_MAP, borderValue=0)
+
+
+def unexplained_ink(query, reference):
+    """
+    Most ink pixels in any BLOCK x BLOCK block that one page has and the
+    other lacks, after alignment; None when the pages cannot be aligned.
+    """
+    if abs(query.shape[0] / query.shape[1] - reference.shape[0] / reference.shape[1]) > 0.03:
+        return None
+    aligned = _align(query, reference)
+    if aligned is None:
+        return None
+    kernel = np.ones((2 * INK_TOLERANCE + 1, 2 * INK_TOLERANCE + 1), np.uint8)
+    extra = (query & (1 - cv2.dilate(aligned, kernel))) | (aligned & (1 - cv2.dilate(query, kernel)))
+    # Isolated specks are scanner noise, not writing
+    extra = cv2.morphologyEx(extra, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    height, width = extra.shape[0] // BLOCK * BLOCK, extra.shape[1] // BLOCK * BLOCK
+    if not height or not width:
+        return int(extra.sum())
+    blocks = extra[:height, :width].reshape(height // BLOCK, BLOCK, width // BLOCK, BLOCK).sum(axis=(1, 3))
+    return int(blocks.max())
+
+
+class OCRResultCache(DiskCache):
+    """DiskCache of JSON results with a banded perceptual-hash index for rescans."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 max_unexplained_ink=DEFAULT_MAX_UNEXPLAINED_INK):
+        super().__init__(cache_dir=cache_dir, max_bytes=max_bytes)
+        self.max_unexplained_ink = max_unexplained_ink
+        self.rescan_hits = 0
+        self.rescan_rejects = 0
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_pages (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    phash TEXT NOT NULL,
+                    band0 INTEGER NOT NULL,
+                    band1 INTEGER NOT NULL,
+                    band2 INTEGER NOT NULL,
+                    band3 INTEGER NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            for band in range(4):
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS ocr_pages_band{band} ON ocr_pages (namespace, band{band})"
+                )
+
+    def _candidates(self, namespace, phash):
+        """Keys of indexed pages sharing a hash band, nearest first."""
+        bands = _bands(phash)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, phash FROM ocr_pages WHERE namespace = ? AND "
+                "(band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?)",
+                (namespace, *bands)
+            ).fetchall()
+        scored = sorted(((int(candidate_hash, 16) ^ phash).bit_count(), key) for key, candidate_hash in rows)
+        return [key for distance, key in scored if distance <= MAX_HASH_DISTANCE][:MAX_CANDIDATES]
+
+    def _forget(self, namespace, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM ocr_pages WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def lookup(self, namespace, source):
+        """
+        Return (result, fingerprint). result is None on a miss; pass the
+        fingerprint back to store() so the image is not analysed twice.
+        """
+        image = source
+        if not isinstance(image, Image.Image):
+            try:
+                image = Image.open(io.BytesIO(source))
+                image.load()
+            except Exception:
+                key = content_key(source)
+                return self.get_json(namespace, key), (key, None)
+
+        key = content_key(image)
+        result = self.get_json(namespace, key)
+        if result is not None:
+            return result, (key, None)
+        mask = ink_mask(image)
+        if max(mask.shape) < MIN_RESCAN_SIDE:
+            return None, (key, None)
+
+        hits, misses = self.hits, self.misses
+        for candidate in self._candidates(namespace, perceptual_hash(mask)):
+            result = self.get_json(namespace, candidate)
+            reference = self.get(namespace + PAGE_NAMESPACE_SUFFIX, candidate)
+            if result is None or reference is None:
+                self._forget(namespace, candidate)  # evicted since it was indexed
+                continue
+            mismatch = unexplained_ink(mask, _decode_mask(reference))
+            if mismatch is not None and mismatch <= self.max_unexplained_ink:
+                # The exact-key miss above turned into a hit
+                self.hits, self.misses = hits + 1, misses - 1
+                self.rescan_hits += 1
+                return result, (key, mask)
+            self.rescan_rejects += 1
+        self.hits, self.misses = hits, misses
+        return None, (key, mask)
+
+    def store(self, namespace, fingerprint, result):
+        key, mask = fingerprint
+        self.set_json(namespace, key, result)
+        if mask is None:
+            return
+        self.set(namespace + PAGE_NAMESPACE_SUFFIX, key, _encode_mask(mask))
+        phash = perceptual_hash(mask)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_pages (namespace, key, phash, band0, band1, band2, band3) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, format(phash, "x"), *_bands(phash))
+            )
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats["rescan_hits"] = self.rescan_hits
+        stats["rescan_rejects"] = self.rescan_rejects
+        return stats
+
+
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """Process-wide OCRResultCache shared by every OCR and vision consumer."""
+    global _ocr_cache
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            _ocr_cache = OCRResultCache()
+        return _ocr_cache
@@ -2,32 +2,203 @@
 OCR Utilities for document processing
 """
 
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import cv2
 import numpy as np
 from PIL import Image
 
+# Fast handwriting classifier. Features are measured on a pyramid of
+# downsampled copies of the page (longest side 256 px, then 512 px), coarsest
+# first. Each level has its own linear weights, fitted on synthetic pages
+# from benchmarks/bench_handwriting_detection.py (seeds 7 and 11; the
+# benchmark scores other seeds). Recalibrate on labeled real scans.
+FAST_DETECT_LEVELS = (
+    (256, {'stroke_cv': 2.0, 'diagonal_ratio': 10.0, 'bias': -5.2}),
+    (512, {'stroke_cv': 1.8, 'diagonal_ratio': 10.0, 'bias': -5.4}),
+)
+FAST_DETECT_MARGIN = 0.15  # |score| needed to stop at a level
+GRADIENT_FRACTION = 0.2
+MIN_CONTRAST = 32.0
+
+
+def _downsample_gray(image, max_side):
+    """Grayscale copy of a PIL image reduced by an integer box filter."""
+    gray = image if image.mode == 'L' else image.convert('L')
+    factor = -(-max(gray.size) // max_side)  # ceil division
+    if factor > 1:
+        gray = gray.reduce(factor)
+    return np.asarray(gray, dtype=np.float32)
+
+
+def _handwriting_features(gray):
+    """
+    Vectorized page features:
+    - edge_density: share of pixels with a strong central-difference gradient
+    - diagonal_ratio: share of gradient energy pointing 22.5-67.5 degrees off
+      the axes; slanted, curving pen strokes score higher than typeset glyphs
+    - stroke_cv: coefficient of variation of horizontal ink run lengths;
+      type has uniform stroke widths, pen strokes do not
+    """
+    # Thresholds follow the page's own contrast so faint pencil and heavily
+    # downsampled strokes are judged the same way as crisp ink.
+    dark, light = np.percentile(gray, (1, 99))
+    contrast = light - dark
+    if contrast < MIN_CONTRAST:
+        return None
+
+    gx = (gray[1:-1, 2:] - gray[1:-1, :-2])
+    gy = (gray[2:, 1:-1] - gray[:-2, 1:-1])
+    magnitude = np.hypot(gx, gy)
+    strong = magnitude > GRADIENT_FRACTION * contrast
+    if not strong.any():
+        return None
+
+    weights = magnitude[strong]
+    angle = np.mod(np.arctan2(gy[strong], gx[strong]), np.pi / 2)
+    diagonal = np.abs(angle - np.pi / 4) < np.pi / 8
+    diagonal_ratio = float(weights[diagonal].sum() / weights.sum())
+
+    ink = gray < (dark + light) / 2
+    padding = np.zeros((ink.shape[0], 1), dtype=bool)
+    transitions = np.diff(np.hstack([padding, ink, padding]).astype(np.int8), axis=1).ravel()
+    runs = np.flatnonzero(transitions == -1) - np.flatnonzero(transitions == 1)
+    runs = runs[runs < 40]  # longer runs are rules, borders or filled areas
+    if runs.size < 20:
+        return None
+
+    return {
+        'edge_density': float(strong.mean()),
+        'diagonal_ratio': diagonal_ratio,
+        'stroke_cv': float(runs.std() / runs.mean())
+    }
+
+
+def _handwriting_score(features, weights):
+    return (weights['stroke_cv'] * features['stroke_cv']
+            + weights['diagonal_ratio'] * features['diagonal_ratio']
+            + weights['bias'])
+
+
 class OCRProcessor:
     """Handles OCR processing for images including handwriting detection."""
     
-    def __init__(self):
+    def __init__(self, use_cache=True):
         try:
             import pytesseract
             self.pytesseract = pytesseract
         except ImportError:
             self.pytesseract = None
             print("Warning: pytesseract not available")
+        
+        self.cache = None
+        if use_cache:
+            from utils.ocr_cache import get_ocr_cache
+            self.cache = get_ocr_cache()
     
-    def detect_handwriting(self, image):
-        """Detect if image contains handwriting."""
+    def _to_gray(self, image):
+        """Convert a PIL image to a grayscale numpy array."""
+        img_array = np.array(image)
+        if len(img_array.shape) == 3:
+            code = cv2.COLOR_RGBA2GRAY if img_array.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+            return cv2.cvtColor(img_array, code)
+        return img_array
+    
+    def ocr_image(self, image):
+        """
+        Full OCR decision path for one image: handwriting detection, then the
+        matching Tesseract pass, then a confidence-filtered pass if nothing was
+        found. The full-resolution grayscale conversion is done once and
+        shared by handwriting detection and every Tesseract pass. Results are
+        cached, so a re-upload of a known page or a confirmed rescan of it
+        skips OCR entirely.
+        """
+        started = time.perf_counter()
+        fingerprint = None
+        if self.cache is not None and self.pytesseract:
+            cached, fingerprint = self.cache.lookup("ocr", image)
+            if cached is not None:
+                cached['seconds'] = time.perf_counter() - started
+                cached['cached'] = True
+                return cached
+        
+        gray = self._to_gray(image)
+        # Mode 'L' view of the same pixels, so detection skips its own convert
+        handwriting_info = self.detect_handwriting_fast(Image.fromarray(gray))
+        
+        if handwriting_info['is_handwritten']:
+            text = self.extract_from_handwriting(image, gray=gray)
+            if not text.strip():
+                text = self.extract_text(image, enhance=True, gray=gray)
+        else:
+            text = self.extract_text(image, enhance=True, gray=gray)
+        
+        if not text.strip():
+            text = self.extract_text_with_confidence(image, gray=gray)['text']
+        
+        result = {
+            'text': text,
+            'is_handwritten': bool(handwriting_info['is_handwritten']),
+            'seconds': time.perf_counter() - started
+        }
+        failed = text.startswith(("OCR error", "Handwriting OCR error", "Error:"))
+        if fingerprint is not None and text.strip() and not failed:
+            self.cache.store("ocr", fingerprint, result)
+        return result
+    
+    def detect_handwriting_fast(self, image, fallback=True):
+        """
+        Fast handwriting check on downsampled copies of the page.
+
+        Pyramid levels are scored coarsest first and the first level whose
+        score clears the decision margin answers. If every level stays
+        ambiguous and fallback is True, the full-resolution
+        detect_handwriting() decides instead.
+        """
+        score = 0.0
+        features = None
         try:
-            # Convert PIL Image to numpy array
-            img_array = np.array(image)
+            # Reduce once to the finest level; coarser levels derive from it
+            finest = max(side for side, _ in FAST_DETECT_LEVELS)
+            gray_img = image if image.mode == 'L' else image.convert('L')
+            factor = -(-max(gray_img.size) // finest)
+            if factor > 1:
+                gray_img = gray_img.reduce(factor)
             
-            # Convert to grayscale
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = img_array
+            for max_side, weights in FAST_DETECT_LEVELS:
+                features = _handwriting_features(_downsample_gray(gray_img, max_side))
+                if features is None:
+                    continue  # blank page or too little ink at this level
+                score = _handwriting_score(features, weights)
+                if abs(score) >= FAST_DETECT_MARGIN:
+                    break
+            
+            if features is not None and (abs(score) >= FAST_DETECT_MARGIN or not fallback):
+                return {
+                    'is_handwritten': score > 0,
+                    'confidence': float(1 / (1 + np.exp(-abs(score) * 10))),
+                    'score': score,
+                    'level': max_side,
+                    'method': 'fast',
+                    **features
+                }
+            if not fallback:
+                return {'is_handwritten': False, 'confidence': 0, 'score': 0.0, 'method': 'fast'}
+        except Exception:
+            if not fallback:
+                raise
+        
+        result = self.detect_handwriting(image)
+        result['method'] = 'full'
+        return result
+    
+    def detect_handwriting(self, image, gray=None):
+        """Detect if image contains handwriting."""
+        try:
+            if gray is None:
+                gray = self._to_gray(image)
             
             # Apply edge detection
             edges = cv2.Canny(gray, 50, 150)
@@ -57,28 +228,28 @@ class OCRProcessor:
                 'error': str(e)
             }
     
-    def extract_text(self, image, enhance=True):
+    def extract_text(self, image, enhance=True, gray=None):
         """Extract text from image using standard OCR."""
         if not self.pytesseract:
             return "OCR not available"
         
         try:
             if enhance:
-                image = self._enhance_image(image)
+                image = self._enhance_image(image, gray=gray)
             
             text = self.pytesseract.image_to_string(image)
             return text
         except Exception as e:
             return f"OCR error: {str(e)}"
     
-    def extract_from_handwriting(self, image):
+    def extract_from_handwriting(self, image, gray=None):
         """Extract text from handwritten image."""
         if not self.pytesseract:
             return "OCR not available"
         
         try:
             # Enhance for handwriting
-            enhanced = self._enhance_for_handwriting(image)
+            enhanced = self._enhance_for_handwriting(image, gray=gray)
             
             # Use specific OCR config for handwriting
             custom_config = r'--oem 3 --psm 6'
@@ -87,12 +258,15 @@ class OCRProcessor:
         except Exception as e:
             return f"Handwriting OCR error: {str(e)}"
     
-    def extract_text_with_confidence(self, image):
+    def extract_text_with_confidence(self, image, gray=None):
         """Extract text with confidence scores."""
         if not self.pytesseract:
             return {'text': 'OCR not available', 'confidence': 0, 'word_count': 0}
         
         try:
+            # Tesseract grayscales colour input itself; reuse ours when given
+            if gray is not None:
+                image = Image.fromarray(gray)
             data = self.pytesseract.image_to_data(image, output_type=self.pytesseract.Output.DICT)
             
             # Filter by confidence
@@ -119,17 +293,11 @@ class OCRProcessor:
                 'word_count': 0
             }
     
-    def _enhance_image(self, image):
+    def _enhance_image(self, image, gray=None):
         """Enhance image for better OCR."""
         try:
-            # Convert PIL to numpy
-            img_array = np.array(image)
-            
-            # Convert to grayscale
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = img_array
+            if gray is None:
+                gray = self._to_gray(image)
             
             # Apply thresholding
             _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
@@ -139,15 +307,11 @@ class OCRProcessor:
         except Exception:
             return image
     
-    def _enhance_for_handwriting(self, image):
+    def _enhance_for_handwriting(self, image, gray=None):
         """Enhance image specifically for handwriting recognition."""
         try:
-            img_array = np.array(image)
-            
-            if len(img_array.shape) == 3:
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = img_array
+            if gray is None:
+                gray = self._to_gray(image)
             
             # Apply adaptive thresholding for handwriting
             binary = cv2.adaptiveThreshold(
@@ -160,3 +324,72 @@ class OCRProcessor:
             return Image.fromarray(denoised)
         except Exception:
             return image
+
+
+# Per-process OCRProcessor, created once by the pool initializer
+_worker_processor = None
+
+
+def _init_ocr_worker():
+    """Pool initializer: build the worker's OCRProcessor and warm Tesseract."""
+    global _worker_processor
+    # Each worker is one OCR lane; stop Tesseract's OpenMP from fanning out
+    # across every core and fighting the other workers.
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    cv2.setNumThreads(1)
+    _worker_processor = OCRProcessor()
+    if _worker_processor.pytesseract:
+        try:
+            _worker_processor.pytesseract.get_tesseract_version()
+        except Exception:
+            pass
+
+
+def _ocr_worker(index, source):
+    """Pool task: OCR one image path or PIL image."""
+    try:
+        image = Image.open(source) if isinstance(source, str) else source
+        image.load()
+        result = _worker_processor.ocr_image(image)
+    except Exception as e:
+        result = {'text': f"OCR error: {str(e)}", 'is_handwritten': False, 'seconds': 0.0}
+    result['index'] = index
+    result['source'] = source if isinstance(source, str) else f"image_{index}"
+    return result
+
+
+class BatchOCREngine:
+    """
+    Runs OCR for many images or pages on a pool of warm worker processes.
+    The pool is created on first use and kept alive between batches.
+    """
+    
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+    
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_ocr_worker)
+        return self._pool
+    
+    def process(self, sources):
+        """
+        OCR each source (file path or PIL image) and yield result dicts as
+        they finish, which is not necessarily input order. Each result has
+        'index' (position in sources), 'source', 'text', 'is_handwritten'
+        and 'seconds'.
+        """
+        pool = self._get_pool()
+        futures = [pool.submit(_ocr_worker, index, source) for index, source in enumerate(sources)]
+        for future in as_completed(futures):
+            yield future.result()
+    
+    def process_all(self, sources):
+        """OCR every source and return the results in input order."""
+        return sorted(self.process(sources), key=lambda result: result['index'])
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
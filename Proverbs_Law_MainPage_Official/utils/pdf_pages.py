@@ -0,0 +1,181 @@
+"""
+Page pipeline for scanned and mixed PDFs.
+
+Pages that already carry a text layer are returned as-is. Only image-only
+pages are rasterized, each lazily inside its worker task and at a DPI picked
+from the page size and the consumer: ~300 dpi for Tesseract, or just enough
+pixels for the vision model's input resolution. Rasterized pages go through
+OCR, or through the vision model when they look handwritten, on a bounded
+thread pool. Results are yielded in page order as soon as each is ready.
+
+Rasterization uses PyMuPDF when installed and falls back to pdf2image
+(poppler).
+"""
+
+import io
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.image_utils import VISION_MAX_SIDE
+from utils.pdf_utils import PDFProcessor, open_mapped
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+try:
+    from pdf2image import convert_from_path
+except ImportError:
+    convert_from_path = None
+
+# Fewer non-whitespace characters than this and the page is treated as a
+# scan; stray OCR layers and page numbers fall below it
+MIN_TEXT_CHARS = 25
+
+# (target pixels on the long side, min dpi, max dpi)
+DPI_PROFILES = {
+    'ocr': (3300, 150, 300),
+    'vision': (VISION_MAX_SIDE, 72, 200),
+}
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def has_text_layer(text, min_chars=MIN_TEXT_CHARS):
+    return sum(1 for char in text if not char.isspace()) >= min_chars
+
+
+def adaptive_dpi(width_pts, height_pts, profile='ocr'):
+    """DPI that renders the page's long side at the profile's target pixel count."""
+    target, min_dpi, max_dpi = DPI_PROFILES[profile]
+    long_side_inches = max(width_pts, height_pts, 1.0) / 72.0
+    return int(max(min_dpi, min(max_dpi, target / long_side_inches)))
+
+
+def rasterizer_available():
+    return fitz is not None or convert_from_path is not None
+
+
+def rasterize_page(pdf_path, index, dpi):
+    """Render one zero-based page to a PIL image."""
+    from PIL import Image
+
+    if fitz is not None:
+        # Documents are opened per call: PyMuPDF objects must not be shared
+        # between threads
+        with fitz.open(pdf_path) as document:
+            pixmap = document[index].get_pixmap(dpi=dpi)
+            return Image.open(io.BytesIO(pixmap.tobytes("png")))
+    if convert_from_path is not None:
+        return convert_from_path(pdf_path, dpi=dpi, first_page=index + 1, last_page=index + 1)[0]
+    raise RuntimeError("No PDF rasterizer available. Install PyMuPDF or pdf2image.")
+
+
+class PDFPagePipeline:
+    """
+    Text-layer-first, page-ordered PDF reader with OCR / vision fallback.
+
+    method is 'auto' (vision for pages that look handwritten when an
+    interpreter is given, OCR otherwise), 'ocr' or 'vision'.
+    """
+
+    def __init__(self, ocr_processor=None, interpreter=None, method='auto', max_workers=DEFAULT_MAX_WORKERS):
+        if method not in ('auto', 'ocr', 'vision'):
+            raise ValueError(f"Unknown page method: {method}")
+        if method == 'vision' and interpreter is None:
+            raise ValueError("method='vision' needs a HandwrittenNoteInterpreter")
+        if ocr_processor is None and method != 'vision':
+            from utils.ocr_utils import OCRProcessor
+            ocr_processor = OCRProcessor()
+        self.pdf_processor = PDFProcessor()
+        self.ocr_processor = ocr_processor
+        self.interpreter = interpreter
+        self.method = method
+        self.max_workers = max_workers
+
+    def _render(self, info, profile):
+        dpi = adaptive_dpi(info['width'], info['height'], profile)
+        return rasterize_page(info['pdf_path'], info['index'], dpi), dpi
+
+    def _process_image_page(self, info):
+        started = time.perf_counter()
+        page = {'page': info['index'] + 1, 'page_count': info['page_count']}
+        try:
+            method = self.method
+            if method == 'auto':
+                method = 'ocr'
+                if self.interpreter is not None:
+                    # Decide on the small vision-resolution render, which is
+                    # also exactly what the vision call needs
+                    image, dpi = self._render(info, 'vision')
+                    if self.ocr_processor.detect_handwriting_fast(image)['is_handwritten']:
+                        method = 'vision'
+            if method == 'vision':
+                if self.method != 'auto' or self.interpreter is None:
+                    image, dpi = self._render(info, 'vision')
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG")
+                result = self.interpreter.transcribe_image(buffer.getvalue())
+                page.update(text=result['transcription'], upload_stats=result['upload_stats'])
+            else:
+                image, dpi = self._render(info, 'ocr')
+                result = self.ocr_processor.ocr_image(image)
+                page.update(text=result['text'], is_handwritten=result['is_handwritten'])
+            page.update(source=method, dpi=dpi)
+        except Exception as e:
+            page.update(source='error', text=f"[Error processing page {info['index'] + 1}: {str(e)}]")
+        page['seconds'] = round(time.perf_counter() - started, 3)
+        return page
+
+    def _text_page(self, info, source, text):
+        return {'page': info['index'] + 1, 'page_count': info['page_count'],
+                'source': source, 'text': text, 'seconds': 0.0}
+
+    def iter_pages(self, pdf_path):
+        """
+        Yield one dict per page, in order: page, page_count, source
+        ('text_layer', 'ocr', 'vision', 'unavailable' or 'error'), text and
+        seconds, plus dpi for rasterized pages.
+
+        At most max_workers * 2 image pages are in flight, so a long scan
+        does not queue every rendered page in memory ahead of the consumer.
+        """
+        can_rasterize = rasterizer_available()
+        window = self.max_workers * 2
+        ordered = deque()  # finished page dicts and pending futures, in page order
+        in_flight = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool, open_mapped(pdf_path) as mapped:
+            try:
+                for info in self.pdf_processor.iter_page_info(mapped):
+                    if has_text_layer(info['text']):
+                        ordered.append(self._text_page(info, 'text_layer', info['text']))
+                    elif not can_rasterize:
+                        ordered.append(self._text_page(info, 'unavailable', (
+                            f"[Page {info['index'] + 1} has no text layer; "
+                            "install PyMuPDF or pdf2image to OCR it]"
+                        )))
+                    else:
+                        info['pdf_path'] = pdf_path
+                        ordered.append(pool.submit(self._process_image_page, info))
+                        in_flight += 1
+
+                    # Hand back everything ready at the head of the queue;
+                    # block on the head only once the window is full
+                    while ordered and (isinstance(ordered[0], dict) or ordered[0].done() or in_flight >= window):
+                        head = ordered.popleft()
+                        if not isinstance(head, dict):
+                            in_flight -= 1
+                            head = head.result()
+                        yield head
+
+                while ordered:
+                    head = ordered.popleft()
+                    yield head if isinstance(head, dict) else head.result()
+            finally:
+                # Consumer stopped early: drop pages that have not started
+                for item in ordered:
+                    if not isinstance(item, dict):
+                        item.cancel()
@@ -3,10 +3,55 @@ PDF Processing Utilities
 """
 
 import io
+import mmap
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# Below this many pages the process pool costs more than it saves
+PARALLEL_MIN_PAGES = 32
+PAGES_PER_TASK = 16
+
+
+@contextmanager
+def open_mapped(pdf_path):
+    """
+    Memory-map a PDF read-only. The parser reads through the OS page cache
+    instead of a private copy of the file, so a 200 MB upload is not also
+    held as a 200 MB bytes object.
+    """
+    with open(pdf_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap cannot map empty files; let the parser report the error
+            yield f
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            mapped.close()
+
+
+def _page_text(reader, index):
+    """Text of one page; a page that fails to parse becomes a marker, not an abort."""
+    try:
+        return reader.pages[index].extract_text() or ""
+    except Exception as e:
+        return f"[Error extracting page {index + 1}: {str(e)}]"
+
+
+def _extract_page_range(pdf_path, start, stop):
+    """Worker: extract pages [start, stop) from a PDF on disk."""
+    import PyPDF2
+    with open_mapped(pdf_path) as f:
+        reader = PyPDF2.PdfReader(f)
+        return [_page_text(reader, index) for index in range(start, stop)]
+
 
 class PDFProcessor:
     """Handles PDF text extraction."""
-    
+
     def __init__(self):
         try:
             import PyPDF2
@@ -14,36 +59,127 @@ class PDFProcessor:
         except ImportError:
             self.PyPDF2 = None
             print("Warning: PyPDF2 not available")
-    
+
+    def iter_pages(self, pdf_file):
+        """
+        Yield the text of each page of a PDF file object, in order. Pages that
+        fail to parse are handled as in the parallel path.
+        """
+        reader = self.PyPDF2.PdfReader(pdf_file)
+        for index in range(len(reader.pages)):
+            yield _page_text(reader, index)
+
+    def iter_page_info(self, pdf_file):
+        """
+        Yield a dict per page with its index, text layer, page count and
+        size in points, for callers deciding which pages need rasterizing.
+        """
+        reader = self.PyPDF2.PdfReader(pdf_file)
+        page_count = len(reader.pages)
+        for index, page in enumerate(reader.pages):
+            try:
+                text = page.extract_text() or ""
+            except Exception:
+                text = ""
+            box = page.mediabox
+            yield {
+                'index': index,
+                'page_count': page_count,
+                'text': text,
+                'width': float(box.width),
+                'height': float(box.height)
+            }
+
+    def iter_pages_parallel(self, pdf_path, max_workers=None, pages_per_task=PAGES_PER_TASK):
+        """
+        Yield page texts in order while a process pool extracts page ranges.
+
+        Each worker opens the file itself, so only paths and page text cross
+        the process boundary. Pages are yielded as soon as the range holding
+        the next page is done, letting downstream chunking start early.
+        Small documents, or a single available core, are extracted serially.
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        with open(pdf_path, 'rb') as f:
+            page_count = len(self.PyPDF2.PdfReader(f).pages)
+
+        if page_count < PARALLEL_MIN_PAGES or max_workers < 2:
+            with open_mapped(pdf_path) as f:
+                yield from self.iter_pages(f)
+            return
+
+        ranges = [(start, min(start + pages_per_task, page_count))
+                  for start in range(0, page_count, pages_per_task)]
+
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            # Keep a bounded window of ranges in flight so a slow consumer
+            # does not cause every page of the document to pile up in memory.
+            window = max_workers * 2
+            pending = [pool.submit(_extract_page_range, pdf_path, start, stop)
+                       for start, stop in ranges[:window]]
+            next_range = len(pending)
+            while pending:
+                pages = pending.pop(0).result()
+                if next_range < len(ranges):
+                    start, stop = ranges[next_range]
+                    pending.append(pool.submit(_extract_page_range, pdf_path, start, stop))
+                    next_range += 1
+                yield from pages
+
     def extract_text(self, pdf_file):
         """Extract text from PDF file object."""
         if not self.PyPDF2:
             return "PDF processing not available. Please install PyPDF2."
-        
+
+        try:
+            return "\n".join(self.iter_pages(pdf_file)).strip()
+        except Exception as e:
+            return f"Error extracting PDF text: {str(e)}"
+
+    def extract_text_from_path(self, pdf_path, stats=None):
+        """
+        Extract text from a PDF on disk through a memory map.
+        If an IngestStats is given, memory is sampled after every page.
+        """
+        if not self.PyPDF2:
+            return "PDF processing not available. Please install PyPDF2."
+
+        try:
+            with open_mapped(pdf_path) as mapped:
+                pages = []
+                for text in self.iter_pages(mapped):
+                    pages.append(text)
+                    if stats is not None:
+                        stats.sample()
+                return "\n".join(pages).strip()
+        except Exception as e:
+            return f"Error extracting PDF text: {str(e)}"
+
+    def extract_text_parallel(self, pdf_path, max_workers=None):
+        """Extract text from a PDF on disk using page-parallel workers."""
+        if not self.PyPDF2:
+            return "PDF processing not available. Please install PyPDF2."
+
         try:
-            reader = self.PyPDF2.PdfReader(pdf_file)
-            text = ""
-            
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            
-            return text.strip()
+            return "\n".join(self.iter_pages_parallel(pdf_path, max_workers=max_workers)).strip()
         except Exception as e:
             return f"Error extracting PDF text: {str(e)}"
-    
-    def extract_text_from_bytes(self, pdf_bytes):
+
+    def extract_text_from_bytes(self, pdf_bytes, parallel=False):
         """Extract text from PDF bytes."""
         if not self.PyPDF2:
             return "PDF processing not available. Please install PyPDF2."
-        
+
+        if parallel:
+            # Workers need a path to open, so spool the bytes to disk once
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                tmp.write(pdf_bytes)
+            try:
+                return self.extract_text_parallel(tmp.name)
+            finally:
+                os.remove(tmp.name)
+
         try:
-            pdf_file = io.BytesIO(pdf_bytes)
-            reader = self.PyPDF2.PdfReader(pdf_file)
-            text = ""
-            
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            
-            return text.strip()
+            return "\n".join(self.iter_pages(io.BytesIO(pdf_bytes))).strip()
         except Exception as e:
             return f"Error extracting PDF text: {str(e)}"
@@ -0,0 +1,83 @@
+"""
+Content-addressed cache of synthesized speech.
+
+Keys are the SHA-256 of the normalized text plus voice, rate and pitch, so
+canned disclaimers and answers replayed from the response cache are spoken
+once and then served straight from disk. MP3 bytes are stored in the shared
+DiskCache, which bounds total size and evicts least recently used audio.
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+
+from utils.disk_cache import get_disk_cache
+
+TTS_CACHE_NAMESPACE = "tts:v1"
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_tts_text(text):
+    """Text as the synthesizer hears it: NFKC, whitespace collapsed and trimmed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class TTSAudioCache:
+    """MP3 audio keyed by (normalized text, voice, rate, pitch)."""
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else get_disk_cache()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, text, voice, rate, pitch):
+        material = "\x1f".join((normalize_tts_text(text), voice, f"{float(rate):.3f}", str(int(pitch))))
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_path(self, key):
+        """Path of the cached MP3 (for FileResponse), or None on a miss."""
+        path = self.cache.get_path(TTS_CACHE_NAMESPACE, key)
+        self._count(path is not None)
+        return path
+
+    def get(self, key):
+        audio = self.cache.get(TTS_CACHE_NAMESPACE, key)
+        self._count(audio is not None)
+        return audio
+
+    def set(self, key, audio_bytes):
+        return self.cache.set(TTS_CACHE_NAMESPACE, key, audio_bytes)
+
+    def peek(self, key):
+        """Cached MP3 bytes without counting a lookup, e.g. when serving a known key."""
+        return self.cache.get(TTS_CACHE_NAMESPACE, key)
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{(self.hits / lookups * 100) if lookups else 0.0:.2f}%"
+        }
+
+
+_tts_cache = None
+_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """Process-wide TTSAudioCache, so hit rates cover every session."""
+    global _tts_cache
+    with _tts_cache_lock:
+        if _tts_cache is None:
+            _tts_cache = TTSAudioCache()
+        return _tts_cache
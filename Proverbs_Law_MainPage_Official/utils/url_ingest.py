@@ -0,0 +1,210 @@
+"""
+Concurrent URL ingestion for batches of statute and case-law links.
+
+All URLs in a batch share one pooled httpx.AsyncClient, so connections (and
+TLS sessions) to the same court or legislature site are reused. A per-host
+semaphore keeps any single site from being hit with more than a few
+requests at once. Pages fetched before are revalidated with If-None-Match /
+If-Modified-Since against a local HTTP cache, and a 304 reuses the cached
+extraction without downloading or parsing anything. Bodies are decoded and
+parsed as they stream in; results come back in completion order. HTML
+parsing and the synchronous disk-cache calls run in worker threads so one
+large page never stalls the other downloads. A URL repeated within a batch
+is fetched once and each repeat is reported as a duplicate.
+"""
+
+import asyncio
+import codecs
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+
+from utils.disk_cache import get_disk_cache
+from utils.html_utils import HTMLTextExtractor, charset_from_content_type
+from utils.ingest_utils import DocumentTooLargeError, IngestStats
+
+DEFAULT_PER_HOST_LIMIT = 4
+DEFAULT_MAX_CONNECTIONS = 32
+STREAM_CHUNK_SIZE = 64 * 1024
+HTTP_CACHE_NAMESPACE = "http:v1"
+
+
+class AsyncURLIngester:
+    """
+    Batch URL fetcher producing the same document dicts as
+    DocumentProcessor.process_url.
+    """
+
+    def __init__(self, processor, per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, timeout=30.0, use_cache=True):
+        self.processor = processor
+        self.per_host_limit = per_host_limit
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.cache = get_disk_cache() if use_cache else None
+
+    def _cache_key(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _conditional_headers(self, cached):
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    async def _read_html(self, response, content_type, stats):
+        decoder = codecs.getincrementaldecoder(charset_from_content_type(content_type))(errors='replace')
+        extractor = HTMLTextExtractor()
+
+        def feed(chunk, final=False):
+            extractor.feed(decoder.decode(chunk, final=final))
+
+        # Tokenizing is CPU-bound; feed chunks from a worker thread, one at a
+        # time, so the parser still sees them in order
+        async for chunk in self._iter_capped(response, stats):
+            await asyncio.to_thread(feed, chunk)
+        await asyncio.to_thread(feed, b"", True)
+        extractor.close()
+        return extractor.get_text()
+
+    @staticmethod
+    def _decode_text(body, content_type):
+        return body.decode(charset_from_content_type(content_type), errors='replace').strip()
+
+    async def _read_pdf(self, response, stats):
+        fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                async for chunk in self._iter_capped(response, stats):
+                    out.write(chunk)
+            # PDF parsing is CPU-bound; keep it off the event loop
+            return await asyncio.to_thread(self.processor._process_pdf_from_path, pdf_path, stats)
+        finally:
+            os.remove(pdf_path)
+
+    async def _iter_capped(self, response, stats):
+        max_bytes = self.processor.max_document_bytes
+        declared = response.headers.get('content-length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise DocumentTooLargeError(f"Document is {int(declared)} bytes; limit is {max_bytes}")
+        async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+            stats.bytes += len(chunk)
+            if stats.bytes > max_bytes:
+                raise DocumentTooLargeError(f"Document exceeded the {max_bytes} byte limit while downloading")
+            yield chunk
+
+    async def fetch(self, client, url, host_limits):
+        """Fetch and extract one URL. Returns a dict with url, document, error and cached."""
+        if not url.startswith(('http://', 'https://')):
+            return {'url': url, 'document': None, 'error': "Please enter a valid URL starting with http:// or https://", 'cached': False}
+
+        key = self._cache_key(url)
+        # DiskCache does blocking file and sqlite I/O
+        cached = await asyncio.to_thread(self.cache.get_json, HTTP_CACHE_NAMESPACE, key) if self.cache is not None else None
+        host = urlsplit(url).netloc.lower()
+        semaphore = host_limits.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        stats = IngestStats()
+
+        try:
+            async with semaphore:
+                async with client.stream("GET", url, headers=self._conditional_headers(cached)) as response:
+                    if response.status_code == 304 and cached:
+                        document = self.processor._url_document(url, cached['content'], cached['content_type'], stats)
+                        document['ingest_stats']['revalidated'] = True
+                        return {'url': url, 'document': document, 'error': None, 'cached': True}
+                    response.raise_for_status()
+
+                    content_type = response.headers.get('content-type', '').lower()
+                    if 'text/html' in content_type:
+                        content = await self._read_html(response, content_type, stats)
+                    elif 'text/plain' in content_type:
+                        body = b"".join([chunk async for chunk in self._iter_capped(response, stats)])
+                        content = await asyncio.to_thread(self._decode_text, body, content_type)
+                    elif 'application/pdf' in content_type:
+                        content = await self._read_pdf(response, stats)
+                    else:
+                        return {'url': url, 'document': None, 'error': f"Unsupported content type: {content_type}", 'cached': False}
+                    validators = {
+                        'etag': response.headers.get('etag'),
+                        'last_modified': response.headers.get('last-modified')
+                    }
+        except DocumentTooLargeError as e:
+            return {'url': url, 'document': None, 'error': f"Document too large: {str(e)}", 'cached': False}
+        except httpx.HTTPError as e:
+            return {'url': url, 'document': None, 'error': f"Error fetching URL: {str(e)}", 'cached': False}
+        except Exception as e:
+            return {'url': url, 'document': None, 'error': f"Error processing URL content: {str(e)}", 'cached': False}
+
+        if not content:
+            return {'url': url, 'document': None, 'error': "Failed to extract content from URL", 'cached': False}
+        if self.cache is not None and (validators['etag'] or validators['last_modified']):
+            await asyncio.to_thread(self.cache.set_json, HTTP_CACHE_NAMESPACE, key,
+                                    {**validators, 'content_type': content_type, 'content': content})
+        document = self.processor._url_document(url, content, content_type, stats)
+        return {'url': url, 'document': document, 'error': None, 'cached': False}
+
+    async def ingest(self, urls):
+        """
+        Async generator of per-URL results, in completion order. Every URL
+        given gets a result: repeats within the batch come first, as errors
+        with duplicate=True, and are not fetched again.
+        """
+        from document_processor import URL_HEADERS
+
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        host_limits = {}
+        async with httpx.AsyncClient(headers=URL_HEADERS, limits=limits, timeout=self.timeout,
+                                     follow_redirects=True) as client:
+            unique = []
+            seen = set()
+            for url in urls:
+                if url in seen:
+                    yield {'url': url, 'document': None, 'cached': False, 'duplicate': True,
+                           'error': "Duplicate URL in this batch; it is ingested once"}
+                else:
+                    seen.add(url)
+                    unique.append(url)
+            tasks = [asyncio.ensure_future(self.fetch(client, url, host_limits)) for url in unique]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    def ingest_sync(self, urls):
+        """
+        Blocking generator of (url, document, error) in completion order.
+        The event loop runs on a helper thread so this works from sync code
+        and from inside a running loop alike.
+        """
+        results = queue.Queue()
+        done = object()
+
+        async def pump():
+            async for result in self.ingest(urls):
+                results.put(result)
+
+        def run():
+            try:
+                asyncio.run(pump())
+            except Exception as e:
+                results.put(e)
+            finally:
+                results.put(done)
+
+        threading.Thread(target=run, daemon=True).start()
+        while True:
+            item = results.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item['url'], item['document'], item['error']
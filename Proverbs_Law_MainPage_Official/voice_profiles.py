@@ -0,0 +1,237 @@
+# voice_profiles.py
+
+"""
+Persistent voice profiles for Supertonic voice cloning.
+
+Each recording is analysed once, when it is saved: a speaker embedding (the
+mean and standard deviation of log-mel energies over voiced frames) is
+computed while streaming the audio in blocks, then stored as a float16 BLOB
+next to the recording's metadata. A profile keeps the weighted mean of its
+recordings' embeddings, so loading a voice at synthesis time is one indexed
+SQLite lookup and np.frombuffer, with no audio decoding and no filesystem
+scans. Recording audio lives in the content-addressed BlobStore; identical
+takes share one embedding computation.
+"""
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+from audio_processing import iter_blocks
+from blob_store import BlobStore
+from database_manager import DatabaseManager
+
+N_MELS = 40
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.010
+MIN_HZ = 60.0
+MAX_HZ = 8000.0
+VOICED_RMS_DBFS = -45.0  # frames quieter than this are treated as silence
+EMBEDDING_DIMS = 2 * N_MELS  # per-band mean and standard deviation
+
+
+def mel_filterbank(samplerate: int, n_fft: int, n_mels: int = N_MELS) -> np.ndarray:
+    """Triangular mel filters shaped (n_mels, n_fft // 2 + 1)."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    max_hz = min(MAX_HZ, samplerate / 2)
+    edges = mel_to_hz(np.linspace(hz_to_mel(MIN_HZ), hz_to_mel(max_hz), n_mels + 2))
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / samplerate)
+    lower, centre, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (freqs - lower) / (centre - lower)
+    falling = (upper - freqs) / (upper - centre)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def compute_speaker_embedding(path: str) -> Dict[str, Any]:
+    """
+    Stream an audio file and return its embedding (float32, EMBEDDING_DIMS),
+    duration and the number of voiced frames it was computed from.
+    """
+    info = sf.info(path)
+    frame = int(FRAME_SECONDS * info.samplerate)
+    hop = int(HOP_SECONDS * info.samplerate)
+    n_fft = 1 << (frame - 1).bit_length()
+    window = np.hanning(frame).astype(np.float32)
+    filters = mel_filterbank(info.samplerate, n_fft)
+    threshold = (10.0 ** (VOICED_RMS_DBFS / 20.0)) ** 2
+
+    total = np.zeros(N_MELS)
+    total_sq = np.zeros(N_MELS)
+    voiced = 0
+    carry = np.zeros(0, dtype=np.float32)
+    for block in iter_blocks(path):
+        samples = np.concatenate([carry, block.mean(axis=1)])
+        if len(samples) < frame:
+            carry = samples
+            continue
+        frames = np.lib.stride_tricks.sliding_window_view(samples, frame)[::hop]
+        carry = samples[len(frames) * hop:]
+        loud = np.mean(np.square(frames), axis=1) > threshold
+        if not loud.any():
+            continue
+        power = np.abs(np.fft.rfft(frames[loud] * window, n=n_fft, axis=1)) ** 2
+        log_mel = np.log(power @ filters.T + 1e-10)
+        total += log_mel.sum(axis=0)
+        total_sq += np.square(log_mel).sum(axis=0)
+        voiced += len(log_mel)
+
+    if not voiced:
+        raise ValueError("No speech found in the recording")
+    mean = total / voiced
+    std = np.sqrt(np.maximum(total_sq / voiced - np.square(mean), 0.0))
+    return {
+        "embedding": np.concatenate([mean, std]).astype(np.float32),
+        "duration": info.frames / info.samplerate,
+        "voiced_frames": voiced,
+    }
+
+
+def _pack(embedding: np.ndarray) -> bytes:
+    return embedding.astype(np.float16).tobytes()
+
+
+def _unpack(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12))
+
+
+class VoiceProfileStore:
+    def __init__(self, db_manager: Optional[DatabaseManager] = None, blob_store: Optional[BlobStore] = None):
+        self.db_manager = db_manager or DatabaseManager(persistent=True)
+        self.blob_store = blob_store or BlobStore(db_manager=self.db_manager)
+
+    def _cached_embedding(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Embedding already computed for the same audio under any profile."""
+        rows = self.db_manager.execute_query(
+            "SELECT embedding, duration, voiced_frames FROM voice_recordings WHERE blob_sha256 = ? LIMIT 1",
+            (sha256,)
+        )
+        if not rows:
+            return None
+        row = rows[0]
+        return {"embedding": _unpack(row["embedding"]), "duration": row["duration"],
+                "voiced_frames": row["voiced_frames"]}
+
+    def add_recording(self, name: str, blob: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Attach a stored recording (a BlobStore.ingest_* result) to a profile,
+        computing its embedding unless the same audio was analysed before.
+        Takes over the reference ingest took: it is released if the
+        recording is a duplicate or cannot be analysed.
+        """
+        try:
+            analysis = self._cached_embedding(blob["sha256"])
+            reused = analysis is not None
+            if analysis is None:
+                analysis = compute_speaker_embedding(blob["path"])
+
+            now = datetime.now().isoformat()
+            with self.db_manager.transaction() as conn:
+                added = conn.execute(
+                    "INSERT OR IGNORE INTO voice_recordings "
+                    "(profile_name, blob_sha256, duration, voiced_frames, embedding, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (name, blob["sha256"], analysis["duration"], analysis["voiced_frames"],
+                     _pack(analysis["embedding"]), now)
+                ).rowcount
+                rows = conn.execute(
+                    "SELECT embedding, voiced_frames, duration FROM voice_recordings WHERE profile_name = ?", (name,)
+                ).fetchall()
+                weights = np.array([row["voiced_frames"] for row in rows], dtype=np.float64)
+                embeddings = np.stack([_unpack(row["embedding"]) for row in rows])
+                profile = (embeddings * weights[:, None]).sum(axis=0) / weights.sum()
+                conn.execute(
+                    "INSERT INTO voice_profiles (name, embedding, dims, recordings, total_seconds, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET embedding = excluded.embedding, "
+                    "recordings = excluded.recordings, total_seconds = excluded.total_seconds, updated_at = excluded.updated_at",
+                    (name, _pack(profile), len(profile), len(rows), float(sum(row["duration"] for row in rows)), now, now)
+                )
+        except Exception:
+            # e.g. a silent take: nothing will ever point at this reference
+            self.blob_store.release(blob["sha256"])
+            raise
+        if not added:
+            # Same take saved to this profile again: drop the extra blob reference
+            self.blob_store.release(blob["sha256"])
+        return {"name": name, "duration": analysis["duration"], "recordings": len(rows),
+                "embedding_reused": reused, "duplicate": not added}
+
+    def embedding_for_file(self, path: str) -> np.ndarray:
+        """Embedding of an audio file, reused when the same audio was saved as a recording."""
+        hasher = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        cached = self._cached_embedding(hasher.hexdigest())
+        return cached["embedding"] if cached else compute_speaker_embedding(path)["embedding"]
+
+    def get_profile(self, name: str) -> Optional[Dict[str, Any]]:
+        """Profile metadata plus its embedding as float32, by primary-key lookup."""
+        rows = self.db_manager.execute_query("SELECT * FROM voice_profiles WHERE name = ?", (name,))
+        if not rows:
+            return None
+        profile = rows[0]
+        profile["embedding"] = _unpack(profile["embedding"])
+        return profile
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        return self.db_manager.execute_query(
+            "SELECT name, recordings, total_seconds, created_at, updated_at FROM voice_profiles ORDER BY name"
+        )
+
+    def list_recordings(self, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = "SELECT recording_id, profile_name, blob_sha256, duration, voiced_frames, created_at FROM voice_recordings"
+        if name is None:
+            return self.db_manager.execute_query(query + " ORDER BY recording_id")
+        return self.db_manager.execute_query(query + " WHERE profile_name = ? ORDER BY recording_id", (name,))
+
+    def find_closest(self, embedding: np.ndarray, limit: int = 3) -> List[Dict[str, Any]]:
+        """Profiles ranked by cosine similarity to an embedding."""
+        rows = self.db_manager.execute_query("SELECT name, embedding FROM voice_profiles")
+        scored = [{"name": row["name"], "similarity": cosine_similarity(embedding, _unpack(row["embedding"]))}
+                  for row in rows]
+        return sorted(scored, key=lambda row: row["similarity"], reverse=True)[:limit]
+
+    def delete_profile(self, name: str) -> bool:
+        with self.db_manager.transaction() as conn:
+            shas = [row["blob_sha256"] for row in conn.execute(
+                "SELECT blob_sha256 FROM voice_recordings WHERE profile_name = ?", (name,)
+            )]
+            conn.execute("DELETE FROM voice_recordings WHERE profile_name = ?", (name,))
+            deleted = conn.execute("DELETE FROM voice_profiles WHERE name = ?", (name,)).rowcount
+        for sha256 in shas:
+            self.blob_store.release(sha256)
+        return deleted > 0
+
+    def export_profile(self, name: str, path: str) -> Optional[str]:
+        """Self-contained JSON: metadata, recordings and the base64 float16 embedding."""
+        rows = self.db_manager.execute_query("SELECT * FROM voice_profiles WHERE name = ?", (name,))
+        if not rows:
+            return None
+        profile = rows[0]
+        document = {
+            "voice_name": name,
+            "embedding_dtype": "float16",
+            "embedding_dims": profile["dims"],
+            "embedding": base64.b64encode(profile["embedding"]).decode("ascii"),
+            "recordings": self.list_recordings(name),
+            "total_seconds": profile["total_seconds"],
+            "created": profile["created_at"],
+            "updated": profile["updated_at"],
+            "exported": datetime.now().isoformat()
+        }
+        with open(path, "w") as f:
+            json.dump(document, f, indent=2)
+        return path
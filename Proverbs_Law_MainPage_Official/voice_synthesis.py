@@ -0,0 +1,313 @@
+"""
+Voice Synthesis Engine for ProVerBs Law
+Warm ONNX Runtime sessions for Supertonic text-to-speech.
+
+Loading the four Supertonic graphs (duration predictor, text encoder,
+vector estimator, vocoder) takes far longer than synthesizing a sentence, so
+they are loaded once per process into a small pool of pipelines and reused.
+Session options are tuned for CPU serving: full graph optimization, and the
+machine's cores divided between the pool's pipelines so concurrent requests
+do not oversubscribe threads. Concurrent short utterances that share a voice
+style and settings are micro-batched into one batched inference call.
+
+Models are expected where SupertonicVoiceCloning.install_supertonic puts
+them: supertonic/assets (ONNX graphs under onnx/, presets under
+voice_styles/) with the reference helper in supertonic/py. The helper is not
+a stable API, so its building blocks are only used when their signatures
+match the ones this module was written against (see helper_api_matches);
+otherwise the helper's own loader is used with its default session options.
+"""
+
+import importlib.util
+import inspect
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+SUPERTONIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "supertonic")
+ONNX_DIR = os.path.join(SUPERTONIC_DIR, "assets", "onnx")
+VOICE_STYLE_DIR = os.path.join(SUPERTONIC_DIR, "assets", "voice_styles")
+HELPER_PATH = os.path.join(SUPERTONIC_DIR, "py", "helper.py")
+DEFAULT_VOICE_STYLE = os.getenv("SUPERTONIC_VOICE_STYLE", "M1.json")
+# Commit or tag of github.com/supertone-inc/supertonic that install_supertonic
+# checks out; empty means the default branch at install time
+SUPERTONIC_REF = os.getenv("SUPERTONIC_REF", "")
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_TOTAL_STEPS = 5  # flow-matching denoising steps
+DEFAULT_SPEED = 1.05
+DEFAULT_MAX_BATCH = 8
+DEFAULT_BATCH_WINDOW_MS = 15
+SHORT_TEXT_CHARS = 300  # longer texts are not worth padding a batch for
+# Covers loading a pipeline on first use plus synthesizing a long text
+DEFAULT_SYNTHESIS_TIMEOUT = float(os.getenv("SUPERTONIC_TIMEOUT", "120"))
+
+
+def models_available(onnx_dir: str = ONNX_DIR) -> bool:
+    """True when onnxruntime is installed and the Supertonic graphs are on disk."""
+    return ort is not None and os.path.isdir(onnx_dir) and any(
+        name.endswith(".onnx") for name in os.listdir(onnx_dir)
+    ) and os.path.isfile(HELPER_PATH)
+
+
+def physical_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def session_options(intra_op_threads: int, inter_op_threads: int = 1):
+    """CPU-serving SessionOptions: full graph optimization, explicit thread counts."""
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = max(1, intra_op_threads)
+    options.inter_op_num_threads = max(1, inter_op_threads)
+    # Threads spin-wait between ops by default, which burns the cores other
+    # pipelines in the pool need
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return options
+
+
+def list_voice_styles(style_dir: str = VOICE_STYLE_DIR) -> List[str]:
+    """Paths of the preset voice styles shipped with the models."""
+    if not os.path.isdir(style_dir):
+        return []
+    return sorted(os.path.join(style_dir, name) for name in os.listdir(style_dir) if name.endswith(".json"))
+
+
+def helper_api_matches(helper) -> bool:
+    """
+    True when the helper exposes the building blocks _load_pipeline needs, with
+    the signatures of the supertonic py/helper.py this module targets:
+    load_onnx_all(onnx_dir, opts, providers), load_cfgs(onnx_dir),
+    load_text_processor(onnx_dir) and TextToSpeech(cfgs, text_processor,
+    dp, text_enc, vector_est, vocoder).
+    """
+    expected = {"load_onnx_all": 3, "load_cfgs": 1, "load_text_processor": 1, "TextToSpeech": 6}
+    try:
+        for name, count in expected.items():
+            parameters = [p for p in inspect.signature(getattr(helper, name)).parameters.values()
+                          if p.default is inspect.Parameter.empty and p.kind in
+                          (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)]
+            if len(parameters) != count:
+                return False
+    except (AttributeError, TypeError, ValueError):
+        return False
+    return True
+
+
+def load_helper():
+    spec = importlib.util.spec_from_file_location("supertonic_helper", HELPER_PATH)
+    helper = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(helper)
+    return helper
+
+
+class _Request:
+    __slots__ = ("text", "key", "future")
+
+    def __init__(self, text: str, key: Tuple, future: Future):
+        self.text = text
+        self.key = key
+        self.future = future
+
+
+class VoiceSynthesisEngine:
+    """
+    Pool of warm Supertonic pipelines with micro-batching.
+
+    synthesize() blocks the calling thread until its audio is ready and is
+    safe to call from many threads at once.
+    """
+
+    def __init__(self, onnx_dir: str = ONNX_DIR, pool_size: int = DEFAULT_POOL_SIZE,
+                 intra_op_threads: Optional[int] = None, inter_op_threads: int = 1,
+                 max_batch: int = DEFAULT_MAX_BATCH, batch_window_ms: float = DEFAULT_BATCH_WINDOW_MS):
+        if not models_available(onnx_dir):
+            raise RuntimeError("Supertonic models or onnxruntime are not available")
+        self.onnx_dir = onnx_dir
+        self.pool_size = pool_size
+        self.intra_op_threads = intra_op_threads or max(1, physical_cores() // pool_size)
+        self.inter_op_threads = inter_op_threads
+        self.max_batch = max_batch
+        self.batch_window = batch_window_ms / 1000.0
+        self.helper = load_helper()
+        if not hasattr(getattr(self.helper, "TextToSpeech", None), "batch"):
+            self.max_batch = 1  # helper cannot batch: one utterance per call
+
+        self._pool: "queue.Queue" = queue.Queue()
+        self._created = 0
+        self._pool_lock = threading.Lock()
+        self._styles: Dict[Tuple[str, int], Any] = {}
+        self._styles_lock = threading.Lock()
+        self._requests: "queue.Queue[_Request]" = queue.Queue()
+        self.stats = {"pipelines_loaded": 0, "load_seconds": 0.0, "requests": 0, "batches": 0,
+                      "audio_seconds": 0.0, "inference_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        for _ in range(pool_size):
+            threading.Thread(target=self._batch_worker, daemon=True).start()
+
+    def _load_pipeline(self):
+        """One Supertonic pipeline with tuned sessions, built via the reference helper."""
+        started = time.perf_counter()
+        helper = self.helper
+        options = session_options(self.intra_op_threads, self.inter_op_threads)
+        providers = ["CPUExecutionProvider"]
+        if helper_api_matches(helper):
+            cfgs = helper.load_cfgs(self.onnx_dir)
+            sessions = helper.load_onnx_all(self.onnx_dir, options, providers)
+            pipeline = helper.TextToSpeech(cfgs, helper.load_text_processor(self.onnx_dir), *sessions)
+        else:
+            # Helper from a different release: its own loader, default session options
+            pipeline = helper.load_text_to_speech(self.onnx_dir, False)
+        with self._stats_lock:
+            self.stats["pipelines_loaded"] += 1
+            self.stats["load_seconds"] += time.perf_counter() - started
+        return pipeline
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._pool_lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                try:
+                    return self._load_pipeline()
+                except Exception:
+                    # Free the slot so a later request retries the load
+                    self._created -= 1
+                    raise
+        return self._pool.get()
+
+    def _release(self, pipeline):
+        self._pool.put(pipeline)
+
+    def warm_up(self):
+        """Load every pipeline in the pool now rather than on first use."""
+        pipelines = [self._acquire() for _ in range(self.pool_size)]
+        for pipeline in pipelines:
+            self._release(pipeline)
+
+    def _style(self, style_path: str, count: int):
+        key = (style_path, count)
+        with self._styles_lock:
+            style = self._styles.get(key)
+        if style is None:
+            style = self.helper.load_voice_style([style_path] * count)
+            with self._styles_lock:
+                self._styles[key] = style
+        return style
+
+    def _collect_batch(self) -> List[_Request]:
+        """Block for one request, then gather compatible ones for up to batch_window."""
+        first = self._requests.get()
+        batch = [first]
+        if len(first.text) > SHORT_TEXT_CHARS:
+            return batch
+        deadline = time.monotonic() + self.batch_window
+        deferred = []
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request.key == first.key and len(request.text) <= SHORT_TEXT_CHARS:
+                batch.append(request)
+            else:
+                deferred.append(request)
+        for request in deferred:
+            self._requests.put(request)
+        return batch
+
+    def _batch_worker(self):
+        while True:
+            # Drops requests whose caller timed out; the rest can no longer be cancelled
+            batch = [request for request in self._collect_batch() if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            style_path, total_steps, speed = batch[0].key
+            pipeline = None
+            try:
+                # Inside the try: a failed load must fail this batch's
+                # futures, not kill the worker and leave them pending
+                pipeline = self._acquire()
+                started = time.perf_counter()
+                style = self._style(style_path, len(batch))
+                texts = [request.text for request in batch]
+                if len(batch) == 1:
+                    wav, duration = pipeline(texts[0], style, total_steps, speed)
+                else:
+                    wav, duration = pipeline.batch(texts, style, total_steps, speed)
+                sample_rate = pipeline.sample_rate
+                elapsed = time.perf_counter() - started
+                audio_seconds = 0.0
+                for i, request in enumerate(batch):
+                    length = int(sample_rate * float(np.ravel(duration)[i]))
+                    audio = np.asarray(wav[i] if wav.ndim > 1 else wav, dtype=np.float32)[:length]
+                    audio_seconds += length / sample_rate
+                    request.future.set_result((audio, sample_rate))
+                with self._stats_lock:
+                    self.stats["requests"] += len(batch)
+                    self.stats["batches"] += 1
+                    self.stats["audio_seconds"] += audio_seconds
+                    self.stats["inference_seconds"] += elapsed
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+            finally:
+                if pipeline is not None:
+                    self._release(pipeline)
+
+    def synthesize(self, text: str, style_path: Optional[str] = None, total_steps: int = DEFAULT_TOTAL_STEPS,
+                   speed: float = DEFAULT_SPEED,
+                   timeout: Optional[float] = DEFAULT_SYNTHESIS_TIMEOUT) -> Tuple[np.ndarray, int]:
+        """Returns (float32 mono waveform, sample_rate). Raises TimeoutError after timeout seconds."""
+        style_path = style_path or os.path.join(VOICE_STYLE_DIR, DEFAULT_VOICE_STYLE)
+        future: Future = Future()
+        self._requests.put(_Request(text, (style_path, total_steps, speed), future))
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()  # a worker that picks it up later skips it
+            raise TimeoutError(f"Voice synthesis timed out after {timeout:g}s")
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["avg_batch_size"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["realtime_factor"] = (round(stats["inference_seconds"] / stats["audio_seconds"], 4)
+                                    if stats["audio_seconds"] else None)
+        stats["intra_op_threads"] = self.intra_op_threads
+        stats["pool_size"] = self.pool_size
+        return stats
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_voice_engine() -> Optional[VoiceSynthesisEngine]:
+    """Process-wide engine, or None when the models are not installed."""
+    global _engine
+    with _engine_lock:
+        if _engine is None and models_available():
+            _engine = VoiceSynthesisEngine(pool_size=int(os.getenv("SUPERTONIC_POOL_SIZE", DEFAULT_POOL_SIZE)))
+        return _engine